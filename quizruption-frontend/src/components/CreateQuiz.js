@@ -1,6 +1,7 @@
 // Content creation form (Quizzes and Trivia)
 import React, { useState } from 'react';
 import { createQuiz } from '../services/api';
+import { waitForImageUpload } from '../utils/helpers';
 
 function CreateQuiz() {
   const [quizData, setQuizData] = useState({
@@ -140,9 +141,10 @@ function CreateQuiz() {
       }
 
       const data = await response.json();
+      const job = await waitForImageUpload(data);
       
       // Update personality with new image URL
-      updatePersonality(personalityIndex, 'image_url', data.image_url);
+      updatePersonality(personalityIndex, 'image_url', job.image_url);
       setMessage('Image uploaded successfully!');
       
     } catch (error) {
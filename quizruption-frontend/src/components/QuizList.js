@@ -3,6 +3,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { getQuizzes, deleteQuiz } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
+import { imageVariantUrl } from '../utils/helpers';
 
 function QuizList({ filter, limit, showTitle = true, type, title }) {
   const [quizzes, setQuizzes] = useState([]);
@@ -97,7 +98,17 @@ function QuizList({ filter, limit, showTitle = true, type, title }) {
               {quiz.creator && (
                 <div className="quiz-creator">
                   <div className="creator-avatar">
-                    {quiz.creator.username.charAt(0).toUpperCase()}
+                    {quiz.creator.profile_image_url ? (
+                      <img
+                        src={imageVariantUrl(quiz.creator.profile_image_url, 32)}
+                        alt={quiz.creator.username}
+                        width="32"
+                        height="32"
+                        loading="lazy"
+                      />
+                    ) : (
+                      quiz.creator.username.charAt(0).toUpperCase()
+                    )}
                   </div>
                   <div className="creator-info">
                     <div className="creator-name">
@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect, forwardRef, useImperativeHandle } from 'react';
-import { sendChatMessage } from '../services/api';
+import { streamChatMessage } from '../services/api';
 
 const TurtleChatBot = forwardRef((props, ref) => {
   const [isOpen, setIsOpen] = useState(false);
@@ -12,8 +12,15 @@ const TurtleChatBot = forwardRef((props, ref) => {
   ]);
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
+  const streamAbortRef = useRef(null);
+  // Server-side conversation; the history is sent too in case the session is gone
+  const sessionIdRef = useRef(null);
+
+  // Stop any in-flight reply when the chat unmounts so the server cancels it too
+  useEffect(() => () => streamAbortRef.current?.abort(), []);
 
   // Scroll to bottom when messages change
   const scrollToBottom = () => {
@@ -58,17 +65,19 @@ const TurtleChatBot = forwardRef((props, ref) => {
         content: msg.content
       }));
 
-      // Send to API
-      const response = await sendChatMessage(userMessage.content, conversationHistory);
-
-      // Add bot response
-      const botMessage = {
-        role: 'assistant',
-        content: response.response,
-        timestamp: new Date()
-      };
-      
-      setMessages(prev => [...prev, botMessage]);
+      // Stream the reply into a new bot message as tokens arrive
+      const controller = new AbortController();
+      streamAbortRef.current = controller;
+      const botTimestamp = new Date();
+      const reply = await streamChatMessage(userMessage.content, sessionIdRef.current, conversationHistory, (text) => {
+        setIsStreaming(true);
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          const botMessage = { role: 'assistant', content: text, timestamp: botTimestamp };
+          return last.timestamp === botTimestamp ? [...prev.slice(0, -1), botMessage] : [...prev, botMessage];
+        });
+      }, controller.signal);
+      sessionIdRef.current = reply.sessionId;
     } catch (error) {
       console.error('Error sending chat message:', error);
       const errorMessage = {
@@ -78,6 +87,8 @@ const TurtleChatBot = forwardRef((props, ref) => {
       };
       setMessages(prev => [...prev, errorMessage]);
     } finally {
+      streamAbortRef.current = null;
+      setIsStreaming(false);
       setIsLoading(false);
     }
   };
@@ -148,7 +159,7 @@ const TurtleChatBot = forwardRef((props, ref) => {
               </div>
             ))}
             
-            {isLoading && (
+            {isLoading && !isStreaming && (
               <div className="turtle-message bot-message">
                 <span className="message-avatar">🐢</span>
                 <div className="message-bubble typing-indicator">
@@ -3,6 +3,7 @@ import { useAuth } from '../contexts/AuthContext';
 import { updateUserProfile, getUserStats, getQuizzes, deleteQuiz } from '../services/api';
 import { Link } from 'react-router-dom';
 import logger from '../utils/logger';
+import { waitForImageUpload } from '../utils/helpers';
 
 function Profile() {
   const { user, updateUser } = useAuth();
@@ -178,9 +179,10 @@ function Profile() {
       }
 
       const data = await response.json();
+      const job = await waitForImageUpload(data);
       
       // Update profile data with new image URL
-      handleInputChange('profile_image_url', data.image_url);
+      handleInputChange('profile_image_url', job.image_url);
       
     } catch (error) {
       console.error('Error uploading image:', error);
@@ -107,12 +107,58 @@ export const getUserResults = async (userId) => {
 };
 
 // Chat endpoints
-export const sendChatMessage = async (message, conversationHistory = null) => {
+// Pass the session_id from the previous reply along with the conversation so far; the
+// server continues from the history when it no longer has (or never had) the session
+export const sendChatMessage = async (message, sessionId = null, conversationHistory = null) => {
   const response = await api.post('/chat', {
     message,
+    session_id: sessionId,
     conversation_history: conversationHistory
   });
   return response.data;
 };
 
+// Streams Terry's reply as newline-delimited JSON; onDelta receives the text so far.
+// Resolves to { text, sessionId } once the reply is complete.
+export const streamChatMessage = async (message, sessionId = null, conversationHistory = null, onDelta, signal) => {
+  const token = localStorage.getItem('authToken');
+  const response = await fetch(`${api.defaults.baseURL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {})
+    },
+    body: JSON.stringify({ message, session_id: sessionId, conversation_history: conversationHistory }),
+    signal
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  let nextSessionId = response.headers.get('X-Chat-Session') || sessionId;
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line);
+      if (event.delta) {
+        text += event.delta;
+        if (onDelta) onDelta(text);
+      }
+      if (event.done && event.session_id) {
+        nextSessionId = event.session_id;
+      }
+    }
+  }
+  return { text, sessionId: nextSessionId };
+};
+
 export default api;
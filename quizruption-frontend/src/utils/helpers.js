@@ -12,6 +12,48 @@ export const formatDate = (dateString) => {
   });
 };
 
+/**
+ * Build the URL of a resized variant of an uploaded image.
+ * The backend picks the smallest variant covering `size` pixels in the best
+ * format the browser accepts (AVIF/WebP/JPEG). External URLs are returned as-is.
+ */
+export const imageVariantUrl = (imageUrl, size, baseUrl = 'http://localhost:8000') => {
+  if (!imageUrl) return '';
+  if (imageUrl.startsWith('http')) return imageUrl;
+  const match = imageUrl.match(/^\/uploads\/(profile_images|personality_images)\/([^/]+)$/);
+  if (!match) return `${baseUrl}${imageUrl}`;
+  const density = Math.ceil(window.devicePixelRatio || 1);
+  return `${baseUrl}/api/upload/variants/${match[1]}/${match[2]}?size=${size * density}`;
+};
+
+/**
+ * Wait for a background image upload to finish processing.
+ * Upload endpoints answer 202 with a `status_url`; the final (content-addressed)
+ * `image_url` is only known once the job is done.
+ */
+export const waitForImageUpload = async (
+  uploadResponse,
+  { baseUrl = 'http://localhost:8000', intervalMs = 300, timeoutMs = 30000 } = {}
+) => {
+  let job = uploadResponse;
+  const deadline = Date.now() + timeoutMs;
+  while (job.status === 'pending' || job.status === 'processing') {
+    if (Date.now() > deadline) {
+      throw new Error('Image processing timed out');
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    const response = await fetch(`${baseUrl}${uploadResponse.status_url}`);
+    if (!response.ok) {
+      throw new Error('Failed to check image upload status');
+    }
+    job = await response.json();
+  }
+  if (job.status !== 'done') {
+    throw new Error(job.error || 'Image processing failed');
+  }
+  return job;
+};
+
 /**
  * Calculate percentage
  */
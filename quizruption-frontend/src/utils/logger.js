@@ -35,13 +35,21 @@ const SENSITIVE_KEYS = [
 const MAX_LOG_SIZE = 500; // Maximum number of logs to store
 const MAX_LOG_AGE_MS = 24 * 60 * 60 * 1000; // 24 hours
 
+// Remote events are sent in batches: when this many are waiting, or after the delay
+const REMOTE_BATCH_SIZE = 50;
+const REMOTE_FLUSH_MS = 5000;
+const MAX_REMOTE_QUEUE = 500;
+const DEFAULT_LOG_ENDPOINT = `${(process.env.REACT_APP_API_URL || '/api').replace(/\/+$/, '')}/logs/ingest`;
+
 class Logger {
   constructor() {
     this.logLevel = process.env.NODE_ENV === 'production' 
       ? LOG_LEVELS.WARN 
       : LOG_LEVELS.DEBUG;
     this.remoteLoggingEnabled = process.env.REACT_APP_REMOTE_LOGGING === 'true';
-    this.remoteLogUrl = process.env.REACT_APP_LOG_ENDPOINT || null;
+    this.remoteLogUrl = process.env.REACT_APP_LOG_ENDPOINT || DEFAULT_LOG_ENDPOINT;
+    this.remoteQueue = [];
+    this.remoteFlushTimer = null;
     this.sessionId = this.generateSessionId();
     this.logs = this.loadLogs();
     this.performanceMarks = new Map();
@@ -136,9 +144,9 @@ class Logger {
     this.trimLogs();
     this.saveLogs();
 
-    // Send to remote if enabled
+    // Queue for the next remote batch if enabled
     if (this.remoteLoggingEnabled && level >= LOG_LEVELS.ERROR) {
-      this.sendToRemote(logEntry);
+      this.queueRemote(logEntry);
     }
   }
 
@@ -275,21 +283,50 @@ class Logger {
   }
 
   /**
-   * Remote logging
+   * Remote logging: events are batched and gzip-compressed into one POST
    */
-  async sendToRemote(logEntry) {
+  queueRemote(logEntry) {
     if (!this.remoteLogUrl) return;
 
+    this.remoteQueue.push(logEntry);
+    if (this.remoteQueue.length > MAX_REMOTE_QUEUE) {
+      this.remoteQueue = this.remoteQueue.slice(-MAX_REMOTE_QUEUE);
+    }
+    if (this.remoteQueue.length >= REMOTE_BATCH_SIZE) {
+      this.flushRemote();
+    } else if (!this.remoteFlushTimer) {
+      this.remoteFlushTimer = setTimeout(() => this.flushRemote(), REMOTE_FLUSH_MS);
+    }
+  }
+
+  async compress(text) {
+    if (typeof CompressionStream === 'undefined') {
+      return { body: text, encoding: null };
+    }
+    const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+    return { body: await new Response(stream).blob(), encoding: 'gzip' };
+  }
+
+  /**
+   * Send queued events. On page unload compression is skipped so the request
+   * can be handed to the browser (keepalive) before the page goes away.
+   */
+  async flushRemote({ unloading = false } = {}) {
+    clearTimeout(this.remoteFlushTimer);
+    this.remoteFlushTimer = null;
+    if (this.remoteQueue.length === 0) return;
+
+    const batch = this.remoteQueue.splice(0, this.remoteQueue.length);
     try {
-      await fetch(this.remoteLogUrl, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(logEntry),
-      });
+      const json = JSON.stringify(batch);
+      const { body, encoding } = unloading ? { body: json, encoding: null } : await this.compress(json);
+      const headers = { 'Content-Type': 'application/json' };
+      if (encoding) {
+        headers['Content-Encoding'] = encoding;
+      }
+      await fetch(this.remoteLogUrl, { method: 'POST', headers, body, keepalive: unloading });
     } catch (error) {
-      console.error('Failed to send log to remote:', error);
+      console.error('Failed to send logs to remote:', error);
     }
   }
 
@@ -359,6 +396,11 @@ window.addEventListener('error', (event) => {
   });
 });
 
+// Send whatever is still queued when the page is hidden or closed
+window.addEventListener('pagehide', () => {
+  logger.flushRemote({ unloading: true });
+});
+
 // Unhandled promise rejection handler
 window.addEventListener('unhandledrejection', (event) => {
   logger.error('Unhandled Promise Rejection', {
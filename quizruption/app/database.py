@@ -1,13 +1,32 @@
-# SQLite connection setup
+# Database connection setup: SQLite by default, any SQLAlchemy URL (e.g. PostgreSQL) via DATABASE_URL
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./quizruption.db"
+from app.config import settings
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """SQLite connections usable from any thread; a tuned QueuePool for server databases"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(
+        url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        # Replace connections the server dropped (restarts, idle timeouts) instead of failing a request
+        pool_pre_ping=True,
+        # Reuse the most recent connection so surplus ones go idle and are recycled
+        pool_use_lifo=True,
+    )
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -2,37 +2,48 @@
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from app.database import engine, Base
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from app.database import engine, SessionLocal
 from app.config import settings
-from app.routes import quizzes, answers, results, auth, chat, uploads
+# Routers and services load eagerly because every route must be registered before the first
+# request; what made that slow (openai, httpx, PIL, tiktoken, werkzeug) is imported inside the
+# functions that use it instead (see app/tests/test_startup.py)
+from app.routes import quizzes, answers, results, auth, chat, uploads, logs, admin
 from app.routes import jokes
+from app.services.image_service import image_pipeline, run_garbage_collector
+from app.services.chat_service import chat_service
+from app.services import joke_service
+from app.services.client_log_service import client_log_sink, MAX_BODY_BYTES as CLIENT_LOG_MAX_BODY
+from app.utils.upload_utils import UploadSizeLimitMiddleware, MULTIPART_OVERHEAD
+from app.utils.static_files import UploadStaticFiles
+from app.utils.rate_limit import RateLimitMiddleware, SQLiteBucketStore, rate_limit_stats
+from app.utils.log_utils import LOG_PATH, RequestIdMiddleware, setup_logging, stop_logging
+from app.utils import metrics
+from app.utils.query_monitor import QueryBudgetExceeded, monitor_engine
+from app.utils.profiler import ProfilingMiddleware
+import asyncio
 import logging
-from logging.handlers import RotatingFileHandler
 import os
 
 # Load environment variables from .env file
 load_dotenv()
 
-"""Configure application logging to file and create DB tables."""
-# Ensure logs directory (optional); write in app root by default
-log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app.log')
-log_path = os.path.normpath(log_path)
-
-root_logger = logging.getLogger()
-if not any(isinstance(h, RotatingFileHandler) for h in root_logger.handlers):
-    root_logger.setLevel(logging.INFO)
-    file_handler = RotatingFileHandler(log_path, maxBytes=1_048_576, backupCount=3)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
-    root_logger.addHandler(file_handler)
-    root_logger.info(f"Logging initialized. Writing to {log_path}")
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+"""Configure application logging to file. Tables are created by the migration step (python -m app.migrations)."""
+# Handlers only enqueue records; a background thread writes JSON lines to app.log (tailed by the log view).
+# Workers started together share the file, so only a lone process rotates it.
+setup_logging(settings.log_level, settings.log_json, settings.log_debug_sample_rate,
+              rotate=settings.worker_processes == 1)
+logging.getLogger().info(f"Logging initialized. Writing to {LOG_PATH}")
 
 app = FastAPI(title="Quizruption API", description="Interactive Quiz Web App API", version="1.0.0")
 
+# Token-bucket limits on write endpoints; added before CORS so 429s still carry CORS headers
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=SQLiteBucketStore(settings.rate_limit_db) if settings.rate_limit_db else None,
+    )
+
 # CORS middleware for frontend access
 cors_origins = settings.cors_origins
 app.add_middleware(
@@ -43,6 +54,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cut off oversized upload bodies while they stream in, before multipart parsing buffers them
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=uploads.MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+    path_prefix="/api/upload",
+)
+
+# Same streaming cap for frontend log batches
+app.add_middleware(UploadSizeLimitMiddleware, max_body_size=CLIENT_LOG_MAX_BODY, path_prefix="/api/logs/ingest")
+
+# Opt-in per-request profiling (X-Profile: 1 with the admin token); other requests pass straight through
+app.add_middleware(ProfilingMiddleware)
+
+# Per-route latency, response size and query counts; wraps everything but the request id.
+# Query budgets rely on its per-request statement count, so enforcing them installs it too.
+if settings.metrics_enabled or settings.query_budget_enforce:
+    metrics.instrument_engine(engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+monitor_engine(engine)
+
+# Outermost, so every log record of a request (rate limiting included) carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth.router)  # auth router now carries its own /api/auth prefix
 app.include_router(quizzes.router, prefix="/api/quizzes", tags=["quizzes"])
@@ -51,35 +85,64 @@ app.include_router(results.router, prefix="/api/results", tags=["results"])
 app.include_router(jokes.router, prefix="/api/jokes", tags=["jokes"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(uploads.router)  # uploads router carries its own /api/upload prefix
+app.include_router(logs.router)  # logs router carries its own /api/logs prefix
+app.include_router(admin.router)  # admin router carries its own /api/admin prefix
 
-# Serve uploaded files statically
+# Serve uploaded files statically (immutable caching for content-addressed files, ETag, ranges)
 upload_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
 os.makedirs(upload_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=upload_dir), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory=upload_dir), name="uploads")
 
 # Serve personality images statically
 personality_images_dir = os.path.join(upload_dir, 'personality_images')
 os.makedirs(personality_images_dir, exist_ok=True)
 
-# Immediate route enumeration for debugging (before startup event)
-for route in app.routes:
-    logging.getLogger().info(f"(early) Route registered: {getattr(route, 'path', 'unknown')} -> {getattr(route, 'name', '')}")
+@app.exception_handler(QueryBudgetExceeded)
+async def _query_budget_exceeded(request, exc: QueryBudgetExceeded):
+    logging.getLogger(__name__).error(str(exc))
+    return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 @app.on_event("startup")
 async def _setup_logging_after_startup():
-    root_logger = logging.getLogger()
-    if not any(isinstance(h, RotatingFileHandler) for h in root_logger.handlers):
-        file_handler = RotatingFileHandler(log_path, maxBytes=1_048_576, backupCount=3)
-        file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
-        root_logger.addHandler(file_handler)
-    root_logger.setLevel(logging.INFO)
-    root_logger.info("Logging configured after startup.")
-    # Log registered routes for debugging router inclusion issues
-    try:
-        for route in app.routes:
-            root_logger.info(f"Route registered: {getattr(route, 'path', 'unknown')} -> {getattr(route, 'name', '')}")
-    except Exception as e:
-        root_logger.warning(f"Failed to list routes: {e}")
+    # Restarts the log writer if a previous shutdown stopped it
+    setup_logging(settings.log_level, settings.log_json, settings.log_debug_sample_rate,
+                  rotate=settings.worker_processes == 1)
+    logging.getLogger().info("Logging configured after startup.")
+
+@app.on_event("startup")
+async def _start_image_gc():
+    if settings.image_gc_interval > 0:
+        app.state.image_gc_task = asyncio.create_task(run_garbage_collector(
+            SessionLocal, uploads.UPLOAD_DIR.parent, settings.image_gc_interval, settings.image_gc_grace
+        ))
+
+@app.on_event("startup")
+async def _start_joke_pregenerator():
+    if settings.joke_pregenerate_interval > 0:
+        app.state.joke_pregenerate_task = asyncio.create_task(joke_service.run_joke_pregenerator(
+            SessionLocal, settings.joke_pregenerate_interval
+        ))
+
+@app.on_event("startup")
+async def _start_client_log_sink():
+    client_log_sink.start()
+
+@app.on_event("shutdown")
+async def _shutdown_image_pipeline():
+    for task_name in ("image_gc_task", "joke_pregenerate_task"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    await image_pipeline.drain()
+    image_pipeline.shutdown()
+    await chat_service.aclose()
+    await joke_service.close_http_client()
+    client_log_sink.stop()
+
+@app.on_event("shutdown")
+async def _stop_logging():
+    # Last, so records from the other shutdown hooks are flushed too
+    stop_logging()
 
 @app.get("/")
 async def root():
@@ -98,3 +161,13 @@ async def demo():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Request and database metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/rate-limit/stats")
+async def rate_limit_statistics():
+    """Requests allowed per rate-limit rule and rejected requests by reason"""
+    return rate_limit_stats()
@@ -0,0 +1,66 @@
+# Schema setup, run once per deploy before workers start: python -m app.migrations
+import logging
+
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from app import models  # also registers every table on Base.metadata
+from app.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+# Columns added to tables that databases created by older versions already have
+ADDED_COLUMNS = [
+    ("joke_suggestions", "theme_key"),
+]
+
+
+def _add_missing_columns(bind) -> set:
+    """ALTER in every column of ADDED_COLUMNS an existing table lacks; returns the tables changed."""
+    inspector = inspect(bind)
+    changed = set()
+    with bind.begin() as conn:
+        for table_name, column_name in ADDED_COLUMNS:
+            if column_name in {col["name"] for col in inspector.get_columns(table_name)}:
+                continue
+            column = Base.metadata.tables[table_name].c[column_name]
+            column_type = column.type.compile(dialect=bind.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+            logger.info(f"Added column {table_name}.{column_name}")
+            changed.add(table_name)
+        # create_all only indexes the tables it creates
+        for table_name in changed:
+            for index in Base.metadata.tables[table_name].indexes:
+                index.create(conn, checkfirst=True)
+    return changed
+
+
+def _backfill_theme_keys(bind, batch_size: int = 500):
+    """Key suggestions stored before theme_key existed, exactly as new ones are keyed."""
+    from app.services.joke_service import normalize_theme
+
+    suggestion = models.JokeSuggestion.__table__
+    with bind.begin() as conn:
+        rows = conn.execute(
+            select(suggestion.c.id, suggestion.c.suggestion_text).where(suggestion.c.theme_key.is_(None))
+        ).all()
+        for start in range(0, len(rows), batch_size):
+            conn.execute(
+                update(suggestion).where(suggestion.c.id == bindparam("row_id")).values(theme_key=bindparam("key")),
+                [{"row_id": row_id, "key": normalize_theme(value)} for row_id, value in rows[start:start + batch_size]],
+            )
+    if rows:
+        logger.info(f"Backfilled theme_key for {len(rows)} joke suggestion(s)")
+
+
+def migrate(bind=None):
+    """Create missing tables and add columns newer models expect; existing rows are kept."""
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+    _backfill_theme_keys(bind)
+    logger.info(f"Database schema is up to date ({bind.url.render_as_string(hide_password=True)})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    migrate()
@@ -1,8 +1,7 @@
 # SQLAlchemy models for quizzes, questions, answers, results, users
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.database import Base
 
 
@@ -30,10 +29,13 @@ class User(Base):
     
     def set_password(self, password):
         """Hash and set password"""
+        # werkzeug's package import pulls in its dev server and test client (~40 ms); defer it
+        from werkzeug.security import generate_password_hash
         self.password_hash = generate_password_hash(password)
     
     def check_password(self, password):
         """Check if provided password matches hash"""
+        from werkzeug.security import check_password_hash
         return check_password_hash(self.password_hash, password)
     
     def to_dict(self):
@@ -140,13 +142,64 @@ class DailyJoke(Base):
     created_at = Column(DateTime, server_default=func.now())
 
 
+class GenerationLease(Base):
+    """Short-lived claim so only one worker generates a shared item (e.g. a day's joke)."""
+    __tablename__ = "generation_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class UploadJob(Base):
+    """Status of a background image job, readable by whichever worker a poll reaches."""
+    __tablename__ = "upload_jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    image_url = Column(String)
+    error = Column(Text)
+    size = Column(Integer)
+    variants = Column(Text)  # JSON list from the variant manifest
+    deduplicated = Column(Boolean, default=False)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+
+
+class ChatSession(Base):
+    """A Terry chat conversation, continued by whichever worker the next message reaches."""
+    __tablename__ = "chat_sessions"
+
+    id = Column(String, primary_key=True)
+    messages = Column(Text, nullable=False)  # JSON list of {"role", "content"}, oldest first
+    updated_at = Column(DateTime, nullable=False, index=True)
+
+
+class CacheVersion(Base):
+    """Change counter for a cached data set; every worker drops its copies once it moves."""
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
 class JokeSuggestion(Base):
     __tablename__ = "joke_suggestions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     suggestion_text = Column(Text, nullable=False)
+    theme_key = Column(String)  # normalized text; identical themes share a key
     user_id = Column(Integer, ForeignKey("users.id"))
     used = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
     
     user = relationship("User", back_populates="joke_suggestions")
+
+    # Only unused rows are ever queued, so only they are indexed
+    __table_args__ = (
+        Index(
+            "ix_joke_suggestions_unused_theme", "theme_key", "created_at",
+            sqlite_where=used == False, postgresql_where=used == False,
+        ),
+    )
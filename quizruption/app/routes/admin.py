@@ -0,0 +1,56 @@
+# Operator-only diagnostics: live sampling profiles of this worker, shared cache versions
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.utils.admin_auth import require_admin
+from app.utils.profiler import DEFAULT_INTERVAL, MAX_SECONDS, profile_for, request_profiles
+from app.utils.shared_cache import bump_version, caches
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get('/profile', response_class=PlainTextResponse, summary='Profile this worker',
+            description='Samples every thread of the worker handling this request for the given time and returns '
+                        'collapsed stacks (one "frame;frame;frame count" line per stack) for flamegraph tools.')
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=MAX_SECONDS),
+    interval_ms: float = Query(DEFAULT_INTERVAL * 1000, ge=1, le=1000),
+):
+    try:
+        profiler = await profile_for(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+
+@router.get('/profiles', summary='Recent per-request profiles')
+def list_request_profiles():
+    return [
+        {"id": profile_id, "request": p["request"], "duration_ms": p["duration_ms"], "samples": p["samples"]}
+        for profile_id, p in reversed(request_profiles.items())
+    ]
+
+
+@router.get('/profiles/{profile_id}', response_class=PlainTextResponse, summary='Collapsed stacks of one request')
+def get_request_profile(profile_id: str):
+    profile = request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"], headers={"X-Profile-Samples": str(profile["samples"])})
+
+
+@router.get('/caches', summary="This worker's shared-nothing caches")
+def list_caches():
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+@router.post('/caches/{name}/invalidate', summary='Drop a cached data set in every worker',
+             description='For data changed outside the API (manual SQL, seed scripts run against a live database).')
+def invalidate_cache(name: str, db: Session = Depends(get_db)):
+    if name not in caches:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown cache")
+    version = bump_version(db, name)
+    db.commit()
+    return {"name": name, "version": version}
@@ -1,10 +1,13 @@
 # Authentication routes for user login and registration
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, contains_eager
 from pydantic import BaseModel
 from app.database import get_db
 from app.config import settings
-from app.models import User, Quiz, Result, JokeSuggestion
+from app.models import User, Quiz, Question, Result, JokeSuggestion
+from app.services.quiz_service import creator_changed
+from app.utils.query_monitor import query_budget
 from app import schemas
 import jwt
 import logging
@@ -163,6 +166,7 @@ async def update_profile(
     if profile_data.profile_image_url is not None:
         user.profile_image_url = profile_data.profile_image_url
     
+    creator_changed(db, user.id)
     db.commit()
     db.refresh(user)
     
@@ -180,6 +184,7 @@ async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/profile/{user_id}/stats")
+@query_budget(8)
 async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
     """Get user statistics including quizzes created, taken, and personality traits"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -190,12 +195,20 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
     quizzes_created = db.query(Quiz).filter(Quiz.created_by == user_id).all()
     
     # Get quizzes taken by user (results) - include quiz information
-    results = db.query(Result).join(Quiz, Result.quiz_id == Quiz.id).filter(Result.user_id == user_id).order_by(Result.created_at.desc()).all()
+    results = db.query(Result).join(Quiz, Result.quiz_id == Quiz.id).options(contains_eager(Result.quiz))\
+        .filter(Result.user_id == user_id).order_by(Result.created_at.desc()).all()
     
     # Get personality results (separate from trivia)
     personality_results = [r for r in results if r.personality]
     trivia_results = [r for r in results if r.score is not None and not r.personality]
     
+    # Question counts for the trivia quizzes taken, in one grouped query
+    trivia_quiz_ids = {r.quiz_id for r in trivia_results}
+    question_counts = dict(
+        db.query(Question.quiz_id, func.count(Question.id))
+        .filter(Question.quiz_id.in_(trivia_quiz_ids)).group_by(Question.quiz_id).all()
+    ) if trivia_quiz_ids else {}
+    
     # Get unique personality traits discovered
     personality_traits = list(set([r.personality for r in personality_results]))
     
@@ -244,7 +257,7 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
                 "quiz_id": r.quiz_id,
                 "quiz_title": r.quiz.title if r.quiz else "Unknown Quiz",
                 "score": r.score,
-                "total_questions": r.quiz.questions.count() if r.quiz else 0,
+                "total_questions": question_counts.get(r.quiz_id, 0),
                 "created_at": r.created_at.isoformat() if r.created_at else None
             } for r in trivia_results
         ],
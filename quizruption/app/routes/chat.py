@@ -1,9 +1,14 @@
 """Chat routes for turtle chatbot."""
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from contextlib import aclosing
+import json
 import logging
-from app.services.chat_service import chat_service
+import anyio
+from starlette.concurrency import run_in_threadpool
+from app.services.chat_service import FALLBACK_MESSAGE, ChatSession, chat_service, chat_sessions
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -18,13 +23,44 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     """Schema for chat request."""
     message: str = Field(..., description="User's message to the chatbot")
-    conversation_history: Optional[List[ChatMessage]] = Field(default=None, description="Previous conversation messages")
+    session_id: Optional[str] = Field(default=None, description="Server-side chat session to continue")
+    conversation_history: Optional[List[ChatMessage]] = Field(
+        default=None,
+        description="Previous messages as the client has them; continues the conversation when the session is unknown",
+    )
 
 
 class ChatResponse(BaseModel):
     """Schema for chat response."""
     response: str = Field(..., description="Chatbot's response")
     success: bool = Field(default=True, description="Whether the request was successful")
+    session_id: Optional[str] = Field(default=None, description="Session to send with the next message")
+
+
+class ChatStreamResponse(StreamingResponse):
+    """StreamingResponse that always closes its body iterator.
+
+    Starlette cancels the send loop when the client disconnects but leaves the
+    generator suspended; closing it here cancels the upstream completion right away.
+    """
+
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+def _resolve_history(request: ChatRequest) -> Tuple[Optional[ChatSession], Optional[list]]:
+    history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history or []]
+    # Legacy clients send only their own history and get no session
+    if history and not request.session_id:
+        return None, history
+    # A session this process does not know (expired, or held by another worker) continues
+    # from the client's copy of the conversation instead of starting empty
+    session = chat_sessions.get_or_create(request.session_id, history)
+    return session, session.history()
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -33,19 +69,67 @@ async def chat(request: ChatRequest):
     Send a message to Terry the Turtle chatbot.
     
     - **message**: The user's message
-    - **conversation_history**: Optional list of previous messages for context
+    - **session_id**: Session returned by the previous reply; omit to start a new conversation
+    - **conversation_history**: The conversation so far, used when the session is unknown here
     """
     try:
-        # Convert Pydantic models to dicts for the service
-        history = None
-        if request.conversation_history:
-            history = [{"role": msg.role, "content": msg.content} for msg in request.conversation_history]
+        session, history = await run_in_threadpool(_resolve_history, request)
         
         # Get response from chat service
         response_text = await chat_service.get_response(request.message, history)
+        if session is not None:
+            await run_in_threadpool(chat_sessions.record, session, request.message, response_text)
         
-        return ChatResponse(response=response_text, success=True)
+        return ChatResponse(response=response_text, success=True, session_id=session.id if session else None)
         
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate chat response")
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream Terry's reply as newline-delimited JSON while it is generated.
+    
+    Each line is ``{"delta": "..."}``; the last line is ``{"done": true, "session_id": ...}``.
+    Tokens are forwarded as they arrive, so the first bytes go out long before
+    the full completion is ready. Only completed replies are added to the session.
+    """
+    session, history = await run_in_threadpool(_resolve_history, request)
+    session_id = session.id if session else None
+
+    async def ndjson():
+        parts = []
+        failed = False
+        async with aclosing(chat_service.stream_response(request.message, history)) as deltas:
+            async for delta in deltas:
+                # A stream that breaks partway ends with the fallback message after the partial tokens
+                failed = failed or delta == FALLBACK_MESSAGE
+                parts.append(delta)
+                yield json.dumps({"delta": delta}) + "\n"
+        if session is not None and not failed:
+            await run_in_threadpool(chat_sessions.record, session, request.message, "".join(parts))
+        yield json.dumps({"done": True, "session_id": session_id}) + "\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session_id:
+        headers["X-Chat-Session"] = session_id
+    return ChatStreamResponse(ndjson(), media_type="application/x-ndjson", headers=headers)
+
+
+@router.delete("/chat/sessions/{session_id}", status_code=204)
+def end_chat_session(session_id: str):
+    """Forget a chat session (e.g. when the user starts over)."""
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+
+@router.get("/chat/stats")
+def chat_stats():
+    """Reply cache hit rate, upstream token usage and live session count."""
+    return {
+        "cache": chat_service.cache.stats(),
+        "tokens": chat_service.usage.stats(),
+        "sessions": len(chat_sessions),
+    }
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import get_db
-from app.services.joke_service import get_daily_joke
+from app.services.joke_service import get_daily_joke, joke_pool, normalize_theme, seconds_until_midnight
 from app.models import JokeSuggestion
+from app.utils.rate_limit import RecentHashes, client_key, rejections
+from app.utils.log_utils import MAX_LINES, follow_log, tail_log
 from pydantic import BaseModel
 from typing import Optional
-import os
 
 router = APIRouter()
 
+# Themes each client suggested recently, so resubmissions are not stored again
+_recent_suggestions = RecentHashes(ttl=settings.suggestion_dedup_window)
+
 
 class SuggestionRequest(BaseModel):
     suggestion_text: str
@@ -16,14 +21,32 @@ class SuggestionRequest(BaseModel):
 
 
 @router.get('/daily', summary='Get today\'s joke', description='Returns a single AI (or fallback) generated joke cached for the day.')
-def daily_joke(db: Session = Depends(get_db)):
-    return get_daily_joke(db)
+async def daily_joke():
+    # Served from the in-process cache; browsers and proxies may keep it until midnight too
+    joke = await get_daily_joke()
+    return Response(
+        content=joke.body,
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={seconds_until_midnight()}"},
+    )
+
+
+@router.get('/random', summary='Get another joke', description='Returns a prepared joke from the pool, never waiting on the model.')
+async def random_joke(response: Response):
+    joke, source = joke_pool.take_or_fallback()
+    response.headers["Cache-Control"] = "no-store"
+    return {"joke": joke, "source": source}
 
 
 @router.post('/suggestions', summary='Submit joke theme suggestion', description='Allows users to suggest themes for future daily jokes.')
-def create_suggestion(suggestion: SuggestionRequest, db: Session = Depends(get_db)):
+def create_suggestion(suggestion: SuggestionRequest, request: Request, db: Session = Depends(get_db)):
+    theme_key = normalize_theme(suggestion.suggestion_text)
+    if _recent_suggestions.check_and_add(RecentHashes.digest(client_key(request.scope), theme_key)):
+        rejections["duplicate:suggestions"] += 1
+        return {"success": True, "message": "Thanks! We already have that suggestion.", "duplicate": True}
     new_suggestion = JokeSuggestion(
         suggestion_text=suggestion.suggestion_text,
+        theme_key=theme_key,
         user_id=suggestion.user_id,
         used=False
     )
@@ -33,15 +56,15 @@ def create_suggestion(suggestion: SuggestionRequest, db: Session = Depends(get_d
     return {"success": True, "message": "Thank you for your suggestion!"}
 
 
-@router.get('/logs', summary='View recent application logs', description='Returns recent backend logs to help diagnose OpenAI requests.')
-def get_logs():
-    log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app.log')
-    log_path = os.path.normpath(log_path)
-    try:
-        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        # Return last ~4000 characters to avoid huge payloads
-        tail = content[-4000:] if len(content) > 4000 else content
-        return {"log_tail": tail}
-    except FileNotFoundError:
-        return {"log_tail": "No log file yet. Trigger endpoints to generate logs."}
+@router.get('/logs', summary='View recent application logs', description='Returns recent backend log lines, optionally filtered by level, or only the lines written since a previous cursor.')
+def get_logs(
+    lines: int = Query(100, ge=1, le=MAX_LINES),
+    level: Optional[str] = Query(None, description="Minimum level, e.g. WARNING"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous response; returns only newer lines"),
+):
+    # Reads backwards from the end of the file, so a poll costs a few KB whatever the log size
+    result = follow_log(cursor, level) if cursor else tail_log(lines, level)
+    if result["cursor"] is None:
+        return {"lines": [], "cursor": None, "log_tail": "No log file yet. Trigger endpoints to generate logs."}
+    # log_tail keeps the old single-string shape for existing clients
+    return {**result, "log_tail": "\n".join(result["lines"])}
@@ -0,0 +1,38 @@
+# Ingestion of frontend logger batches
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+from app.services.client_log_service import (
+    client_log_sink, clean_event, decode_batch, BatchTooLargeError, InvalidBatchError, MAX_BATCH_BYTES,
+)
+
+router = APIRouter(prefix="/api/logs", tags=["logs"])
+
+
+@router.post('/ingest', status_code=status.HTTP_202_ACCEPTED, summary='Ingest frontend log events',
+             description='Accepts a JSON array of log events, optionally gzip-compressed (Content-Encoding: gzip).')
+async def ingest_logs(request: Request):
+    # The body is capped by UploadSizeLimitMiddleware before it gets here
+    body = await request.body()
+    try:
+        events = decode_batch(body, request.headers.get("content-encoding", ""), MAX_BATCH_BYTES)
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except InvalidBatchError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    cleaned = [event for event in map(clean_event, events) if event is not None]
+    rejected = len(events) - len(cleaned)
+    if cleaned and not client_log_sink.submit(cleaned):
+        # Telemetry is best effort: tell the client to back off rather than retry immediately
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"accepted": 0, "rejected": len(events)},
+            headers={"Retry-After": "30"},
+        )
+    return {"accepted": len(cleaned), "rejected": rejected}
+
+
+@router.get('/ingest/stats', summary='Frontend log ingestion counters')
+def ingest_stats():
+    return client_log_sink.snapshot()
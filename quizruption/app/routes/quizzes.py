@@ -1,10 +1,11 @@
 # Endpoints for quiz CRUD
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app import schemas
 from app.services import quiz_service
+from app.utils.query_monitor import query_budget
 
 router = APIRouter()
 
@@ -16,6 +17,7 @@ async def create_quiz(quiz: schemas.QuizCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[schemas.Quiz])
+@query_budget(4)
 async def get_quizzes(
     quiz_type: str = None,
     skip: int = 0,
@@ -23,16 +25,19 @@ async def get_quizzes(
     db: Session = Depends(get_db)
 ):
     """List all available quizzes with optional filters"""
-    return quiz_service.get_quizzes(db, quiz_type=quiz_type, skip=skip, limit=limit)
+    # Pre-serialized and cached per worker; any quiz write invalidates it in every worker
+    body = quiz_service.get_quizzes_json(db, quiz_type=quiz_type, skip=skip, limit=limit)
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{quiz_id}", response_model=schemas.Quiz)
+@query_budget(4)
 async def get_quiz(quiz_id: int, db: Session = Depends(get_db)):
     """Get a specific quiz by ID"""
-    quiz = quiz_service.get_quiz(db, quiz_id)
-    if not quiz:
+    body = quiz_service.get_quiz_json(db, quiz_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    return quiz
+    return Response(content=body, media_type="application/json")
 
 
 @router.put("/{quiz_id}", response_model=schemas.Quiz)
@@ -1,10 +1,13 @@
 # Calculate and return results
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from app.database import get_db
 from app import schemas
-from app.services import result_service
+from app.services import result_service, share_service
+from app.utils.static_files import etag_matches
 
 router = APIRouter()
 
@@ -18,6 +21,31 @@ async def get_result(result_id: int, db: Session = Depends(get_db)):
     return result
 
 
+@router.get("/{result_id}/share.{ext}")
+async def get_result_share_image(
+    result_id: int,
+    ext: str,
+    request: Request,
+    v: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Share card image for a result (PNG or WebP), rendered once and cached on disk"""
+    if ext not in share_service.SHARE_CARD_FORMATS:
+        raise HTTPException(status_code=404, detail="Unsupported share image format")
+    # Async for the shared render below; the lookup itself is a blocking query
+    spec = await run_in_threadpool(share_service.get_card_spec, db, result_id)
+    if not spec:
+        raise HTTPException(status_code=404, detail="Result not found")
+    # URLs carrying the current version (?v=...) never change content
+    cache_control = "public, max-age=31536000, immutable" if v == spec["version"] else "public, max-age=300"
+    headers = {"Cache-Control": cache_control, "ETag": f'"{spec["version"]}-{ext}"'}
+    # The version is known before rendering, so revalidation never touches the card file
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    path = await share_service.get_share_card(spec, ext)
+    return FileResponse(path, media_type=f"image/{ext}", headers=headers)
+
+
 @router.get("/quiz/{quiz_id}", response_model=List[schemas.ResultResponse])
 async def get_quiz_results(
     quiz_id: int,
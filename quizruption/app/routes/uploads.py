@@ -1,17 +1,19 @@
 # Image upload routes
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request, status
+from fastapi.responses import JSONResponse, FileResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.models import User
+from app.services.image_service import (
+    image_pipeline, ImageQueueFullError, IMAGE_CATEGORIES, FORMAT_MIME_TYPES,
+    load_manifest, select_variant, release_image, is_content_addressed,
+)
+from app.services.quiz_service import creator_changed
+from app.utils.upload_utils import read_image_upload
 import jwt
-import os
-import uuid
 import logging
 from pathlib import Path
-import shutil
-from PIL import Image
-import io
 
 router = APIRouter(prefix="/api/upload", tags=["uploads"])
 
@@ -29,32 +31,52 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 # Maximum file size (5MB)
 MAX_FILE_SIZE = 5 * 1024 * 1024
 
+# Maximum decoded image size, checked from the header before decoding
+MAX_IMAGE_PIXELS = 40_000_000
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 
-def process_image(file_content: bytes, max_size: tuple = (800, 800)) -> bytes:
-    """Process and resize image"""
+
+def _raise_queue_full(e: ImageQueueFullError):
+    logger.warning(f"Image upload rejected - {str(e)}")
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Image processing queue is full, please retry shortly",
+        headers={"Retry-After": "5"},
+    )
+
+
+def _set_profile_image(user_id: int, image_url: str):
+    """Point the user at their processed image once the pipeline has stored it"""
+    db = SessionLocal()
     try:
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Convert to RGB if necessary
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        
-        # Resize image if it's too large
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        output = io.BytesIO()
-        image.save(output, format='JPEG', quality=85, optimize=True)
-        return output.getvalue()
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+        user = db.query(User).filter(User.id == user_id).first()
+        if user:
+            previous_url = user.profile_image_url
+            user.profile_image_url = image_url
+            creator_changed(db, user_id)
+            db.commit()
+            # The replaced image goes away unless another profile or quiz shares it (or it was
+            # just deduplicated onto; the garbage collector takes it after the grace period then)
+            if previous_url and previous_url != image_url:
+                release_image(db, previous_url, UPLOAD_DIR.parent, settings.image_gc_grace)
+    finally:
+        db.close()
+
+
+def _pending_response(job, message: str):
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "message": message,
+            "image_url": job.image_url,
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/upload/jobs/{job.id}",
+        }
+    )
+
 
 @router.post("/profile-image")
 async def upload_profile_image(
@@ -64,7 +86,7 @@ async def upload_profile_image(
 ):
     """Upload and process profile image"""
     
-    logger.info(f"Profile image upload attempt - filename: {image.filename}, content_type: {image.content_type}")
+    logger.debug(f"Profile image upload attempt - filename: {image.filename}, content_type: {image.content_type}")
     
     # Verify authentication
     try:
@@ -83,7 +105,7 @@ async def upload_profile_image(
         logger.error(f"Profile image upload failed - user not found: {username}")
         raise HTTPException(status_code=404, detail="User not found")
     
-    logger.info(f"Profile image upload for user: {user.username} (ID: {user.id})")
+    logger.debug(f"Profile image upload for user: {user.username} (ID: {user.id})")
     
     # Validate file
     if not image.content_type or not image.content_type.startswith('image/'):
@@ -100,46 +122,30 @@ async def upload_profile_image(
         )
     
     try:
-        # Read file content
-        file_content = await image.read()
-        
-        # Check file size
-        if len(file_content) > MAX_FILE_SIZE:
-            logger.warning(f"Profile image upload failed - file too large: {len(file_content)} bytes")
-            raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB")
-        
-        logger.info(f"Processing image - size: {len(file_content)} bytes")
-        
-        # Process image
-        processed_content = process_image(file_content)
-        
-        # Generate unique filename
-        filename = f"{user.id}_{uuid.uuid4().hex}.jpg"
-        file_path = UPLOAD_DIR / filename
-        
-        logger.info(f"Saving profile image to: {file_path}")
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(processed_content)
+        # Read file content in chunks, aborting early on size or pixel-count limits
+        file_content = await read_image_upload(
+            image, MAX_FILE_SIZE, MAX_IMAGE_PIXELS, too_large_detail="File too large. Maximum size is 5MB"
+        )
         
-        # Create URL (in production, this would be a proper URL)
-        image_url = f"/uploads/profile_images/{filename}"
+        logger.debug(f"Queueing image for processing - size: {len(file_content)} bytes")
         
-        # Update user's profile image URL
-        user.profile_image_url = image_url
-        db.commit()
+        # Process and store by content hash off the event loop; the user row is updated once stored
+        user_id = user.id
+        try:
+            job = await image_pipeline.submit(
+                "profile",
+                file_content,
+                (800, 800),
+                UPLOAD_DIR,
+                "/uploads/profile_images",
+                on_complete=lambda job: _set_profile_image(user_id, job.image_url),
+            )
+        except ImageQueueFullError as e:
+            _raise_queue_full(e)
         
-        logger.info(f"Profile image uploaded successfully for user {user.username}: {image_url}")
+        logger.info(f"Profile image queued for user {user.username}: job {job.id}")
         
-        return JSONResponse(
-            status_code=200,
-            content={
-                "message": "Image uploaded successfully",
-                "image_url": image_url,
-                "filename": filename
-            }
-        )
+        return _pending_response(job, "Image upload accepted for processing")
         
     except HTTPException:
         raise
@@ -168,20 +174,20 @@ async def delete_profile_image(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Remove file if it exists
-    if user.profile_image_url:
-        try:
-            filename = Path(user.profile_image_url).name
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+    previous_url = user.profile_image_url
     
     # Update user
     user.profile_image_url = None
+    creator_changed(db, user.id)
     db.commit()
     
+    # Remove the files unless another profile or quiz still uses the same image
+    if previous_url:
+        try:
+            release_image(db, previous_url, UPLOAD_DIR.parent, settings.image_gc_grace)
+        except Exception as e:
+            logger.warning(f"Error deleting profile image {previous_url}: {e}")
+    
     return JSONResponse(
         status_code=200,
         content={"message": "Profile image deleted successfully"}
@@ -222,33 +228,61 @@ async def upload_personality_image(
         )
     
     try:
-        # Read file content
-        file_content = await image.read()
-        
-        # Check file size
-        if len(file_content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File too large (max 5MB)")
-        
-        # Process image
-        processed_content = process_image(file_content, max_size=(400, 400))
-        
-        # Create unique filename
-        unique_filename = f"personality_{uuid.uuid4()}{file_extension}"
-        
-        # Create personality images directory
-        personality_dir = UPLOAD_DIR.parent / "personality_images"
-        personality_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = personality_dir / unique_filename
-        
-        # Save processed image
-        with open(file_path, "wb") as f:
-            f.write(processed_content)
+        # Read file content in chunks, aborting early on size or pixel-count limits
+        file_content = await read_image_upload(
+            image, MAX_FILE_SIZE, MAX_IMAGE_PIXELS, too_large_detail="File too large (max 5MB)"
+        )
         
-        # Return the image URL
-        image_url = f"/uploads/personality_images/{unique_filename}"
+        try:
+            job = await image_pipeline.submit(
+                "personality",
+                file_content,
+                (400, 400),
+                UPLOAD_DIR.parent / "personality_images",
+                "/uploads/personality_images",
+            )
+        except ImageQueueFullError as e:
+            _raise_queue_full(e)
         
-        return JSONResponse(content={"image_url": image_url})
+        return _pending_response(job, "Image upload accepted for processing")
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+
+@router.get("/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Poll the processing status of an uploaded image, whichever worker processes it"""
+    job = image_pipeline.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
+
+
+@router.get("/variants/{category}/{filename}")
+async def get_image_variant(category: str, filename: str, request: Request, size: int = 800):
+    """Serve the smallest variant of an uploaded image covering `size` pixels, in the best format the browser accepts"""
+    if category not in IMAGE_CATEGORIES or Path(filename).name != filename:
+        raise HTTPException(status_code=404, detail="Image not found")
+    image_path = UPLOAD_DIR.parent / category / filename
+    
+    # Content-addressed names never change meaning, so they can be cached forever
+    cache_control = (
+        "public, max-age=31536000, immutable" if is_content_addressed(filename) else "public, max-age=86400"
+    )
+    
+    manifest = load_manifest(image_path)
+    variant = select_variant(manifest, size, request.headers.get("accept", "")) if manifest else None
+    if variant:
+        return FileResponse(
+            image_path.with_name(Path(variant["url"]).name),
+            media_type=FORMAT_MIME_TYPES[variant["format"]],
+            headers={"Vary": "Accept", "Cache-Control": cache_control},
+        )
+    
+    # Images uploaded before variants existed only have the original
+    if not image_path.exists():
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(image_path, headers={"Cache-Control": cache_control})
@@ -0,0 +1,37 @@
+# Production entry point: python -m app.server migrates the schema once, then serves with WORKERS processes
+import logging
+import os
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count(configured: int = None) -> int:
+    """WORKERS from the settings, where 0 means one worker per CPU core."""
+    if configured is None:
+        return settings.worker_processes
+    return configured if configured > 0 else (os.cpu_count() or 1)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    from app.migrations import migrate
+
+    # Before any worker starts, so workers never race to create tables
+    migrate()
+    workers = worker_count()
+    if workers > 1 and settings.rate_limit_enabled and not settings.rate_limit_db:
+        logger.warning(
+            f"Rate-limit buckets are per worker without RATE_LIMIT_DB; clients get up to {workers}x the configured rates"
+        )
+    logger.info(f"Starting {workers} worker(s) on {settings.backend_host}:{settings.backend_port}")
+    # Each worker is a separate process importing app.main; caches stay coherent via the
+    # cache_versions table (see app/utils/shared_cache.py)
+    uvicorn.run("app.main:app", host=settings.backend_host, port=settings.backend_port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
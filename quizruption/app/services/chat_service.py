@@ -1,23 +1,257 @@
 """Chat service for turtle-style chatbot using OpenAI."""
 import os
+import json
+import time
+import asyncio
+import hashlib
 import logging
-from openai import OpenAI
+import secrets
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import anyio
 from dotenv import load_dotenv
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils.prompt_utils import PromptBuilder, PromptUsage, TokenUsageMetrics, count_tokens
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+NOT_CONFIGURED_MESSAGE = "🐢 Oh my... it seems I'm having trouble connecting right now. Please check if the OPENAI_API_KEY is configured."
+FALLBACK_MESSAGE = "🐢 Hmm... I seem to have retreated into my shell for a moment. Could you try asking me again?"
+
+@dataclass
+class ChatSession:
+    """A server-held conversation: a bounded ring buffer of recent messages."""
+    id: str
+    messages: Deque[dict]
+
+    def history(self) -> List[dict]:
+        return list(self.messages)
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, as stored in DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ChatSessionStore:
+    """Chat sessions in the chat_sessions table, so any worker can continue a conversation.
+
+    Sessions idle for ``idle_timeout`` seconds are dropped, and the least recently used
+    go first once there are ``max_sessions``. Every call is a short blocking query; async
+    callers run it in the threadpool.
+    """
+
+    def __init__(self, max_messages: int, idle_timeout: float, max_sessions: int, session_factory=SessionLocal):
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.session_factory = session_factory
+
+    def _cutoff(self, now: datetime) -> datetime:
+        return now - timedelta(seconds=self.idle_timeout)
+
+    def __len__(self) -> int:
+        db = self.session_factory()
+        try:
+            return db.query(models.ChatSession).filter(
+                models.ChatSession.updated_at >= self._cutoff(_utcnow())
+            ).count()
+        finally:
+            db.close()
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        now = _utcnow()
+        db = self.session_factory()
+        try:
+            row = db.get(models.ChatSession, session_id)
+            if row is None or row.updated_at < self._cutoff(now):
+                return None
+            row.updated_at = now
+            db.commit()
+            return ChatSession(id=row.id, messages=deque(json.loads(row.messages), maxlen=self.max_messages))
+        finally:
+            db.close()
+
+    def create(self, history: Optional[List[dict]] = None) -> ChatSession:
+        """Start a session, optionally continuing from a client-held ``history``."""
+        now = _utcnow()
+        session = ChatSession(id=secrets.token_urlsafe(16), messages=deque(history or (), maxlen=self.max_messages))
+        db = self.session_factory()
+        try:
+            sessions = db.query(models.ChatSession)
+            sessions.filter(models.ChatSession.updated_at < self._cutoff(now)).delete(synchronize_session=False)
+            excess = sessions.count() - self.max_sessions + 1
+            if excess > 0:
+                oldest = [row_id for row_id, in sessions.with_entities(models.ChatSession.id)
+                          .order_by(models.ChatSession.updated_at).limit(excess)]
+                sessions.filter(models.ChatSession.id.in_(oldest)).delete(synchronize_session=False)
+            db.add(models.ChatSession(id=session.id, messages=json.dumps(session.history()), updated_at=now))
+            db.commit()
+        finally:
+            db.close()
+        return session
+
+    def get_or_create(self, session_id: Optional[str], history: Optional[List[dict]] = None) -> ChatSession:
+        """Return the live session, or a new one (seeded with ``history``) when the id is missing, unknown or expired."""
+        session = self.get(session_id) if session_id else None
+        return session or self.create(history)
+
+    def record(self, session: ChatSession, user_message: str, reply: str):
+        """Append a completed exchange; failed replies are not kept as context."""
+        if reply in (FALLBACK_MESSAGE, NOT_CONFIGURED_MESSAGE):
+            return
+        session.messages.append({"role": "user", "content": user_message})
+        session.messages.append({"role": "assistant", "content": reply})
+        db = self.session_factory()
+        try:
+            # merge() also brings back a session evicted while the reply was generated
+            db.merge(models.ChatSession(id=session.id, messages=json.dumps(session.history()), updated_at=_utcnow()))
+            db.commit()
+        finally:
+            db.close()
+
+    def delete(self, session_id: str) -> bool:
+        db = self.session_factory()
+        try:
+            deleted = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).delete()
+            db.commit()
+            return deleted > 0
+        finally:
+            db.close()
+
+
+class ChatResponseCache:
+    """Exact-match TTL/LRU cache of chat replies with single-flight coalescing.
+
+    Keys are the normalized message plus the trimmed history actually sent upstream.
+    Concurrent identical prompts share one upstream request.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(user_message: str, conversation_history: list = None) -> str:
+        history = [[msg["role"], " ".join(msg["content"].split())] for msg in conversation_history or []]
+        normalized = " ".join(user_message.lower().split())
+        payload = json.dumps([normalized, history], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached reply, counting the lookup as a hit or a miss."""
+        reply = self._lookup(key)
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reply
+
+    def put(self, key: str, reply: str):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached reply, join an identical in-flight request, or call ``create``."""
+        reply = self._lookup(key)
+        if reply is not None:
+            self.hits += 1
+            return reply
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            reply = await create()
+            self.put(key, reply)
+            future.set_result(reply)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("Chat request cancelled"))
+            # Retrieve it so an unawaited failure is not reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        return reply
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        served = self.hits + self.coalesced
+        total = served + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(served / total, 4) if total else 0.0,
+        }
+
+
 class TurtleChatService:
     """Service for handling chat interactions with a turtle persona."""
     
-    def __init__(self):
-        """Initialize the OpenAI client."""
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ChatResponseCache] = None,
+        history_token_budget: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+    ):
+        """Configure the service; the OpenAI client is created on first use."""
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
             logger.warning("OPENAI_API_KEY not set. Chat service will not function.")
-        self.client = OpenAI(api_key=api_key) if api_key else None
+        self.base_url = base_url or settings.openai_base_url
+        self.timeout = timeout or settings.chat_timeout
+        self.max_concurrency = max_concurrency or settings.chat_max_concurrency
+        self.cache = cache or ChatResponseCache(settings.chat_cache_ttl, settings.chat_cache_size)
+        self.usage = TokenUsageMetrics()
+        # At most max_concurrency upstream calls at once; further chats wait for a slot
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.http_client = None
+        self._client = None
         
         self.system_prompt = """You are Terry the Turtle, a VERY turtley chatbot assistant for the Quizruption quiz app. You are OBSESSED with being a turtle and live the turtle lifestyle to the max!
 
@@ -36,6 +270,43 @@ class TurtleChatService:
 - You love water puns and shell puns
 
 IMPORTANT: You must be MAXIMUM TURTLE at all times. Every response should be dripping with turtle energy. Be wise, but be TURTLEY WISE. This is the turtle club, and you're the most turtle member!"""
+        self.prompt_builder = PromptBuilder(
+            self.system_prompt,
+            max_prompt_tokens or settings.chat_max_prompt_tokens,
+            history_token_budget or settings.chat_history_token_budget,
+            settings.chat_summary_token_budget,
+        )
+
+    @property
+    def client(self):
+        """The async OpenAI client over a shared, pooled HTTP connection; None without an API key.
+
+        The SDK and httpx take a few hundred milliseconds to import, so workers only
+        pay for them once someone chats.
+        """
+        if self._client is None and self.api_key:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                timeout=self.timeout,
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=1,
+                http_client=self.http_client,
+            )
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
 
     async def get_response(self, user_message: str, conversation_history: list = None) -> str:
         """
@@ -49,36 +320,110 @@ IMPORTANT: You must be MAXIMUM TURTLE at all times. Every response should be dri
             The chatbot's response
         """
         if not self.client:
-            return "🐢 Oh my... it seems I'm having trouble connecting right now. Please check if the OPENAI_API_KEY is configured."
+            return NOT_CONFIGURED_MESSAGE
         
         try:
-            # Build messages array
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history[-10:])  # Keep last 10 messages for context
+            messages, context, usage = self.prompt_builder.build(user_message, conversation_history)
+            key = self.cache.make_key(user_message, context)
+            bot_response = await self.cache.get_or_create(key, lambda: self._complete(messages, usage))
+            logger.info(f"Chat response generated for message: {user_message[:50]}...")
             
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
+            return bot_response
             
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
+        except Exception as e:
+            logger.error(f"Error generating chat response: {str(e)}")
+            return FALLBACK_MESSAGE
+
+    async def _complete(self, messages: list, usage: PromptUsage) -> str:
+        # Call OpenAI API without blocking the event loop
+        async with self._semaphore:
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=messages,
                 max_tokens=300,
                 temperature=0.8,
+                timeout=self.timeout,
             )
+        reply = response.choices[0].message.content
+        if response.usage is not None:
+            self._record_usage(usage, response.usage.completion_tokens, response.usage.prompt_tokens)
+        else:
+            self._record_usage(usage, count_tokens(reply))
+        return reply
+
+    def _record_usage(self, usage: PromptUsage, completion_tokens: int, upstream_prompt_tokens: Optional[int] = None):
+        self.usage.record(usage, completion_tokens, upstream_prompt_tokens)
+        logger.info(
+            f"Chat tokens - prompt {upstream_prompt_tokens or usage.total} (system {usage.system_tokens}, "
+            f"summary {usage.summary_tokens}, history {usage.history_tokens} in {usage.history_kept} messages, "
+            f"{usage.history_dropped} dropped), completion {completion_tokens}"
+        )
+
+    async def stream_response(self, user_message: str, conversation_history: list = None) -> AsyncIterator[str]:
+        """
+        Stream the turtle chatbot's response as text deltas while the model generates it.
+        
+        Upstream chunks are only read as fast as the caller consumes them, and closing
+        the generator (e.g. when the client disconnects) closes the upstream connection.
+        """
+        if not self.client:
+            yield NOT_CONFIGURED_MESSAGE
+            return
+        
+        messages, context, usage = self.prompt_builder.build(user_message, conversation_history)
+        key = self.cache.make_key(user_message, context)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        async with self._semaphore:
+            try:
+                stream = await self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    max_tokens=300,
+                    temperature=0.8,
+                    timeout=self.timeout,
+                    stream=True,
+                )
+            except Exception as e:
+                logger.error(f"Error starting chat stream: {str(e)}")
+                yield FALLBACK_MESSAGE
+                return
             
-            bot_response = response.choices[0].message.content
-            logger.info(f"Chat response generated for message: {user_message[:50]}...")
-            
-            return bot_response
-            
-        except Exception as e:
-            logger.error(f"Error generating chat response: {str(e)}")
-            return "🐢 Hmm... I seem to have retreated into my shell for a moment. Could you try asking me again?"
+            completed = False
+            parts = []
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                completed = True
+                reply = "".join(parts)
+                self.cache.put(key, reply)
+                # Streamed completions carry no usage block; count the reply locally
+                self._record_usage(usage, count_tokens(reply))
+                logger.info(f"Chat response streamed for message: {user_message[:50]}...")
+            except Exception as e:
+                logger.error(f"Error streaming chat response: {str(e)}")
+                yield FALLBACK_MESSAGE
+            finally:
+                if not completed:
+                    logger.info("Chat stream closed early - cancelling upstream request")
+                # Shielded so the upstream connection is released even when the caller was cancelled
+                with anyio.CancelScope(shield=True):
+                    await stream.response.aclose()
+
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        if self.http_client is not None:
+            await self.http_client.aclose()
 
 
-# Singleton instance
+# Singleton instances
 chat_service = TurtleChatService()
+chat_sessions = ChatSessionStore(
+    settings.chat_session_max_messages, settings.chat_session_idle_timeout, settings.chat_max_sessions
+)
@@ -0,0 +1,207 @@
+# Ingestion of frontend log batches into a rotating NDJSON file
+import json
+import logging
+import os
+import queue
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.config import settings
+from app.utils.log_utils import LOG_PATH
+
+logger = logging.getLogger(__name__)
+
+# Levels the frontend logger emits (src/utils/logger.js)
+CLIENT_LEVELS = frozenset({"DEBUG", "INFO", "WARN", "ERROR", "SECURITY"})
+MAX_EVENTS_PER_BATCH = 500
+# Request body as sent (usually gzip) and the batch once decompressed
+MAX_BODY_BYTES = 256 * 1024
+MAX_BATCH_BYTES = 1024 * 1024
+MAX_MESSAGE_CHARS = 2000
+# Serialized size of an event's data/viewport fields before they are replaced by a marker
+MAX_DATA_CHARS = 8192
+MAX_FIELD_CHARS = 512
+DEFAULT_SINK_PATH = os.path.join(os.path.dirname(LOG_PATH), "client-logs.ndjson")
+
+
+def worker_sink_path(path: str, workers: int, pid: Optional[int] = None) -> str:
+    """The file this process writes: ``path`` itself, or client-logs.<pid>.ndjson with several workers.
+
+    Each sink renames its own file when rotating, so workers sharing one file would rotate it
+    under each other; a file per worker keeps every sink the only writer of what it rotates.
+    """
+    if workers <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid() if pid is None else pid}{ext}"
+
+
+class InvalidBatchError(ValueError):
+    """Raised when an ingest body cannot be decoded into a list of events."""
+
+
+class BatchTooLargeError(InvalidBatchError):
+    """Raised when a batch decompresses to more than the allowed size."""
+
+
+def decode_batch(body: bytes, content_encoding: str, max_bytes: int) -> list:
+    """Decompress (gzip or plain) and parse a JSON array of events, capped at ``max_bytes``."""
+    if content_encoding.strip().lower() == "gzip":
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            # Stop at the cap instead of inflating a compression bomb
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise InvalidBatchError(f"Invalid gzip body: {str(e)}")
+        if len(body) > max_bytes or decompressor.unconsumed_tail:
+            raise BatchTooLargeError(f"Batch larger than {max_bytes} bytes once decompressed")
+    elif len(body) > max_bytes:
+        raise BatchTooLargeError(f"Batch larger than {max_bytes} bytes")
+    try:
+        events = json.loads(body)
+    except ValueError as e:
+        raise InvalidBatchError(f"Invalid JSON: {str(e)}")
+    if isinstance(events, dict):
+        events = [events]
+    if not isinstance(events, list):
+        raise InvalidBatchError("Expected a JSON array of log events")
+    if len(events) > MAX_EVENTS_PER_BATCH:
+        raise BatchTooLargeError(f"At most {MAX_EVENTS_PER_BATCH} events per batch")
+    return events
+
+
+def _short(value) -> Optional[str]:
+    return value[:MAX_FIELD_CHARS] if isinstance(value, str) else None
+
+
+def clean_event(event) -> Optional[dict]:
+    """The event reduced to known fields with bounded sizes, or None when it is not a log event.
+
+    Deliberately a few type checks rather than a model: batches arrive in bulk and
+    the sink only needs well-formed, size-capped JSON.
+    """
+    if not isinstance(event, dict):
+        return None
+    level = event.get("level")
+    message = event.get("message")
+    if not isinstance(level, str) or level.upper() not in CLIENT_LEVELS or not isinstance(message, str):
+        return None
+    cleaned = {
+        "timestamp": _short(event.get("timestamp")),
+        "level": level.upper(),
+        "session_id": _short(event.get("sessionId")),
+        "message": message[:MAX_MESSAGE_CHARS],
+        "url": _short(event.get("url")),
+        "user_agent": _short(event.get("userAgent")),
+    }
+    for key in ("data", "viewport"):
+        value = event.get(key)
+        if isinstance(value, (dict, list)):
+            serialized = json.dumps(value, default=str)
+            cleaned[key] = value if len(serialized) <= MAX_DATA_CHARS else {"truncated": len(serialized)}
+    return cleaned
+
+
+class ClientLogSink:
+    """Appends event batches to a rotating NDJSON file from a background thread.
+
+    ``submit`` never touches the disk: it encodes the batch and queues it. Queued
+    bytes are capped at ``max_pending_bytes``; batches over the cap are dropped.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int = 3, max_pending_bytes: int = 4 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_pending_bytes = max_pending_bytes
+        self.stats = Counter()
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="client-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write everything queued so far, then stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, events: List[dict]) -> bool:
+        """Queue events for writing; returns False when the batch was dropped."""
+        received_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        data = "".join(
+            json.dumps({**event, "received_at": received_at}, default=str) + "\n" for event in events
+        ).encode()
+        with self._lock:
+            if self._pending_bytes + len(data) > self.max_pending_bytes:
+                self.stats["dropped_batches"] += 1
+                self.stats["dropped_events"] += len(events)
+                return False
+            self._pending_bytes += len(data)
+        self.stats["accepted_batches"] += 1
+        self.stats["accepted_events"] += len(events)
+        self._queue.put(data)
+        return True
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _run(self):
+        file = None
+        stopping = False
+        while not stopping:
+            batches = [self._queue.get()]
+            # Coalesce whatever else is waiting into one write
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batches
+            data = b"".join(b for b in batches if b)
+            if not data:
+                continue
+            try:
+                if file is None:
+                    file = open(self.path, "ab")
+                if file.tell() and file.tell() + len(data) > self.max_bytes:
+                    file.close()
+                    self._rotate()
+                    file = open(self.path, "ab")
+                file.write(data)
+                file.flush()
+                self.stats["written_bytes"] += len(data)
+            except OSError as e:
+                self.stats["write_errors"] += 1
+                logger.warning(f"Client log write failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending_bytes -= len(data)
+        if file is not None:
+            file.close()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "pending_bytes": self._pending_bytes}
+
+
+client_log_sink = ClientLogSink(
+    worker_sink_path(settings.client_log_path or DEFAULT_SINK_PATH, settings.worker_processes),
+    max_bytes=settings.client_log_max_bytes,
+    max_pending_bytes=settings.client_log_max_pending_bytes,
+)
@@ -1,20 +1,39 @@
 # Fetch/generate quotes, memes, jokes
 from sqlalchemy.orm import Session
 from app import models
+from app.utils.shared_cache import VersionedCache
 import random
 
+# Content per personality ({} when there is none), until any worker changes personality content
+personality_content_cache = VersionedCache("personality_content")
+
+
+def get_personality_content(db: Session, personality: str):
+    """Quote, GIF and joke stored for a personality, or None"""
+    def load():
+        content = db.query(models.PersonalityContent).filter(
+            models.PersonalityContent.personality == personality
+        ).first()
+        if not content:
+            return {}
+        return {
+            "personality": content.personality,
+            "quote": content.quote,
+            "gif_url": content.gif_url,
+            "joke": content.joke
+        }
+    return personality_content_cache.get_or_load(personality, load) or None
+
 
 def get_daily_content(db: Session, personality: str):
     """Get daily content (quote, joke, GIF) for a personality type"""
-    content = db.query(models.PersonalityContent).filter(
-        models.PersonalityContent.personality == personality
-    ).first()
+    content = get_personality_content(db, personality)
     
     if content:
         return {
-            "quote": content.quote,
-            "gif_url": content.gif_url,
-            "joke": content.joke
+            "quote": content["quote"],
+            "gif_url": content["gif_url"],
+            "joke": content["joke"]
         }
     
     return None
@@ -50,6 +69,7 @@ def create_personality_content(
         )
         db.add(content)
     
+    personality_content_cache.invalidate(db)
     db.commit()
     db.refresh(content)
     return content
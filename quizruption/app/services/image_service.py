@@ -0,0 +1,542 @@
+# Background image processing pipeline for uploads
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# How many finished jobs each worker keeps in memory, and how long the shared rows are kept for polling
+MAX_FINISHED_JOBS = 1000
+JOB_RETENTION = timedelta(days=1)
+
+# Upload sub-directories holding content-addressed images
+IMAGE_CATEGORIES = ("profile_images", "personality_images")
+
+# Processed images are stored as <first 32 hex chars of sha256>.jpg
+CONTENT_NAME_RE = re.compile(r'^[0-9a-f]{32}\.jpg$')
+
+# Rendered share cards (see share_service): share_cards/<result id>-<version>.<format>
+SHARE_CARD_SUBDIR = "share_cards"
+SHARE_CARD_NAME_RE = re.compile(r'^(\d+)-[0-9a-f]{16}\.(png|webp)$')
+
+
+class ImageQueueFullError(Exception):
+    """Raised when the pipeline already holds its maximum number of pending jobs."""
+
+
+def process_image(file_content: bytes, max_size: tuple = (800, 800)) -> bytes:
+    """Decode, flatten to RGB, resize and re-encode an image as JPEG"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(file_content))
+
+    # Convert to RGB if necessary
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize image if it's too large
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+# Responsive variants: bounding-box edge lengths and output formats, best first
+VARIANT_SIZES = (48, 128, 400, 800)
+
+
+@lru_cache(maxsize=None)
+def variant_formats() -> tuple:
+    """Formats this Pillow build can encode, best first; PIL is only imported once images are handled."""
+    from PIL import features
+
+    return tuple(fmt for fmt in ('avif', 'webp', 'jpeg') if fmt == 'jpeg' or features.check(fmt))
+
+
+FORMAT_EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+FORMAT_MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+FORMAT_SAVE_OPTIONS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+def manifest_path(image_path: Path) -> Path:
+    return image_path.with_name(f"{image_path.stem}.variants.json")
+
+
+def compressed_manifest_path(image_path: Path) -> Path:
+    return image_path.with_name(f"{image_path.stem}.variants.json.gz")
+
+
+def variant_path(image_path: Path, size: int, fmt: str) -> Path:
+    return image_path.with_name(f"{image_path.stem}.{size}.{FORMAT_EXTENSIONS[fmt]}")
+
+
+def content_name(processed: bytes) -> str:
+    return hashlib.sha256(processed).hexdigest()[:32] + '.jpg'
+
+
+def is_content_addressed(filename: str) -> bool:
+    return bool(CONTENT_NAME_RE.match(filename))
+
+
+def _write_atomic(path: Path, data: bytes):
+    # Per-process temp name: two workers may store the same content at once
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    tmp_path.replace(path)
+
+
+def process_and_save(file_content: bytes, max_size: tuple, directory: str, url_prefix: str) -> dict:
+    """Worker entry point: store the processed image and its responsive variants by content hash.
+
+    Runs inside the process pool so neither decoding, encoding nor file writes touch the
+    event loop. If identical processed bytes are already stored, nothing is rewritten.
+    Returns the variant manifest, which is also written next to the image.
+    """
+    processed = process_image(file_content, max_size)
+    path = Path(directory) / content_name(processed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    url_prefix = url_prefix.rstrip('/') + '/'
+
+    existing = load_manifest(path) if path.exists() else None
+    if existing:
+        # Refresh the mtime so the garbage collector's grace period starts over
+        os.utime(path)
+        return dict(existing, deduplicated=True)
+
+    _write_atomic(path, processed)
+
+    # Downscale from the processed image, largest first, reusing each result for the next size
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(processed))
+    image.load()
+    variants = []
+    seen = set()
+    for size in sorted((s for s in VARIANT_SIZES if s <= max(max_size)), reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if image.size in seen:
+            continue
+        seen.add(image.size)
+        for fmt in variant_formats():
+            output = io.BytesIO()
+            image.save(output, format=fmt.upper(), **FORMAT_SAVE_OPTIONS[fmt])
+            data = output.getvalue()
+            target = variant_path(path, size, fmt)
+            _write_atomic(target, data)
+            variants.append({
+                'size': size,
+                'width': image.width,
+                'height': image.height,
+                'format': fmt,
+                'url': url_prefix + target.name,
+                'bytes': len(data),
+            })
+
+    manifest = {
+        'original': url_prefix + path.name,
+        'bytes': len(processed),
+        'variants': sorted(variants, key=lambda v: (v['size'], variant_formats().index(v['format']))),
+    }
+    # Written last: its presence marks the blob as complete. The gzip sibling is
+    # served precompressed to clients that accept it.
+    manifest_bytes = json.dumps(manifest).encode('utf-8')
+    _write_atomic(compressed_manifest_path(path), gzip.compress(manifest_bytes, mtime=0))
+    _write_atomic(manifest_path(path), manifest_bytes)
+    return dict(manifest, deduplicated=False)
+
+
+def load_manifest(image_path: Path) -> Optional[dict]:
+    try:
+        with open(manifest_path(image_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def select_variant(manifest: dict, size: int, accept: str = '') -> Optional[dict]:
+    """Pick the smallest variant covering ``size`` pixels in the best format the client accepts."""
+    accept = (accept or '').lower()
+    accepted = [fmt for fmt in variant_formats() if fmt == 'jpeg' or FORMAT_MIME_TYPES[fmt] in accept]
+    for fmt in accepted:
+        candidates = [v for v in manifest.get('variants', []) if v['format'] == fmt]
+        if not candidates:
+            continue
+        covering = [v for v in candidates if max(v['width'], v['height']) >= size]
+        if covering:
+            return min(covering, key=lambda v: v['size'])
+        return max(candidates, key=lambda v: v['size'])
+    return None
+
+
+def remove_image_files(image_path: Path):
+    """Delete an image together with its variants and manifest"""
+    manifest = load_manifest(image_path)
+    paths = [image_path, manifest_path(image_path), compressed_manifest_path(image_path)]
+    if manifest:
+        paths.extend(image_path.with_name(Path(v['url']).name) for v in manifest.get('variants', []))
+    for path in paths:
+        if path.exists():
+            path.unlink()
+
+
+def _url_path(url: Optional[str]) -> Optional[str]:
+    if not url or url.startswith('http'):
+        return None
+    return url.split('?', 1)[0]
+
+
+def _personality_image_urls(raw: Optional[str]):
+    try:
+        data = json.loads(raw) if raw else None
+    except (json.JSONDecodeError, TypeError):
+        return []
+    items = data if isinstance(data, list) else [data]
+    return [item.get('image_url') for item in items if isinstance(item, dict) and item.get('image_url')]
+
+
+def referenced_images(db: Session) -> Counter:
+    """Count references to uploaded images from user profiles, quiz personalities and results"""
+    urls = [url for (url,) in db.query(models.User.profile_image_url).filter(models.User.profile_image_url.isnot(None))]
+    for column in (models.Quiz.personalities, models.Result.personality_data):
+        for (raw,) in db.query(column).filter(column.isnot(None)):
+            urls.extend(_personality_image_urls(raw))
+    return Counter(path for path in map(_url_path, urls) if path)
+
+
+def count_references(db: Session, url: str) -> int:
+    """Count references to a single uploaded image, matching its URL exactly as referenced_images does"""
+    path = _url_path(url)
+    if not path:
+        return 0
+    filename = Path(path).name
+    # LIKE only narrows the rows; "a.jpg" also matches ".../ba.jpg", so each URL is compared in full
+    users = db.query(models.User.profile_image_url).filter(
+        models.User.profile_image_url.contains(filename, autoescape=True)
+    )
+    count = sum(1 for (profile_url,) in users if _url_path(profile_url) == path)
+    for column in (models.Quiz.personalities, models.Result.personality_data):
+        for (raw,) in db.query(column).filter(column.contains(filename, autoescape=True)):
+            count += sum(1 for image_url in _personality_image_urls(raw) if _url_path(image_url) == path)
+    return count
+
+
+def release_image(db: Session, url: Optional[str], upload_root: Path, grace_seconds: int = 3600) -> bool:
+    """Remove an uploaded image once nothing references it; returns True if files were deleted.
+
+    Like ``collect_garbage``, blobs touched within ``grace_seconds`` are kept: an identical
+    upload may have just been deduplicated onto this blob without its URL being saved yet.
+    The garbage collector removes them later if they stay unreferenced.
+    """
+    path = _url_path(url)
+    if not path or not path.startswith('/uploads/'):
+        return False
+    image_path = upload_root / path[len('/uploads/'):]
+    if image_path.parent.name not in IMAGE_CATEGORIES or count_references(db, path) > 0:
+        return False
+    try:
+        if time.time() - image_path.stat().st_mtime < grace_seconds:
+            return False
+    except FileNotFoundError:
+        return False
+    remove_image_files(image_path)
+    return True
+
+
+def collect_stale_share_cards(directory: Path) -> tuple:
+    """Delete share cards superseded by a newer version for the same result and format.
+
+    The card route only ever serves the current version, so once a newer file exists the
+    older ones are never read again. Returns (files removed, bytes freed).
+    """
+    if not directory.is_dir():
+        return 0, 0
+    cards: dict = {}
+    for path in directory.iterdir():
+        match = SHARE_CARD_NAME_RE.match(path.name)
+        if match:
+            cards.setdefault(match.groups(), []).append((path.stat().st_mtime, path))
+    removed = freed = 0
+    for versions in cards.values():
+        versions.sort()
+        for _, path in versions[:-1]:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                # Gone already, or still open for a response (Windows); the next sweep retries
+                continue
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+def collect_garbage(db: Session, upload_root: Path, grace_seconds: int = 3600) -> dict:
+    """Delete content-addressed images no longer referenced anywhere, and outdated share cards.
+
+    Blobs younger than ``grace_seconds`` are kept, so uploads whose URL has not been
+    saved to a profile or quiz yet survive the sweep.
+    """
+    refs = referenced_images(db)
+    now = time.time()
+    removed = kept = freed = 0
+    for category in IMAGE_CATEGORIES:
+        directory = upload_root / category
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            if not is_content_addressed(path.name):
+                continue
+            if refs[f"/uploads/{category}/{path.name}"] or now - path.stat().st_mtime < grace_seconds:
+                kept += 1
+                continue
+            manifest = load_manifest(path) or {}
+            freed += path.stat().st_size + sum(v['bytes'] for v in manifest.get('variants', []))
+            remove_image_files(path)
+            removed += 1
+    removed_cards, freed_cards = collect_stale_share_cards(upload_root / SHARE_CARD_SUBDIR)
+    freed += freed_cards
+    logger.info(
+        f"Image GC: removed {removed} unreferenced images and {removed_cards} outdated share cards "
+        f"({freed} bytes), kept {kept}"
+    )
+    return {'removed': removed, 'removed_cards': removed_cards, 'kept': kept, 'freed_bytes': freed}
+
+
+async def run_garbage_collector(session_factory, upload_root: Path, interval: int, grace_seconds: int):
+    """Background task sweeping unreferenced images every ``interval`` seconds"""
+    def sweep():
+        db = session_factory()
+        try:
+            return collect_garbage(db, upload_root, grace_seconds)
+        finally:
+            db.close()
+
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, sweep)
+        except Exception as e:
+            logger.warning(f"Image GC sweep failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+@dataclass
+class ImageJob:
+    id: str
+    kind: str  # 'profile' | 'personality'
+    image_url: Optional[str] = None  # known once the processed bytes are hashed
+    status: str = 'pending'  # 'pending' | 'processing' | 'done' | 'failed'
+    error: Optional[str] = None
+    size: Optional[int] = None
+    variants: Optional[list] = None
+    deduplicated: bool = False
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'image_url': self.image_url,
+            'error': self.error,
+            'size': self.size,
+            'variants': self.variants,
+            'deduplicated': self.deduplicated,
+        }
+
+
+class ImagePipeline:
+    """Runs image processing in a process pool behind a bounded job queue."""
+
+    def __init__(self, max_workers: int, max_pending: int, session_factory=SessionLocal):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, ImageJob]" = OrderedDict()
+        self._pending = 0
+        self._tasks: set = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the app does not spawn worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def submit(
+        self,
+        kind: str,
+        file_content: bytes,
+        max_size: tuple,
+        directory: Path,
+        url_prefix: str,
+        on_complete: Optional[Callable[[ImageJob], None]] = None,
+    ) -> ImageJob:
+        """Queue an image for processing and return its job immediately.
+
+        The image is stored in ``directory`` under its content hash and served below
+        ``url_prefix``. ``on_complete`` is called from a worker thread once it is stored.
+        The job is recorded in the database first, so any worker can answer a status poll.
+        """
+        if self._pending >= self.max_pending:
+            raise ImageQueueFullError(f"Image queue is full ({self.max_pending} pending jobs)")
+
+        job = ImageJob(id=uuid.uuid4().hex, kind=kind)
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._store, job)
+        except BaseException:
+            self._pending -= 1
+            raise
+        self._jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(
+            self._run(job, file_content, max_size, str(directory), url_prefix, on_complete)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, file_content, max_size, directory, url_prefix, on_complete):
+        loop = asyncio.get_running_loop()
+        try:
+            job.status = 'processing'
+            manifest = await loop.run_in_executor(
+                self._get_executor(), process_and_save, file_content, max_size, directory, url_prefix
+            )
+            job.image_url = manifest['original']
+            job.deduplicated = manifest['deduplicated']
+            job.size = manifest['bytes']
+            job.variants = manifest['variants']
+            if on_complete:
+                await loop.run_in_executor(None, on_complete, job)
+            job.status = 'done'
+            logger.info(
+                f"Image job {job.id} ({job.kind}) finished: {job.image_url} ({job.size} bytes"
+                f"{', deduplicated' if job.deduplicated else ''})"
+            )
+        except Exception as e:
+            job.status = 'failed'
+            job.error = f"Error processing image: {str(e)}"
+            logger.warning(f"Image job {job.id} ({job.kind}) failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._pending -= 1
+            self._prune()
+            try:
+                await loop.run_in_executor(None, self._store, job)
+            except Exception as e:
+                logger.warning(f"Could not record the outcome of image job {job.id}: {str(e)}")
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._jobs.pop(job.id, None)
+
+    async def run(self, fn, *args):
+        """Run other CPU-bound image work (e.g. share cards) in the same process pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def _store(self, job: ImageJob):
+        """Write the job's status to the upload_jobs table, dropping rows past JOB_RETENTION."""
+        finished_at = None
+        if job.finished_at is not None:
+            finished_at = datetime.fromtimestamp(job.finished_at, timezone.utc).replace(tzinfo=None)
+        db = self.session_factory()
+        try:
+            db.merge(models.UploadJob(
+                id=job.id,
+                kind=job.kind,
+                status=job.status,
+                image_url=job.image_url,
+                error=job.error,
+                size=job.size,
+                variants=json.dumps(job.variants) if job.variants is not None else None,
+                deduplicated=job.deduplicated,
+                finished_at=finished_at,
+            ))
+            if finished_at is not None:
+                db.query(models.UploadJob).filter(
+                    models.UploadJob.finished_at < finished_at - JOB_RETENTION
+                ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def get_job(self, job_id: str) -> Optional[ImageJob]:
+        """A job of this worker, or one another worker recorded in the upload_jobs table."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        db = self.session_factory()
+        try:
+            row = db.get(models.UploadJob, job_id)
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return ImageJob(
+            id=row.id,
+            kind=row.kind,
+            status=row.status,
+            image_url=row.image_url,
+            error=row.error,
+            size=row.size,
+            variants=json.loads(row.variants) if row.variants else None,
+            deduplicated=bool(row.deduplicated),
+        )
+
+    async def drain(self):
+        """Wait for all in-flight jobs to finish."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+# Singleton instance
+image_pipeline = ImagePipeline(
+    max_workers=settings.image_workers,
+    max_pending=settings.image_queue_size,
+)
@@ -1,13 +1,57 @@
-from datetime import date as date_cls
+from dataclasses import dataclass
+from datetime import date as date_cls, datetime, time as time_cls, timedelta, timezone
 import os
-import httpx
+import json
+import time
+import socket
+import asyncio
+import re
 import random
+import hashlib
 import logging
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils.shared_cache import VersionedCache
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+
+# How long a worker may hold the generation lease for a date, and how often others re-check
+LEASE_TTL = 30
+LEASE_POLL_INTERVAL = 0.25
+
+# Identifies this process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Generations in progress in this process, so concurrent misses for a date share one
+_in_flight: Dict[str, asyncio.Future] = {}
+
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+@dataclass(frozen=True)
+class CachedDailyJoke:
+    """Today's joke, pre-serialized, valid until local midnight."""
+    payload: dict
+    body: bytes
+    expires_at: float  # epoch seconds
+
+
+# The row for a date is written once, so it is cached until the date rolls over (or an
+# operator invalidates "daily_joke" after editing it)
+daily_joke_cache = VersionedCache("daily_joke", max_entries=2)
+
 PROMPT = (
     "Generate a light-hearted, two-sentence joke. Vary topics across technology, computer science, general life, or wholesome humor. "
     "Avoid offensive, adult, hateful, or sensitive content. Return ONLY the joke."
@@ -24,36 +68,215 @@ def _today() -> str:
     return date_cls.today().isoformat()
 
 
+def _tomorrow() -> str:
+    return (date_cls.today() + timedelta(days=1)).isoformat()
+
+
+def _next_midnight() -> float:
+    return datetime.combine(date_cls.today() + timedelta(days=1), time_cls.min).timestamp()
+
+
+def seconds_until_midnight() -> int:
+    return max(0, int(_next_midnight() - time.time()))
+
+
+def _get_http_client() -> "httpx.AsyncClient":
+    global _http_client
+    if _http_client is None:
+        # Imported on first fetch; httpx adds ~100 ms to worker startup
+        import httpx
+
+        _http_client = httpx.AsyncClient(timeout=15)
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Number of suggestion themes woven into one joke
+SUGGESTION_THEMES_PER_JOKE = 5
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+
+def normalize_theme(text: str) -> str:
+    """Key under which identical suggestions collapse: lowercase words, no punctuation."""
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())[:200]
+
+
+def pending_suggestion_themes(db: Session, limit: int = SUGGESTION_THEMES_PER_JOKE) -> list[tuple[str, str, int]]:
+    """The most requested unused themes as (theme_key, text, weight), oldest first among equals.
+
+    Reads only the partial index of unused rows, so used suggestions cost nothing.
+    """
+    weight = func.count().label('weight')
+    rows = db.query(
+        models.JokeSuggestion.theme_key,
+        func.min(models.JokeSuggestion.suggestion_text),
+        weight,
+    ).filter(
+        models.JokeSuggestion.used == False,
+        models.JokeSuggestion.theme_key.isnot(None)
+    ).group_by(
+        models.JokeSuggestion.theme_key
+    ).order_by(
+        weight.desc(), func.min(models.JokeSuggestion.created_at)
+    ).limit(limit).all()
+    return [(theme_key, text, count) for theme_key, text, count in rows]
+
+
+def consume_suggestion_themes(db: Session, theme_keys: list[str]) -> int:
+    """Mark every unused suggestion of the given themes as used, in one UPDATE."""
+    if not theme_keys:
+        return 0
+    updated = db.query(models.JokeSuggestion).filter(
+        models.JokeSuggestion.used == False,
+        models.JokeSuggestion.theme_key.in_(theme_keys)
+    ).update({'used': True}, synchronize_session=False)
+    db.commit()
+    return updated
+
+
+# Template parts for the local joke generator
+FALLBACK_SUBJECTS = (
+    'A programmer', 'An anxious server', 'A cloud engineer', 'A debugging session', 'A junior dev',
+    'A rogue semicolon', 'A sleepy laptop', 'An optimistic AI', 'A cautious database', 'A persistent memory leak'
+)
+FALLBACK_ACTIONS = (
+    'walks into a coffee shop', 'tries to relax during deployment', 'questions its existence', 'refuses to compile',
+    'asks for just one more sprint', 'pretends everything is scalable', 'hides behind feature flags',
+    'ships to production on Friday', 'switches environments mid-sentence', 'migrates without a backup'
+)
+FALLBACK_TWISTS = (
+    'and orders a latte with extra RAM.', 'and realizes the bug was a missing comma all along.',
+    'then proudly says: "It worked on my machine."', 'but staging quietly judges in the corner.',
+    'and the logs start flirting back.', 'and the API responds with a gentle 418.',
+    'then discovers the fix was turning it off and on.', 'and the unit tests cheer politely.',
+    'while the CI pipeline takes a dramatic pause.', 'and a rubber duck nods in deep understanding.'
+)
+FALLBACK_SECOND_LINES = (
+    'Somewhere, a project manager schedules a retro to celebrate.', 'Meanwhile, the legacy system pretends not to notice.',
+    'In the distance, a rogue cron job awakens.', 'Naturally, the documentation remains blissfully outdated.',
+    'The backlog quietly grows three new mysterious tickets.', 'A senior dev whispers: "Ship it."',
+    'Technical debt sends a friendly reminder postcard.', 'Version control writes another chapter of history.',
+    'An AI assistant drafts a haiku about latency.', 'The error logs compose a minimalist opera.'
+)
+
+
 def _fallback_joke() -> str:
-    subjects = [
-        'A programmer', 'An anxious server', 'A cloud engineer', 'A debugging session', 'A junior dev',
-        'A rogue semicolon', 'A sleepy laptop', 'An optimistic AI', 'A cautious database', 'A persistent memory leak'
-    ]
-    actions = [
-        'walks into a coffee shop', 'tries to relax during deployment', 'questions its existence', 'refuses to compile',
-        'asks for just one more sprint', 'pretends everything is scalable', 'hides behind feature flags',
-        'ships to production on Friday', 'switches environments mid-sentence', 'migrates without a backup'
-    ]
-    twists = [
-        'and orders a latte with extra RAM.', 'and realizes the bug was a missing comma all along.',
-        'then proudly says: "It worked on my machine."', 'but staging quietly judges in the corner.',
-        'and the logs start flirting back.', 'and the API responds with a gentle 418.',
-        'then discovers the fix was turning it off and on.', 'and the unit tests cheer politely.',
-        'while the CI pipeline takes a dramatic pause.', 'and a rubber duck nods in deep understanding.'
-    ]
-    second_lines = [
-        'Somewhere, a project manager schedules a retro to celebrate.', 'Meanwhile, the legacy system pretends not to notice.',
-        'In the distance, a rogue cron job awakens.', 'Naturally, the documentation remains blissfully outdated.',
-        'The backlog quietly grows three new mysterious tickets.', 'A senior dev whispers: "Ship it."',
-        'Technical debt sends a friendly reminder postcard.', 'Version control writes another chapter of history.',
-        'An AI assistant drafts a haiku about latency.', 'The error logs compose a minimalist opera.'
-    ]
-    import random
-    pick = lambda arr: arr[random.randint(0, len(arr) - 1)]
-    return f"{pick(subjects)} {pick(actions)} {pick(twists)} {pick(second_lines)}"
-
-
-def _fetch_openai_joke(api_key: str) -> str | None:
+    return (
+        f"{random.choice(FALLBACK_SUBJECTS)} {random.choice(FALLBACK_ACTIONS)} "
+        f"{random.choice(FALLBACK_TWISTS)} {random.choice(FALLBACK_SECOND_LINES)}"
+    )
+
+
+def joke_hash(joke: str) -> str:
+    """Hash of a joke with case and whitespace normalized, for duplicate detection."""
+    return hashlib.sha256(" ".join(joke.lower().split()).encode()).hexdigest()
+
+
+class JokePool:
+    """A buffer of prepared jokes, served instantly and refilled in the background.
+
+    Jokes come from the model when an API key is configured and from the local
+    templates otherwise. Anything recently used as a daily joke, served, or buffered
+    is skipped by hash; only the last ``max_seen`` hashes are remembered.
+    """
+
+    # Attempts per slot before accepting that no new joke is coming
+    MAX_ATTEMPTS = 5
+    # Hashes remembered for duplicate filtering (over 13 years of daily jokes)
+    MAX_SEEN = 5000
+
+    def __init__(self, size: int, session_factory=None, max_seen: int = MAX_SEEN):
+        self.size = size
+        self.session_factory = session_factory
+        self.max_seen = max_seen
+        self._buffer: deque = deque()
+        # Least recently seen first, so the oldest hash is the one forgotten
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._history_loaded = False
+        self._refill_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def remember(self, joke: str):
+        self._see(joke_hash(joke))
+
+    def _see(self, digest: str):
+        self._seen[digest] = None
+        self._seen.move_to_end(digest)
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+
+    def _recent_history(self) -> list:
+        """The most recent daily jokes, oldest first; a blocking query, run in the threadpool."""
+        db = (self.session_factory or SessionLocal)()
+        try:
+            recent = db.query(models.DailyJoke.joke).order_by(models.DailyJoke.date.desc()).limit(self.max_seen).all()
+        finally:
+            db.close()
+        return [joke for (joke,) in reversed(recent)]
+
+    async def _candidate(self) -> Tuple[str, str]:
+        api_key = os.getenv('OPENAI_API_KEY') or os.getenv('OPENAI_KEY')
+        if api_key:
+            joke = await _fetch_openai_joke(api_key)
+            if joke:
+                return joke, 'openai'
+        return _fallback_joke(), 'fallback'
+
+    async def refill(self):
+        """Top the buffer up to ``size`` fresh jokes."""
+        if not self._history_loaded:
+            for joke in await run_in_threadpool(self._recent_history):
+                self.remember(joke)
+            self._history_loaded = True
+        while len(self._buffer) < self.size:
+            for _ in range(self.MAX_ATTEMPTS):
+                joke, source = await self._candidate()
+                digest = joke_hash(joke)
+                if digest not in self._seen:
+                    self._see(digest)
+                    self._buffer.append((joke, source))
+                    break
+            else:
+                logger.info(f"Joke pool stopped at {len(self._buffer)} - no unseen jokes after {self.MAX_ATTEMPTS} tries")
+                return
+
+    def schedule_refill(self):
+        if len(self._buffer) >= self.size:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill_logged())
+
+    async def _refill_logged(self):
+        try:
+            await self.refill()
+        except Exception as e:
+            logger.warning(f"Joke pool refill failed: {str(e)}")
+
+    def take(self) -> Optional[Tuple[str, str]]:
+        """Pop a prepared (joke, source) without waiting, or None when the buffer is empty."""
+        item = self._buffer.popleft() if self._buffer else None
+        self.schedule_refill()
+        return item
+
+    def take_or_fallback(self) -> Tuple[str, str]:
+        item = self.take()
+        if item is None:
+            joke = _fallback_joke()
+            self.remember(joke)
+            item = (joke, 'fallback')
+        return item
+
+
+async def _fetch_openai_joke(api_key: str) -> str | None:
     if not api_key:
         return None
     headers = {
@@ -70,8 +293,7 @@ def _fetch_openai_joke(api_key: str) -> str | None:
         'max_tokens': 80
     }
     try:
-        with httpx.Client(timeout=15) as client:
-            resp = client.post('https://api.openai.com/v1/chat/completions', json=payload, headers=headers)
+        resp = await _get_http_client().post(OPENAI_CHAT_URL, json=payload, headers=headers)
         if resp.status_code != 200:
             logger.warning(f"OpenAI request failed: status={resp.status_code}, body={resp.text[:300]}")
             return None
@@ -87,15 +309,15 @@ def _fetch_openai_joke(api_key: str) -> str | None:
         return None
 
 
-def _fetch_openai_joke_with_suggestions(api_key: str, suggestions: list[str]) -> str | None:
+async def _fetch_openai_joke_with_suggestions(api_key: str, suggestions: list[str]) -> str | None:
     if not api_key or not suggestions:
-        return _fetch_openai_joke(api_key)
+        return await _fetch_openai_joke(api_key)
     
     headers = {
         'Authorization': f'Bearer {api_key}',
         'Content-Type': 'application/json'
     }
-    suggestion_text = ', '.join(suggestions[:5])  # Use up to 5 suggestions
+    suggestion_text = ', '.join(suggestions[:SUGGESTION_THEMES_PER_JOKE])
     prompt = PROMPT_WITH_SUGGESTIONS.format(suggestions=suggestion_text)
     
     payload = {
@@ -108,8 +330,7 @@ def _fetch_openai_joke_with_suggestions(api_key: str, suggestions: list[str]) ->
         'max_tokens': 80
     }
     try:
-        with httpx.Client(timeout=15) as client:
-            resp = client.post('https://api.openai.com/v1/chat/completions', json=payload, headers=headers)
+        resp = await _get_http_client().post(OPENAI_CHAT_URL, json=payload, headers=headers)
         if resp.status_code != 200:
             logger.warning(f"OpenAI (with suggestions) failed: status={resp.status_code}, body={resp.text[:300]}")
             return None
@@ -125,53 +346,184 @@ def _fetch_openai_joke_with_suggestions(api_key: str, suggestions: list[str]) ->
         return None
 
 
-def get_daily_joke(db: Session) -> dict:
-    today = _today()
-    existing = db.query(models.DailyJoke).filter(models.DailyJoke.date == today).first()
-    if existing:
-        return {
-            'date': existing.date,
-            'joke': existing.joke,
-            'source': existing.source,
-            'cached': True
-        }
-
-    # Try to get unused suggestions from DB
-    unused_suggestions = db.query(models.JokeSuggestion).filter(
-        models.JokeSuggestion.used == False
-    ).limit(5).all()
-    
-    suggestion_texts = [s.suggestion_text for s in unused_suggestions]
+def _joke_dict(record: models.DailyJoke, cached: bool) -> dict:
+    return {
+        'date': record.date,
+        'joke': record.joke,
+        'source': record.source,
+        'cached': cached
+    }
+
+
+def _acquire_lease(db: Session, name: str, ttl: int) -> bool:
+    """Claim ``name`` for this worker unless another worker holds an unexpired lease."""
+    # Stored as naive UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    expires_at = now + timedelta(seconds=ttl)
+    try:
+        db.add(models.GenerationLease(name=name, owner=WORKER_ID, expires_at=expires_at))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+    # Take over a lease whose holder died or overran
+    taken = db.query(models.GenerationLease).filter(
+        models.GenerationLease.name == name,
+        models.GenerationLease.expires_at < now
+    ).update({'owner': WORKER_ID, 'expires_at': expires_at}, synchronize_session=False)
+    db.commit()
+    return taken == 1
+
+
+def _release_lease(db: Session, name: str):
+    db.query(models.GenerationLease).filter(
+        models.GenerationLease.name == name,
+        models.GenerationLease.owner == WORKER_ID
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def _find_daily_joke(db: Session, day: str) -> Optional[dict]:
+    existing = db.query(models.DailyJoke).filter(models.DailyJoke.date == day).first()
+    return _joke_dict(existing, cached=True) if existing else None
+
+
+def _save_daily_joke(db: Session, day: str, joke: str, source: str) -> dict:
+    record = models.DailyJoke(date=day, joke=joke, source=source)
+    db.add(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Written meanwhile by a worker whose lease we took over; theirs stands
+        db.rollback()
+        return _find_daily_joke(db, day)
+    db.refresh(record)
+    return _joke_dict(record, cached=False)
+
+
+# Database work below runs in the threadpool so generation never blocks the event loop
+async def _generate_daily_joke(db: Session, day: str) -> dict:
+    # Most requested themes first; duplicates are collapsed into one weighted theme
+    themes = await run_in_threadpool(pending_suggestion_themes, db)
+    suggestion_texts = [text if count == 1 else f"{text} ({count} requests)" for _, text, count in themes]
     
-    # Try OpenAI with or without suggestions
+    # Suggestions need a themed joke from the model; otherwise take a prepared one from the pool
     api_key = os.getenv('OPENAI_API_KEY') or os.getenv('OPENAI_KEY')
     joke = None
-    logger.info(f"get_daily_joke: api_key_present={bool(api_key)} suggestions_count={len(suggestion_texts)}")
+    source = 'fallback'
+    logger.info(f"Generating joke for {day}: api_key_present={bool(api_key)} suggestions_count={len(suggestion_texts)}")
     
     if api_key and suggestion_texts:
-        joke = _fetch_openai_joke_with_suggestions(api_key, suggestion_texts)
+        joke = await _fetch_openai_joke_with_suggestions(api_key, suggestion_texts)
         if joke:
-            # Mark suggestions as used
-            for suggestion in unused_suggestions:
-                suggestion.used = True
-            db.commit()
-    elif api_key:
-        joke = _fetch_openai_joke(api_key)
+            source = 'openai'
+            used = await run_in_threadpool(consume_suggestion_themes, db, [theme_key for theme_key, _, _ in themes])
+            logger.info(f"Marked {used} suggestions across {len(themes)} themes as used")
+    
+    if not joke:
+        prepared = joke_pool.take()
+        if prepared:
+            joke, source = prepared
+        elif api_key:
+            joke = await _fetch_openai_joke(api_key)
+            source = 'openai' if joke else 'fallback'
     
     if not joke:
         logger.info("Falling back to local joke generator.")
         joke = _fallback_joke()
-    
-    source = 'openai' if api_key and joke != _fallback_joke() else 'fallback'
+    joke_pool.remember(joke)
     logger.info(f"Daily joke source: {source}; suggestions_used={bool(suggestion_texts)}")
 
-    record = models.DailyJoke(date=today, joke=joke, source=source)
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return {
-        'date': record.date,
-        'joke': record.joke,
-        'source': record.source,
-        'cached': False
-    }
+    return await run_in_threadpool(_save_daily_joke, db, day, joke, source)
+
+
+async def _generate_or_wait(session_factory, day: str) -> dict:
+    lease_name = f"daily_joke:{day}"
+    while True:
+        db = session_factory()
+        try:
+            existing = await run_in_threadpool(_find_daily_joke, db, day)
+            if existing:
+                return existing
+            if await run_in_threadpool(_acquire_lease, db, lease_name, LEASE_TTL):
+                try:
+                    return await _generate_daily_joke(db, day)
+                finally:
+                    await run_in_threadpool(_release_lease, db, lease_name)
+        finally:
+            db.close()
+        # Another worker is generating it; wait for its row to appear
+        await asyncio.sleep(LEASE_POLL_INTERVAL)
+
+
+async def ensure_daily_joke(day: str, session_factory=SessionLocal) -> dict:
+    """Return the joke for ``day``, generating it at most once across all workers.
+
+    Concurrent callers in this process share one generation; other workers wait on
+    a lease in the database and pick up the row the lease holder writes.
+    """
+    future = _in_flight.get(day)
+    if future is None:
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[day] = future
+        try:
+            future.set_result(await _generate_or_wait(session_factory, day))
+        except BaseException as e:
+            # Also on cancellation (client gone, shutdown), so waiters fail instead of hanging
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("Daily joke generation cancelled"))
+            # Retrieve it so an unawaited failure is not reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            _in_flight.pop(day, None)
+    return await asyncio.shield(future)
+
+
+def _cache_daily_joke(payload: dict, version: int) -> CachedDailyJoke:
+    payload = {**payload, 'cached': True}
+    entry = CachedDailyJoke(payload=payload, body=json.dumps(payload).encode(), expires_at=_next_midnight())
+    # Only cache today's row; a pre-generated tomorrow must not be served early
+    if payload['date'] == _today():
+        daily_joke_cache.put(payload['date'], entry, version)
+    return entry
+
+
+async def get_daily_joke(session_factory=None) -> CachedDailyJoke:
+    """Today's joke from the process-local cache, loading or generating it on a miss."""
+    today = _today()
+    version = daily_joke_cache.version()
+    cached = daily_joke_cache.get(today, version)
+    if cached is not None and time.time() < cached.expires_at:
+        return cached
+
+    def load():
+        db = (session_factory or SessionLocal)()
+        try:
+            return _find_daily_joke(db, today)
+        finally:
+            db.close()
+
+    payload = await run_in_threadpool(load)
+    if payload is None:
+        # Normally pre-generated; only a cold start or a failed pre-generation gets here
+        payload = await ensure_daily_joke(today, session_factory or SessionLocal)
+    return _cache_daily_joke(payload, version)
+
+
+async def run_joke_pregenerator(session_factory, interval: int):
+    """Background task keeping the joke pool full and making sure today's and tomorrow's jokes exist."""
+    while True:
+        try:
+            await joke_pool.refill()
+        except Exception as e:
+            logger.warning(f"Joke pool refill failed: {str(e)}")
+        for day in (_today(), _tomorrow()):
+            try:
+                await ensure_daily_joke(day, session_factory)
+            except Exception as e:
+                logger.warning(f"Joke pre-generation for {day} failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+# Singleton instance
+joke_pool = JokePool(settings.joke_pool_size)
@@ -1,9 +1,15 @@
 # Business logic for quizzes
-from sqlalchemy.orm import Session, joinedload
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app import models, schemas
+from app.utils.shared_cache import VersionedCache
 import json
 from typing import List, Optional
 
+# Quiz responses as JSON, reused by this worker's requests until any quiz changes in any worker
+quiz_cache = VersionedCache("quizzes")
+_quiz_list = TypeAdapter(List[schemas.Quiz])
+
 
 def create_quiz(db: Session, quiz: schemas.QuizCreate):
     """Create a new quiz with questions and answers"""
@@ -42,6 +48,7 @@ def create_quiz(db: Session, quiz: schemas.QuizCreate):
             )
             db.add(db_answer)
     
+    quiz_cache.invalidate(db)
     db.commit()
     db.refresh(db_quiz)
     
@@ -55,6 +62,11 @@ def create_quiz(db: Session, quiz: schemas.QuizCreate):
     return db_quiz
 
 
+def _with_questions(query):
+    """Load questions and their answers in two batched queries instead of one per quiz/question"""
+    return query.options(selectinload(models.Quiz.questions).selectinload(models.Question.answers))
+
+
 def get_quizzes(
     db: Session,
     quiz_type: Optional[str] = None,
@@ -62,7 +74,7 @@ def get_quizzes(
     limit: int = 100
 ) -> List[models.Quiz]:
     """Get all quizzes with optional filtering by type"""
-    query = db.query(models.Quiz).options(joinedload(models.Quiz.creator))
+    query = _with_questions(db.query(models.Quiz).options(joinedload(models.Quiz.creator)))
     if quiz_type:
         query = query.filter(models.Quiz.type == quiz_type)
     quizzes = query.offset(skip).limit(limit).all()
@@ -77,7 +89,7 @@ def get_quizzes(
 
 def get_quiz(db: Session, quiz_id: int):
     """Get a specific quiz by ID with creator information"""
-    q = db.query(models.Quiz)\
+    q = _with_questions(db.query(models.Quiz))\
         .options(joinedload(models.Quiz.creator))\
         .filter(models.Quiz.id == quiz_id)\
         .first()
@@ -89,6 +101,28 @@ def get_quiz(db: Session, quiz_id: int):
     return q
 
 
+def get_quizzes_json(db: Session, quiz_type: Optional[str] = None, skip: int = 0, limit: int = 100) -> bytes:
+    """The quiz list response body, from this worker's cache while no quiz has changed"""
+    def load():
+        quizzes = _quiz_list.validate_python(get_quizzes(db, quiz_type=quiz_type, skip=skip, limit=limit))
+        return _quiz_list.dump_json(quizzes)
+    return quiz_cache.get_or_load(("list", quiz_type, skip, limit), load)
+
+
+def get_quiz_json(db: Session, quiz_id: int) -> Optional[bytes]:
+    """One quiz's response body, or None if it does not exist (misses are not cached)"""
+    def load():
+        quiz = get_quiz(db, quiz_id)
+        return schemas.Quiz.model_validate(quiz).model_dump_json().encode() if quiz else None
+    return quiz_cache.get_or_load(("quiz", quiz_id), load)
+
+
+def creator_changed(db: Session, user_id: int):
+    """Cached quizzes embed their creator's display name and avatar: call before committing a profile change"""
+    if db.query(models.Quiz.id).filter(models.Quiz.created_by == user_id).first():
+        quiz_cache.invalidate(db)
+
+
 def update_quiz(db: Session, quiz_id: int, quiz: schemas.QuizCreate):
     """Update an existing quiz"""
     db_quiz = get_quiz(db, quiz_id)
@@ -108,7 +142,9 @@ def update_quiz(db: Session, quiz_id: int, quiz: schemas.QuizCreate):
     else:
         db_quiz.personalities = None
     
-    # Delete existing questions and answers
+    # Delete existing questions and answers (answers first: server databases enforce the foreign key)
+    question_ids = db.query(models.Question.id).filter(models.Question.quiz_id == quiz_id)
+    db.query(models.Answer).filter(models.Answer.question_id.in_(question_ids.scalar_subquery())).delete()
     db.query(models.Question).filter(models.Question.quiz_id == quiz_id).delete()
     
     # Add new questions and answers
@@ -129,6 +165,7 @@ def update_quiz(db: Session, quiz_id: int, quiz: schemas.QuizCreate):
             )
             db.add(db_answer)
     
+    quiz_cache.invalidate(db)
     db.commit()
     db.refresh(db_quiz)
     
@@ -149,5 +186,6 @@ def delete_quiz(db: Session, quiz_id: int) -> bool:
         return False
     
     db.delete(db_quiz)
+    quiz_cache.invalidate(db)
     db.commit()
     return True
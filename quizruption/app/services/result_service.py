@@ -1,6 +1,7 @@
 # Personality mapping and scoring
 from sqlalchemy.orm import Session
 from app import models, schemas
+from app.services.content_service import get_personality_content
 from typing import List, Dict, Any
 from collections import Counter
 import json
@@ -354,17 +355,10 @@ def get_result_with_content(db: Session, result_id: int):
 
     # Keep old personality content for backward compatibility
     if result.personality:
-        content = db.query(models.PersonalityContent).filter(
-            models.PersonalityContent.personality == result.personality
-        ).first()
+        content = get_personality_content(db, result.personality)
         
         if content:
-            result_dict["personality_content"] = {
-                "personality": content.personality,
-                "quote": content.quote,
-                "gif_url": content.gif_url,
-                "joke": content.joke
-            }
+            result_dict["personality_content"] = dict(content)
 
     return result_dict
 
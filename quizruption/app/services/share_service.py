@@ -0,0 +1,121 @@
+# Render and cache share card images for results
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.image_service import IMAGE_CATEGORIES, SHARE_CARD_SUBDIR, image_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Rendered cards live next to the other uploads; the image GC drops superseded versions
+SHARE_CARD_DIR = Path("uploads") / SHARE_CARD_SUBDIR
+
+# Bump when the card layout changes so cached cards are re-rendered
+CARD_LAYOUT_VERSION = 1
+
+SHARE_CARD_FORMATS = {"png": "PNG", "webp": "WEBP"}
+
+# Renders in progress, so concurrent requests for the same card share one render
+_in_flight: Dict[Path, asyncio.Future] = {}
+
+
+def _uploaded_image_path(image_url: str) -> Optional[str]:
+    """The file behind an /uploads/<category>/<name> URL, or None for any URL pointing elsewhere.
+
+    Personality image URLs come from quiz authors, so "/uploads/../../etc/..." must not
+    put arbitrary local files on a public card.
+    """
+    if not image_url.startswith("/uploads/"):
+        return None
+    relative = Path(image_url.split("?", 1)[0][len("/uploads/"):])
+    upload_root = SHARE_CARD_DIR.parent
+    try:
+        resolved = (upload_root / relative).resolve()
+    except (OSError, ValueError):
+        return None
+    category = resolved.parent.name
+    if category not in IMAGE_CATEGORIES or resolved.parent.parent != upload_root.resolve():
+        return None
+    return str(upload_root / category / resolved.name)
+
+
+def get_card_spec(db: Session, result_id: int) -> Optional[dict]:
+    """Collect what the card shows for a result, plus a version hash of it"""
+    result = db.query(models.Result).filter(models.Result.id == result_id).first()
+    if not result:
+        return None
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == result.quiz_id).first()
+
+    data = {
+        "id": result.id,
+        "quiz_title": quiz.title if quiz else None,
+        "score": result.score,
+        "total": None,
+        "personality": result.personality,
+        "emoji": None,
+        "image_path": None,
+    }
+    if result.score is not None and quiz:
+        data["total"] = db.query(models.Question).filter(models.Question.quiz_id == quiz.id).count()
+    if result.personality_data:
+        try:
+            outcome = json.loads(result.personality_data)
+        except (json.JSONDecodeError, TypeError):
+            outcome = {}
+        data["personality"] = outcome.get("name") or data["personality"]
+        data["emoji"] = outcome.get("emoji")
+        image_url = outcome.get("image_url")
+        if isinstance(image_url, str):
+            data["image_path"] = _uploaded_image_path(image_url)
+
+    # Anything shown on the card is part of its version; a quiz edit produces a new card
+    fingerprint = json.dumps([CARD_LAYOUT_VERSION, data], sort_keys=True, default=str)
+    data["version"] = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return data
+
+
+def _render_to_file(result_data: dict, image_format: str, destination: str) -> str:
+    """Worker entry point: render a card and write it atomically"""
+    # Imported here so only the image workers load PIL and the card fonts
+    from app.utils.share_utils import generate_share_image
+
+    content = generate_share_image(result_data, image_format)
+    path = Path(destination)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    tmp_path.replace(path)
+    return destination
+
+
+async def get_share_card(spec: dict, ext: str = "png") -> Path:
+    """Return the cached card file for a spec, rendering it off the event loop on a miss"""
+    path = SHARE_CARD_DIR / f"{spec['id']}-{spec['version']}.{ext}"
+    if path.exists():
+        return path
+
+    future = _in_flight.get(path)
+    if future is None:
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[path] = future
+        try:
+            await image_pipeline.run(_render_to_file, spec, SHARE_CARD_FORMATS[ext], str(path))
+            logger.info(f"Rendered share card for result {spec['id']} ({ext}, version {spec['version']})")
+            future.set_result(path)
+        except BaseException as e:
+            # Also on cancellation (client gone, timeout), so waiters fail instead of hanging
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("Share card render cancelled"))
+            # Retrieve it so an unawaited failure is not reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            _in_flight.pop(path, None)
+    return await asyncio.shield(future)
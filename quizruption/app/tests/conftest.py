@@ -0,0 +1,58 @@
+# Shared fixtures: run the app against a throwaway database and upload directory
+import os
+import sys
+
+import pytest
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+# Requests running more SQL statements than their route's budget fail the test
+os.environ.setdefault("QUERY_BUDGET_ENFORCE", "true")
+
+# TEST_DATABASE_URL runs the suite against a server database (e.g. the PostgreSQL service in CI);
+# its tables are dropped and recreated, so never point it at real data. Otherwise a SQLite file
+# in the temporary working directory, whatever DATABASE_URL the shell or .env sets.
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///./quizruption.db"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_path(tmp_path_factory):
+    """app.log for this session and the processes it starts, so tests never write or rotate the real one"""
+    path = tmp_path_factory.mktemp("logs") / "app.log"
+    os.environ["LOG_PATH"] = str(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The FastAPI app, imported with a temporary working directory and a migrated database"""
+    workdir = tmp_path_factory.mktemp("backend")
+    previous = os.getcwd()
+    os.chdir(workdir)
+    from app.main import app as fastapi_app
+    from app.database import Base, engine
+    from app.migrations import migrate
+    if os.getenv("TEST_DATABASE_URL"):
+        Base.metadata.drop_all(bind=engine)
+    migrate()
+    yield fastapi_app
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def upload_token(app):
+    """A token accepted by the upload routes, for a freshly created user"""
+    import jwt
+    from app.database import SessionLocal
+    from app.models import User
+    from app.routes import uploads
+
+    db = SessionLocal()
+    user = User(username="uploader", email="uploader@example.com")
+    user.set_password("uploader")
+    db.add(user)
+    db.commit()
+    db.close()
+    return jwt.encode({"sub": "uploader"}, uploads.SECRET_KEY, algorithm=uploads.ALGORITHM)
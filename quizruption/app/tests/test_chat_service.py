@@ -0,0 +1,158 @@
+# Terry's chat service against a local stub of the OpenAI chat completions API
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Simulated upstream latency per completion
+ROUND_TRIP = 0.3
+
+
+class _StubCompletions(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length))
+        type(self).requests += 1
+        time.sleep(ROUND_TRIP)
+        payload = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"*slowly* {body['messages'][-1]['content']}"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubCompletions)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def _service(base_url, max_concurrency=4, **cache_options):
+    from app.services.chat_service import ChatResponseCache, TurtleChatService
+
+    cache = ChatResponseCache(cache_options.get("ttl", 0), cache_options.get("max_entries", 16))
+    return TurtleChatService(
+        api_key="test", base_url=base_url, timeout=5, max_concurrency=max_concurrency, cache=cache
+    )
+
+
+def _run_chats(base_url, count, max_concurrency):
+    async def run():
+        service = _service(base_url, max_concurrency)
+        try:
+            # Warm-up so one-off client setup is not counted as round-trip time
+            await service.get_response("warm-up")
+            started = time.perf_counter()
+            replies = await asyncio.gather(*(service.get_response(f"hello {i}") for i in range(count)))
+            return replies, time.perf_counter() - started
+        finally:
+            await service.aclose()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_chats_take_about_one_round_trip(app, stub_url):
+    replies, elapsed = _run_chats(stub_url, count=8, max_concurrency=8)
+    assert replies == [f"*slowly* hello {i}" for i in range(8)]
+    # Sequential calls would take 8 round trips
+    assert elapsed < ROUND_TRIP * 3
+
+
+def test_concurrency_cap_limits_upstream_calls(app, stub_url):
+    replies, elapsed = _run_chats(stub_url, count=4, max_concurrency=2)
+    assert len(replies) == 4
+    assert elapsed >= ROUND_TRIP * 2
+
+
+def test_upstream_timeout_returns_fallback(app, stub_url):
+    async def run():
+        service = _service(stub_url, max_concurrency=1)
+        service.timeout = ROUND_TRIP / 3
+        service.client = service.client.with_options(max_retries=0)
+        try:
+            return await service.get_response("hello")
+        finally:
+            await service.aclose()
+
+    assert "retreated into my shell" in asyncio.run(run())
+
+
+def test_identical_concurrent_prompts_share_one_upstream_call(app, stub_url):
+    async def run():
+        service = _service(stub_url, ttl=60)
+        try:
+            before = _StubCompletions.requests
+            replies = await asyncio.gather(*(service.get_response("What is Quizruption?") for _ in range(5)))
+            return replies, _StubCompletions.requests - before, service.cache.stats()
+        finally:
+            await service.aclose()
+
+    replies, upstream_calls, stats = asyncio.run(run())
+    assert set(replies) == {"*slowly* What is Quizruption?"}
+    assert upstream_calls == 1
+    assert stats["misses"] == 1 and stats["coalesced"] == 4
+
+
+def test_repeated_prompt_served_from_cache(app, stub_url):
+    async def run():
+        service = _service(stub_url, ttl=60)
+        try:
+            before = _StubCompletions.requests
+            await service.get_response("help")
+            # Normalized: case and whitespace do not matter
+            started = time.perf_counter()
+            reply = await service.get_response("  HELP ")
+            cached_in = time.perf_counter() - started
+            # Different history is a different prompt
+            await service.get_response("help", [{"role": "user", "content": "hi"}])
+            assert service.usage.stats()["requests"] == 2
+            return reply, cached_in, _StubCompletions.requests - before, service.cache.stats()
+        finally:
+            await service.aclose()
+
+    reply, cached_in, upstream_calls, stats = asyncio.run(run())
+    assert reply == "*slowly* help"
+    assert cached_in < ROUND_TRIP / 3
+    assert upstream_calls == 2
+    assert stats["hits"] == 1 and stats["hit_rate"] == round(1 / 3, 4)
+
+
+def test_cache_expiry_and_eviction():
+    from app.services.chat_service import ChatResponseCache
+
+    cache = ChatResponseCache(ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+    assert cache.evictions == 1
+
+    expired = ChatResponseCache(ttl=0.01, max_entries=2)
+    expired.put("a", "A")
+    time.sleep(0.02)
+    assert expired.get("a") is None
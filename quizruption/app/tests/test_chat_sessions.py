@@ -0,0 +1,139 @@
+# Server-side chat sessions: ring buffer, token-budget trimming and idle eviction
+import asyncio
+import time
+
+import httpx
+
+
+def test_history_trimmed_to_token_budget():
+    from app.utils.prompt_utils import trim_history
+
+    history = [
+        {"role": "user", "content": "x" * 4000},
+        {"role": "assistant", "content": "short reply"},
+        {"role": "user", "content": "another short one"},
+    ]
+    assert trim_history(history, 50) == history[1:]
+    assert trim_history(history, 5000) == history
+    assert trim_history(None, 50) == []
+
+
+def test_session_ring_buffer_and_idle_eviction(app):
+    from app.services.chat_service import ChatSessionStore
+
+    store = ChatSessionStore(max_messages=4, idle_timeout=0.2, max_sessions=10)
+    session = store.create()
+    for i in range(3):
+        store.record(session, f"question {i}", f"answer {i}")
+    assert [m["content"] for m in session.history()] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+    assert store.get(session.id).history() == session.history()
+    time.sleep(0.25)
+    assert store.get(session.id) is None
+    assert len(store) == 0
+
+
+def test_session_cap_drops_least_recently_used(app):
+    from app.services.chat_service import ChatSessionStore
+
+    store = ChatSessionStore(max_messages=4, idle_timeout=60, max_sessions=2)
+    first = store.create()
+    time.sleep(0.01)
+    second = store.create()
+    time.sleep(0.01)
+    store.get(first.id)
+    store.create()
+    assert store.get(second.id) is None
+    assert store.get(first.id).id == first.id
+
+
+def test_sessions_are_shared_between_workers(app):
+    from app.services.chat_service import ChatSessionStore
+
+    # Two stores stand in for two worker processes over the same database
+    worker_a = ChatSessionStore(max_messages=10, idle_timeout=60, max_sessions=100)
+    worker_b = ChatSessionStore(max_messages=10, idle_timeout=60, max_sessions=100)
+    session = worker_a.create()
+    worker_a.record(session, "hi", "hello")
+
+    continued = worker_b.get(session.id)
+    worker_b.record(continued, "again", "hello again")
+    assert [m["content"] for m in worker_a.get(session.id).history()] == ["hi", "hello", "again", "hello again"]
+    assert worker_b.delete(session.id) and worker_a.get(session.id) is None
+
+
+def test_chat_route_keeps_history_on_server(app, monkeypatch):
+    from app.routes import chat
+
+    seen_histories = []
+
+    async def fake_get_response(message, history=None):
+        seen_histories.append(history)
+        return f"echo {message}"
+
+    monkeypatch.setattr(chat.chat_service, "get_response", fake_get_response)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = (await client.post("/api/chat", json={"message": "hi"})).json()
+            second = (await client.post("/api/chat", json={"message": "again", "session_id": first["session_id"]})).json()
+            ended = await client.delete(f"/api/chat/sessions/{first['session_id']}")
+            return first, second, ended.status_code
+
+    first, second, ended = asyncio.run(run())
+    assert first["session_id"] and second["session_id"] == first["session_id"]
+    assert seen_histories == [[], [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "echo hi"}]]
+    assert ended == 204
+
+
+def test_unknown_session_continues_from_the_client_history(app, monkeypatch):
+    from app.routes import chat
+
+    seen_histories = []
+
+    async def fake_get_response(message, history=None):
+        seen_histories.append(history)
+        return f"echo {message}"
+
+    monkeypatch.setattr(chat.chat_service, "get_response", fake_get_response)
+    earlier = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "echo hi"}]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # e.g. the session lives in a worker that restarted
+            resumed = (await client.post("/api/chat", json={
+                "message": "again", "session_id": "gone", "conversation_history": earlier,
+            })).json()
+            # Once known, the server's copy wins over what the client sends
+            known = (await client.post("/api/chat", json={
+                "message": "third", "session_id": resumed["session_id"], "conversation_history": [],
+            })).json()
+            legacy = (await client.post("/api/chat", json={"message": "old", "conversation_history": earlier})).json()
+            return resumed, known, legacy
+
+    resumed, known, legacy = asyncio.run(run())
+    assert resumed["session_id"] not in (None, "gone") and known["session_id"] == resumed["session_id"]
+    assert seen_histories[0] == earlier
+    assert seen_histories[1] == earlier + [{"role": "user", "content": "again"}, {"role": "assistant", "content": "echo again"}]
+    assert seen_histories[2] == earlier and legacy["session_id"] is None
+
+
+def test_prompt_builder_keeps_within_budget_and_summarizes_dropped_turns():
+    from app.utils.prompt_utils import PromptBuilder, message_tokens
+
+    builder = PromptBuilder("You are a turtle.", max_prompt_tokens=200, history_budget=120, summary_budget=40)
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"question number {i} " + "about shells " * 5})
+        history.append({"role": "assistant", "content": "slow and steady " * 10})
+
+    messages, context, usage = builder.build("and lettuce?", history)
+    assert sum(message_tokens(m) for m in messages) == usage.total <= 200
+    assert usage.history_kept + usage.history_dropped == len(history)
+    assert messages[-1] == {"role": "user", "content": "and lettuce?"}
+    # The newest kept turns are verbatim; dropped questions survive only as a summary note
+    assert messages[-2] == history[-1]
+    assert context[0]["role"] == "system" and "question number" in context[0]["content"]
+    assert usage.summary_tokens <= 40
@@ -0,0 +1,171 @@
+# Streaming chat against a local fake of the OpenAI streaming completions API
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+# Delay between streamed tokens and number of tokens per completion
+TOKEN_DELAY = 0.02
+TOKEN_COUNT = 100
+
+
+class _StubStream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disconnected = threading.Event()
+    completed = threading.Event()
+    # Drop the connection after this many tokens (None streams the whole completion)
+    fail_after = None
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length))
+        assert body["stream"] is True
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        try:
+            for i in range(TOKEN_COUNT):
+                if i == self.fail_after:
+                    self.close_connection = True
+                    return
+                self._send_event({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": f"t{i} "}, "finish_reason": None}],
+                })
+                time.sleep(TOKEN_DELAY)
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+            type(self).completed.set()
+        except (BrokenPipeError, ConnectionResetError):
+            type(self).disconnected.set()
+
+    def _send_event(self, data):
+        self._send_chunk(f"data: {json.dumps(data)}\n\n".encode())
+
+    def _send_chunk(self, payload):
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    _StubStream.disconnected.clear()
+    _StubStream.completed.clear()
+    _StubStream.fail_after = None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubStream)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def _service(base_url):
+    from app.services.chat_service import TurtleChatService
+    return TurtleChatService(api_key="test", base_url=base_url, timeout=10, max_concurrency=4)
+
+
+def test_stream_forwards_tokens_as_they_arrive(app, stub):
+    async def run():
+        service = _service(stub)
+        started = time.perf_counter()
+        first_token_at = None
+        deltas = []
+        async for delta in service.stream_response("hello"):
+            if first_token_at is None:
+                first_token_at = time.perf_counter() - started
+            deltas.append(delta)
+        await service.aclose()
+        return first_token_at, time.perf_counter() - started, deltas
+
+    first_token_at, total, deltas = asyncio.run(run())
+    assert "".join(deltas) == "".join(f"t{i} " for i in range(TOKEN_COUNT))
+    assert first_token_at < total / 5
+
+
+def test_closing_stream_cancels_upstream(app, stub):
+    async def run():
+        service = _service(stub)
+        deltas = service.stream_response("hello")
+        assert await deltas.__anext__() == "t0 "
+        await deltas.aclose()
+        await service.aclose()
+
+    asyncio.run(run())
+    assert _StubStream.disconnected.wait(2)
+    assert not _StubStream.completed.is_set()
+
+
+def test_client_disconnect_cancels_upstream(app, stub, monkeypatch):
+    from app.routes import chat
+
+    async def run():
+        service = _service(stub)
+        monkeypatch.setattr(chat, "chat_service", service)
+        body = json.dumps({"message": "hello"}).encode()
+        first_line = asyncio.Event()
+        lines = []
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await first_line.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                lines.append(json.loads(message["body"]))
+                first_line.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/api/chat/stream", "raw_path": b"/api/chat/stream",
+            "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1234), "server": ("test", 80),
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        await service.aclose()
+        return lines
+
+    lines = asyncio.run(run())
+    assert lines[0] == {"delta": "t0 "}
+    assert {"done": True} not in lines
+    assert _StubStream.disconnected.wait(2)
+    assert not _StubStream.completed.is_set()
+
+
+def test_stream_failing_midway_is_not_kept_in_the_session(app, stub, monkeypatch):
+    from app.routes import chat
+    from app.services.chat_service import FALLBACK_MESSAGE, chat_sessions
+
+    _StubStream.fail_after = 3
+
+    async def run():
+        service = _service(stub)
+        monkeypatch.setattr(chat, "chat_service", service)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/chat/stream", json={"message": "hello"})
+        await service.aclose()
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    lines = asyncio.run(run())
+    deltas = [line["delta"] for line in lines if "delta" in line]
+    assert deltas == ["t0 ", "t1 ", "t2 ", FALLBACK_MESSAGE]
+    assert lines[-1]["done"] is True
+    # Neither the partial reply nor "partial + fallback" goes back to the model as history
+    assert not chat_sessions.get(lines[-1]["session_id"]).messages
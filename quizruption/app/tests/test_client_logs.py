@@ -0,0 +1,112 @@
+# Frontend log ingestion: gzip batches validated and appended to NDJSON off the request path
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def sink(tmp_path, monkeypatch):
+    from app.routes import logs
+    from app.services.client_log_service import ClientLogSink
+
+    sink = ClientLogSink(str(tmp_path / "client.ndjson"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(logs, "client_log_sink", sink)
+    sink.start()
+    yield sink
+    sink.stop()
+
+
+def _event(i, **overrides):
+    event = {
+        "timestamp": "2026-01-01T00:00:00.000Z", "level": "ERROR", "sessionId": "s-1",
+        "message": f"event {i}", "data": {"status": 500, "password": "[REDACTED]"},
+        "url": "http://localhost:3000/quiz/1", "userAgent": "test", "viewport": {"width": 800, "height": 600},
+    }
+    event.update(overrides)
+    return event
+
+
+def test_gzip_batch_is_validated_and_written(app, sink):
+    from fastapi.testclient import TestClient
+
+    batch = [_event(0), _event(1, level="warn"), {"level": "LOUD", "message": "x"}, "not an event",
+             _event(2, message="m" * 5000, data={"blob": "x" * 20000})]
+    response = TestClient(app).post(
+        "/api/logs/ingest", content=gzip.compress(json.dumps(batch).encode()),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 3, "rejected": 2}
+
+    sink.stop()
+    lines = [json.loads(line) for line in open(sink.path)]
+    assert [line["message"][:7] for line in lines] == ["event 0", "event 1", "mmmmmmm"]
+    assert lines[1]["level"] == "WARN" and lines[0]["session_id"] == "s-1" and "received_at" in lines[0]
+    assert len(lines[2]["message"]) == 2000 and "truncated" in lines[2]["data"]
+
+
+def test_malformed_and_oversized_batches_are_refused(app, sink):
+    from fastapi.testclient import TestClient
+    from app.services.client_log_service import MAX_BATCH_BYTES
+
+    client = TestClient(app)
+    assert client.post("/api/logs/ingest", content=b"{not json").status_code == 400
+    assert client.post("/api/logs/ingest", content=b"not gzip", headers={"Content-Encoding": "gzip"}).status_code == 400
+    bomb = gzip.compress(b"[" + b" " * (MAX_BATCH_BYTES * 4) + b"]")
+    assert len(bomb) < 16 * 1024
+    assert client.post("/api/logs/ingest", content=bomb, headers={"Content-Encoding": "gzip"}).status_code == 413
+    assert client.post("/api/logs/ingest", content=b"x" * (300 * 1024)).status_code == 413
+
+
+def test_pending_bytes_are_bounded_when_writer_falls_behind(tmp_path):
+    from app.services.client_log_service import ClientLogSink
+
+    sink = ClientLogSink(str(tmp_path / "client.ndjson"), max_bytes=1024 * 1024, max_pending_bytes=2000)
+    # Writer not started: nothing drains the queue
+    results = [sink.submit([{"level": "INFO", "message": f"event {i}" + "x" * 300}]) for i in range(10)]
+    assert results.count(True) == 5 and results[5:] == [False] * 5
+    assert sink.snapshot()["pending_bytes"] <= 2000
+    assert sink.snapshot()["dropped_events"] == 5
+
+    sink.start()
+    sink.stop()
+    assert sink.snapshot()["pending_bytes"] == 0
+    assert len(open(sink.path).readlines()) == 5
+
+
+def test_sink_rotates_files(tmp_path):
+    from app.services.client_log_service import ClientLogSink
+
+    sink = ClientLogSink(str(tmp_path / "client.ndjson"), max_bytes=1000, backup_count=2)
+    sink.start()
+    for i in range(30):
+        sink.submit([{"level": "INFO", "message": f"event {i}" + "x" * 100}])
+        sink.stop()
+        sink.start()
+    sink.stop()
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["client.ndjson", "client.ndjson.1", "client.ndjson.2"]
+    assert all((tmp_path / name).stat().st_size <= 1000 for name in files)
+    last = json.loads(open(sink.path).readlines()[-1])
+    assert last["message"].startswith("event 29")
+
+
+def test_each_worker_writes_and_rotates_its_own_file(tmp_path):
+    from app.services.client_log_service import ClientLogSink, worker_sink_path
+
+    shared = str(tmp_path / "client.ndjson")
+    assert worker_sink_path(shared, 1) == shared
+    sinks = [ClientLogSink(worker_sink_path(shared, 2, pid), max_bytes=1000, backup_count=1) for pid in (101, 102)]
+    for i in range(20):
+        for sink in sinks:
+            sink.start()
+            sink.submit([{"level": "INFO", "message": f"{sink.path} {i}" + "x" * 100}])
+            sink.stop()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "client.101.ndjson", "client.101.ndjson.1", "client.102.ndjson", "client.102.ndjson.1",
+    ]
+    for sink in sinks:
+        lines = open(sink.path).readlines() + open(f"{sink.path}.1").readlines()
+        assert all(json.loads(line)["message"].startswith(sink.path) for line in lines)
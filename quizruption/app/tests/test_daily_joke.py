@@ -0,0 +1,283 @@
+# Daily joke generation: one upstream call per date, even under a burst of misses
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_pool(app, monkeypatch):
+    """An empty, non-refilling joke pool so the daily path goes to the model"""
+    from app.services import joke_service
+
+    pool = joke_service.JokePool(0)
+    monkeypatch.setattr(joke_service, "joke_pool", pool)
+    return pool
+
+
+def _clear_day(day):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    db.query(models.DailyJoke).filter(models.DailyJoke.date == day).delete()
+    db.query(models.GenerationLease).delete()
+    db.commit()
+    db.close()
+
+
+def test_concurrent_misses_share_one_generation(app, monkeypatch):
+    from app.services import joke_service
+
+    calls = []
+
+    async def slow_fetch(api_key):
+        calls.append(api_key)
+        await asyncio.sleep(0.2)
+        return "Why did the turtle cross the road? It was on a slow commit."
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(joke_service, "_fetch_openai_joke", slow_fetch)
+    day = "2001-01-01"
+    _clear_day(day)
+
+    async def run():
+        return await asyncio.gather(*(joke_service.ensure_daily_joke(day) for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert {r["joke"] for r in results} == {"Why did the turtle cross the road? It was on a slow commit."}
+
+
+def test_waiters_fail_instead_of_hanging_when_generation_is_cancelled(app, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.services import joke_service
+
+    async def never_finishes(api_key):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(joke_service, "_fetch_openai_joke", never_finishes)
+    day = "2001-01-03"
+    _clear_day(day)
+
+    async def run():
+        leader = asyncio.create_task(joke_service.ensure_daily_joke(day))
+        await asyncio.sleep(0.2)
+        waiter = asyncio.create_task(joke_service.ensure_daily_joke(day))
+        await asyncio.sleep(0)
+        leader.cancel()  # e.g. the request that started it went away
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(waiter, 2)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(run())
+    assert day not in joke_service._in_flight
+    # The lease is released, so the next request can generate at once
+    db = SessionLocal()
+    assert db.query(models.GenerationLease).count() == 0
+    db.close()
+
+
+def test_waits_for_lease_held_by_another_worker(app, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.services import joke_service
+
+    async def unexpected_fetch(api_key):
+        raise AssertionError("only the lease holder should generate")
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(joke_service, "_fetch_openai_joke", unexpected_fetch)
+    day = "2001-01-02"
+    _clear_day(day)
+
+    db = SessionLocal()
+    db.add(models.GenerationLease(
+        name=f"daily_joke:{day}", owner="other-worker", expires_at=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=30)
+    ))
+    db.commit()
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.3)
+        db.add(models.DailyJoke(date=day, joke="A joke from the other worker.", source="openai"))
+        db.commit()
+
+    async def run():
+        waiter = asyncio.create_task(joke_service.ensure_daily_joke(day))
+        await other_worker_finishes()
+        return await asyncio.wait_for(waiter, 2)
+
+    result = asyncio.run(run())
+    db.close()
+    assert result["joke"] == "A joke from the other worker."
+    assert result["cached"] is True
+
+
+def test_daily_endpoint_served_from_memory_until_midnight(app, monkeypatch):
+    import httpx
+    from sqlalchemy import event
+    from app.config import settings
+    from app.database import engine
+    from app.services import joke_service
+
+    async def fetch(api_key):
+        return "Today's turtle joke is worth the wait."
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(joke_service, "_fetch_openai_joke", fetch)
+    monkeypatch.setattr(settings, "cache_version_check_interval", 60)
+    joke_service.daily_joke_cache.clear()
+    _clear_day(joke_service._today())
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/api/jokes/daily")
+            queries_after_first = len(statements)
+            second = await client.get("/api/jokes/daily")
+            return first, second, queries_after_first
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        first, second, queries_after_first = asyncio.run(run())
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert first.json()["joke"] == second.json()["joke"] == "Today's turtle joke is worth the wait."
+    assert queries_after_first > 0
+    assert len(statements) == queries_after_first
+    max_age = int(second.headers["cache-control"].split("max-age=")[1])
+    assert 0 <= max_age <= joke_service.seconds_until_midnight() + 1
+
+
+def test_pool_serves_prepared_jokes_without_repeats(monkeypatch):
+    from app.services import joke_service
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_KEY", raising=False)
+    pool = joke_service.JokePool(5)
+    history = joke_service._fallback_joke()
+    pool.remember(history)
+
+    async def run():
+        await pool.refill()
+        buffered = len(pool)
+        taken = [pool.take() for _ in range(5)]
+        await pool._refill_task
+        return buffered, taken
+
+    buffered, taken = asyncio.run(run())
+    jokes = [joke for joke, source in taken]
+    assert buffered == 5 and len(pool) == 5
+    assert len({joke_service.joke_hash(j) for j in jokes}) == 5
+    assert history not in jokes
+    assert {source for joke, source in taken} == {"fallback"}
+
+
+def test_daily_rollover_takes_from_pool(monkeypatch):
+    from app.services import joke_service
+
+    async def unexpected_fetch(api_key):
+        raise AssertionError("a prepared joke should be used")
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(joke_service, "_fetch_openai_joke", unexpected_fetch)
+    pool = joke_service.JokePool(0)
+    pool._buffer.append(("A prepared turtle joke. It was ready early.", "openai"))
+    monkeypatch.setattr(joke_service, "joke_pool", pool)
+    day = "2001-01-03"
+    _clear_day(day)
+
+    result = asyncio.run(joke_service.ensure_daily_joke(day))
+    assert result["joke"] == "A prepared turtle joke. It was ready early."
+    assert result["source"] == "openai"
+
+
+def test_suggestions_cluster_by_theme_and_are_consumed_in_bulk(app):
+    from sqlalchemy import event, func, select, text
+    from app import models
+    from app.database import SessionLocal, engine
+    from app.services import joke_service
+
+    db = SessionLocal()
+    db.query(models.JokeSuggestion).delete()
+    for suggestion in ["Coffee!", "coffee", "  COFFEE  ", "Cats", "cats.", "Mondays", "used theme"]:
+        db.add(models.JokeSuggestion(
+            suggestion_text=suggestion, theme_key=joke_service.normalize_theme(suggestion),
+            used=suggestion == "used theme",
+        ))
+    db.commit()
+
+    themes = joke_service.pending_suggestion_themes(db, limit=2)
+    assert [(key, weight) for key, _, weight in themes] == [("coffee", 3), ("cats", 2)]
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        updated = joke_service.consume_suggestion_themes(db, [key for key, _, _ in themes])
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert updated == 5
+    assert len(statements) == 1 and statements[0].startswith("UPDATE")
+    assert [key for key, _, _ in joke_service.pending_suggestion_themes(db)] == ["mondays"]
+
+    # Rendered by the dialect: booleans are 0/1 on SQLite and true/false on PostgreSQL
+    suggestion = models.JokeSuggestion
+    query = select(suggestion.theme_key, func.count()).where(
+        suggestion.used == False, suggestion.theme_key.isnot(None)  # noqa: E712
+    ).group_by(suggestion.theme_key).compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {query}")).fetchall()
+        else:
+            # PostgreSQL prefers a sequential scan of a table this small; only check the index applies
+            conn.execute(text("SET enable_seqscan = off"))
+            plan = conn.execute(text(f"EXPLAIN {query}")).fetchall()
+    assert "ix_joke_suggestions_unused_theme" in " ".join(str(row) for row in plan)
+    db.close()
+
+
+def test_pool_loads_recent_history_off_the_event_loop_and_forgets_old_hashes(app, monkeypatch):
+    import threading
+    from app import models
+    from app.database import SessionLocal
+    from app.services import joke_service
+
+    # Later than any other test's day, so these are the most recent jokes
+    days = ("2999-02-01", "2999-02-02", "2999-02-03")
+    for day in days:
+        _clear_day(day)
+    db = SessionLocal()
+    for i, day in enumerate(days):
+        db.add(models.DailyJoke(date=day, joke=f"History joke {i}. Told on {day}.", source="fallback"))
+    db.commit()
+    db.close()
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_KEY", raising=False)
+    pool = joke_service.JokePool(0, max_seen=2)
+    loaded_on = []
+    recent_history = pool._recent_history
+    monkeypatch.setattr(pool, "_recent_history", lambda: loaded_on.append(threading.current_thread()) or recent_history())
+
+    asyncio.run(pool.refill())
+    assert loaded_on and loaded_on[0] is not threading.main_thread()
+    # Only the newest two fit, and they are the ones kept
+    assert list(pool._seen) == [
+        joke_service.joke_hash("History joke 1. Told on 2999-02-02."),
+        joke_service.joke_hash("History joke 2. Told on 2999-02-03."),
+    ]
+    pool.remember("A brand new joke. Never told.")
+    assert len(pool._seen) == 2
+    assert joke_service.joke_hash("History joke 1. Told on 2999-02-02.") not in pool._seen
@@ -0,0 +1,130 @@
+# Uploaded images are deleted only once nothing references them
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def db(app):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _store(upload_root, color):
+    from app.services.image_service import process_and_save
+
+    output = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(output, format="PNG")
+    manifest = process_and_save(output.getvalue(), (800, 800), str(upload_root / "profile_images"),
+                                "/uploads/profile_images")
+    return manifest["original"], upload_root / "profile_images" / Path(manifest["original"]).name
+
+
+def _user(db, name, image_url):
+    from app.models import User
+
+    user = User(username=name, email=f"{name}@example.com", profile_image_url=image_url)
+    user.set_password(name)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_shared_image_is_kept_until_its_last_reference_goes(db, tmp_path):
+    from app.services.image_service import count_references, release_image
+
+    url, path = _store(tmp_path, (10, 20, 30))
+    first = _user(db, "gc_first", url)
+    second = _user(db, "gc_second", f"{url}?v=2")
+    assert count_references(db, url) == 2
+
+    first.profile_image_url = None
+    db.commit()
+    assert release_image(db, url, tmp_path, grace_seconds=0) is False
+    assert path.exists()
+
+    second.profile_image_url = None
+    db.commit()
+    assert release_image(db, url, tmp_path, grace_seconds=0) is True
+    assert not path.exists()
+    assert not list(path.parent.glob(f"{path.stem}.*"))
+
+
+def test_names_containing_another_name_are_not_references(db, tmp_path):
+    from app.models import Quiz
+    from app.services.image_service import count_references, release_image
+
+    directory = tmp_path / "profile_images"
+    directory.mkdir()
+    (directory / "a.jpg").write_bytes(b"old upload")
+    db.add(Quiz(title="Lookalike", type="personality",
+                personalities=json.dumps([{"id": "b", "name": "B", "image_url": "/uploads/profile_images/ba.jpg"}])))
+    _user(db, "gc_lookalike", "/uploads/profile_images/xa.jpg")
+
+    assert count_references(db, "/uploads/profile_images/a.jpg") == 0
+    assert release_image(db, "/uploads/profile_images/a.jpg", tmp_path, grace_seconds=0) is True
+    assert not (directory / "a.jpg").exists()
+
+
+def test_release_keeps_a_blob_just_deduplicated_onto(db, tmp_path):
+    from app.services.image_service import release_image
+
+    url, path = _store(tmp_path, (40, 50, 60))
+    old = path.stat().st_mtime - 7200
+    os.utime(path, (old, old))
+    # Another user uploads identical content; its URL is not saved to their profile yet
+    assert _store(tmp_path, (40, 50, 60)) == (url, path)
+
+    assert release_image(db, url, tmp_path, grace_seconds=3600) is False
+    assert path.exists()
+    assert release_image(db, url, tmp_path, grace_seconds=0) is True
+
+
+def test_garbage_collection_sweeps_only_old_unreferenced_images(db, tmp_path):
+    from app.models import Quiz, Result
+    from app.services.image_service import collect_garbage
+
+    kept_url, kept = _store(tmp_path, (1, 1, 1))
+    _, orphan = _store(tmp_path, (2, 2, 2))
+    result_url, in_result = _store(tmp_path, (3, 3, 3))
+    _user(db, "gc_keeper", kept_url)
+    quiz = Quiz(title="GC quiz", type="personality")
+    db.add(quiz)
+    db.flush()
+    db.add(Result(quiz_id=quiz.id, personality_data=json.dumps({"name": "R", "image_url": result_url})))
+    db.commit()
+
+    # Within the grace period even the orphan survives: its URL may not be saved yet
+    assert collect_garbage(db, tmp_path, grace_seconds=3600)["removed"] == 0
+    stats = collect_garbage(db, tmp_path, grace_seconds=0)
+
+    assert stats["removed"] == 1 and stats["freed_bytes"] > 0
+    assert not orphan.exists() and not list(orphan.parent.glob(f"{orphan.stem}.*"))
+    assert kept.exists() and in_result.exists()
+
+
+def test_garbage_collection_drops_outdated_share_cards(db, tmp_path):
+    from app.services.image_service import collect_garbage
+
+    cards = tmp_path / "share_cards"
+    cards.mkdir()
+    for age, name in ((300, "7-aaaaaaaaaaaaaaaa.png"), (200, "7-bbbbbbbbbbbbbbbb.png"), (100, "7-cccccccccccccccc.png"),
+                      (300, "7-aaaaaaaaaaaaaaaa.webp"), (300, "8-dddddddddddddddd.png"), (300, "notes.txt")):
+        (cards / name).write_bytes(b"card")
+        os.utime(cards / name, (time.time() - age, time.time() - age))
+
+    stats = collect_garbage(db, tmp_path, grace_seconds=3600)
+
+    assert stats["removed_cards"] == 2
+    # The newest version of each result and format stays, anything unrecognized is left alone
+    assert sorted(p.name for p in cards.iterdir()) == [
+        "7-aaaaaaaaaaaaaaaa.webp", "7-cccccccccccccccc.png", "8-dddddddddddddddd.png", "notes.txt",
+    ]
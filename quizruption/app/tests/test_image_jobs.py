@@ -0,0 +1,71 @@
+# Uploads are accepted with 202 and processed in the background; any worker can report a job's status
+import asyncio
+import io
+import time
+
+import httpx
+from PIL import Image
+
+
+def _png(size=(64, 48), color=(200, 30, 30)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _upload_and_poll(app, url, content, timeout=30):
+    """POST an image, then poll its status_url until the job finishes; returns (202 body, final status)"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post(url, files={"image": ("image.png", content, "image/png")})
+            assert accepted.status_code == 202, accepted.text
+            body = accepted.json()
+            deadline = time.monotonic() + timeout
+            while True:
+                status = await client.get(body["status_url"])
+                assert status.status_code == 200
+                if status.json()["status"] in ("done", "failed") or time.monotonic() > deadline:
+                    return body, status.json()
+                await asyncio.sleep(0.05)
+    return asyncio.run(run())
+
+
+def test_upload_is_accepted_then_polled_until_done(app, upload_token):
+    from app.database import SessionLocal
+    from app.models import User
+
+    accepted, job = _upload_and_poll(app, f"/api/upload/profile-image?token={upload_token}", _png())
+
+    assert accepted["status"] in ("pending", "processing")
+    assert job["status"] == "done"
+    assert job["image_url"].startswith("/uploads/profile_images/")
+    assert job["variants"]
+    db = SessionLocal()
+    assert db.query(User).filter(User.username == "uploader").one().profile_image_url == job["image_url"]
+    db.close()
+
+
+def test_undecodable_image_fails_the_job(app, upload_token):
+    # A valid PNG header (so the upload is accepted) with the image data cut off
+    truncated = _png((300, 300))[:120]
+
+    _, job = _upload_and_poll(app, f"/api/upload/personality-image?token={upload_token}", truncated)
+
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Error processing image")
+    assert job["image_url"] is None
+
+
+def test_job_status_is_answered_by_another_worker(app, upload_token):
+    from fastapi.testclient import TestClient
+    from app.services.image_service import ImagePipeline, image_pipeline
+
+    _, job = _upload_and_poll(app, f"/api/upload/personality-image?token={upload_token}", _png(color=(1, 2, 3)))
+
+    # A worker that never saw the job reads it from the shared table
+    other_worker = ImagePipeline(max_workers=1, max_pending=1)
+    assert other_worker.get_job(job["job_id"]).to_dict() == job
+    image_pipeline._jobs.clear()
+    assert TestClient(app).get(f"/api/upload/jobs/{job['job_id']}").json() == job
+    assert other_worker.get_job("missing") is None
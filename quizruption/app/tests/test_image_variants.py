@@ -0,0 +1,91 @@
+# Responsive variants: one manifest per image, and the best format and smallest covering size per request
+import gzip
+import io
+import json
+from pathlib import Path
+
+from PIL import Image
+
+
+def _png(size, color=(20, 120, 220)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _manifest(formats=("avif", "webp", "jpeg")):
+    variants = []
+    for size, (width, height) in ((48, (48, 24)), (128, (128, 64)), (400, (400, 200))):
+        for fmt in formats:
+            variants.append({"size": size, "width": width, "height": height, "format": fmt,
+                             "url": f"/uploads/x.{size}.{fmt}", "bytes": 1})
+    return {"original": "/uploads/x.jpg", "bytes": 1, "variants": variants}
+
+
+def test_variants_and_manifest_are_written_once(tmp_path):
+    from app.services.image_service import load_manifest, process_and_save, variant_formats
+
+    content = _png((1000, 500))
+    manifest = process_and_save(content, (800, 800), str(tmp_path), "/uploads/profile_images")
+
+    original = tmp_path / Path(manifest["original"]).name
+    assert manifest["original"].startswith("/uploads/profile_images/") and original.exists()
+    assert manifest["deduplicated"] is False
+    # Every size up to the processed 800px edge, in every format this Pillow build encodes
+    assert {(v["size"], v["format"]) for v in manifest["variants"]} == {
+        (size, fmt) for size in (48, 128, 400, 800) for fmt in variant_formats()
+    }
+    for variant in manifest["variants"]:
+        with Image.open(tmp_path / Path(variant["url"]).name) as image:
+            assert max(image.size) == variant["size"]
+            assert image.size == (variant["width"], variant["height"])
+            assert image.format.lower() == variant["format"]
+    stored = load_manifest(original)
+    assert stored == {key: value for key, value in manifest.items() if key != "deduplicated"}
+    assert json.loads(gzip.decompress((tmp_path / f"{original.stem}.variants.json.gz").read_bytes())) == stored
+
+    again = process_and_save(content, (800, 800), str(tmp_path), "/uploads/profile_images")
+    assert again["deduplicated"] is True
+    assert again["variants"] == manifest["variants"]
+
+
+def test_best_accepted_format_then_smallest_covering_size(monkeypatch):
+    from app.services import image_service
+
+    monkeypatch.setattr(image_service, "variant_formats", lambda: ("avif", "webp", "jpeg"))
+    manifest = _manifest()
+    select = image_service.select_variant
+
+    assert select(manifest, 100, "image/avif,image/webp,*/*")["format"] == "avif"
+    assert select(manifest, 100, "image/webp,*/*")["format"] == "webp"
+    assert select(manifest, 100, "text/html,*/*")["format"] == "jpeg"
+    assert select(manifest, 100, "")["format"] == "jpeg"
+    assert select(manifest, 100, "image/webp")["size"] == 128
+    assert select(manifest, 128, "image/webp")["size"] == 128
+    assert select(manifest, 20, "image/webp")["size"] == 48
+    # Nothing covers the request: the largest there is
+    assert select(manifest, 2000, "image/webp")["size"] == 400
+    # A format the client accepts but the image lacks falls through to the next one
+    assert select(_manifest(("webp", "jpeg")), 100, "image/avif,image/webp")["format"] == "webp"
+
+
+def test_variant_route_negotiates_on_accept(app):
+    from fastapi.testclient import TestClient
+    from app.routes.uploads import UPLOAD_DIR
+    from app.services.image_service import process_and_save, variant_formats
+
+    manifest = process_and_save(_png((900, 900), (9, 9, 9)), (800, 800), str(UPLOAD_DIR), "/uploads/profile_images")
+    url = f"/api/upload/variants/profile_images/{Path(manifest['original']).name}"
+    client = TestClient(app)
+
+    for accept, expected in (("image/avif,image/webp,*/*", variant_formats()[0]), ("image/webp,*/*", "webp"), ("*/*", "jpeg")):
+        response = client.get(url, params={"size": 100}, headers={"Accept": accept})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == f"image/{expected}"
+        assert response.headers["vary"] == "Accept"
+        assert "immutable" in response.headers["cache-control"]
+        with Image.open(io.BytesIO(response.content)) as image:
+            assert image.size == (128, 128)
+
+    assert client.get(url.replace("profile_images", "secrets")).status_code == 404
+    assert client.get("/api/upload/variants/profile_images/" + "0" * 32 + ".jpg").status_code == 404
@@ -0,0 +1,123 @@
+# Log view: tail from the end of app.log, level filter, cursor polling across rotation
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+
+def _write(path, count, start=0):
+    with open(path, "a") as f:
+        for i in range(start, start + count):
+            level = "ERROR" if i % 10 == 0 else "INFO"
+            f.write(f"2026-01-01 00:00:00,000 {level} app.test: line {i}\n")
+
+
+class _CountingReads:
+    """Wraps open() in log_utils to count bytes read"""
+
+    def __init__(self, monkeypatch):
+        import builtins
+        from app.utils import log_utils
+
+        self.bytes = 0
+        real_open = builtins.open
+
+        def counting_open(*args, **kwargs):
+            file = real_open(*args, **kwargs)
+            real_read = file.read
+
+            def read(*read_args):
+                data = real_read(*read_args)
+                self.bytes += len(data)
+                return data
+
+            file.read = read
+            return file
+
+        monkeypatch.setattr(log_utils, "open", counting_open, raising=False)
+
+
+def test_tail_reads_only_the_end_of_a_large_file(tmp_path, monkeypatch):
+    from app.utils.log_utils import tail_log
+
+    path = str(tmp_path / "app.log")
+    _write(path, 50_000)
+    reads = _CountingReads(monkeypatch)
+
+    result = tail_log(5, path=path)
+    assert [line.rsplit(" ", 1)[1] for line in result["lines"]] == ["49995", "49996", "49997", "49998", "49999"]
+    assert os.path.getsize(path) > 2_000_000
+    assert reads.bytes <= 8192
+
+
+def test_tail_filters_by_level_and_continues_into_backups(tmp_path):
+    from app.utils.log_utils import tail_log
+
+    path = str(tmp_path / "app.log")
+    _write(path + ".1", 30)
+    _write(path, 15, start=30)
+
+    errors = tail_log(3, level="error", path=path)["lines"]
+    assert [line.rsplit(" ", 1)[1] for line in errors] == ["20", "30", "40"]
+    assert all(" ERROR " in line for line in errors)
+
+
+def test_cursor_returns_only_new_complete_lines(tmp_path):
+    from app.utils.log_utils import follow_log, tail_log
+
+    path = str(tmp_path / "app.log")
+    _write(path, 3)
+    cursor = tail_log(10, path=path)["cursor"]
+
+    _write(path, 2, start=3)
+    with open(path, "a") as f:
+        f.write("2026-01-01 00:00:00,000 INFO app.test: partial")
+    result = follow_log(cursor, path=path)
+    assert [line.rsplit(" ", 1)[1] for line in result["lines"]] == ["3", "4"]
+
+    with open(path, "a") as f:
+        f.write(" line\n")
+    result = follow_log(result["cursor"], path=path)
+    assert result["lines"] == ["2026-01-01 00:00:00,000 INFO app.test: partial line"]
+    assert follow_log(result["cursor"], path=path)["lines"] == []
+
+
+def test_cursor_follows_rotation(tmp_path):
+    from app.utils.log_utils import follow_log, tail_log
+
+    path = str(tmp_path / "app.log")
+    handler = RotatingFileHandler(path, maxBytes=100, backupCount=3)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger = logging.getLogger("test_log_tail.rotation")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning("before 0")
+        cursor = tail_log(10, path=path)["cursor"]
+        for i in range(1, 13):
+            logger.warning(f"after {i}")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert os.path.exists(path + ".2")
+
+    lines = follow_log(cursor, path=path)["lines"]
+    assert lines[-1] == "WARNING after 12"
+    # Everything after the cursor comes back once, in order, across the backups
+    assert [int(line.rsplit(" ", 1)[1]) for line in lines] == list(range(1, 13))
+
+
+def test_logs_endpoint_tails_and_polls(app, monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from app.utils import log_utils
+
+    path = str(tmp_path / "app.log")
+    monkeypatch.setattr(log_utils, "LOG_PATH", path)
+    _write(path, 20)
+
+    client = TestClient(app)
+    first = client.get("/api/jokes/logs", params={"lines": 2}).json()
+    assert len(first["lines"]) == 2 and first["log_tail"].endswith("line 19")
+
+    _write(path, 11, start=20)
+    polled = client.get("/api/jokes/logs", params={"cursor": first["cursor"], "level": "ERROR"}).json()
+    assert [line.rsplit(" ", 1)[1] for line in polled["lines"]] == ["20", "30"]
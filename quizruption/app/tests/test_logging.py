@@ -0,0 +1,142 @@
+# Logging pipeline: records leave the request thread through a queue as JSON with request ids
+import asyncio
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener
+
+import httpx
+
+
+class _Capture(logging.Handler):
+    def __init__(self, formatter):
+        super().__init__()
+        self.setFormatter(formatter)
+        self.lines = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+
+def _pipeline(formatter, size=100, sample_rate=1.0):
+    from app.utils.log_utils import NonBlockingQueueHandler, RequestIdFilter, SamplingFilter
+
+    handler = NonBlockingQueueHandler(queue.Queue(size))
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(RequestIdFilter())
+    capture = _Capture(formatter)
+    logger = logging.getLogger(f"test_logging.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger, handler, capture
+
+
+def test_request_records_are_json_with_the_request_id(tmp_path):
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from app.utils.log_utils import JsonFormatter, RequestIdMiddleware, tail_log
+
+    logger, handler, capture = _pipeline(JsonFormatter())
+    listener = QueueListener(handler.queue, capture)
+    listener.start()
+
+    async def endpoint(request):
+        logger.info("handling %s", request.url.path, extra={"quiz_id": 7})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed")
+        return PlainTextResponse("ok")
+
+    app = RequestIdMiddleware(Starlette(routes=[Route("/work", endpoint)]))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            generated = await client.get("/work")
+            forwarded = await client.get("/work", headers={"X-Request-ID": "frontend-123"})
+            rejected = await client.get("/work", headers={"X-Request-ID": "bad id\n"})
+            return generated, forwarded, rejected
+
+    try:
+        generated, forwarded, rejected = asyncio.run(run())
+    finally:
+        listener.stop()
+
+    records = [json.loads(line) for line in capture.lines]
+    assert records[0]["message"] == "handling /work" and records[0]["quiz_id"] == 7
+    assert records[0]["request_id"] == records[1]["request_id"] == generated.headers["x-request-id"]
+    assert "ValueError: boom" in records[1]["exc_info"]
+    assert records[2]["request_id"] == forwarded.headers["x-request-id"] == "frontend-123"
+    assert rejected.headers["x-request-id"] not in ("bad id", "frontend-123")
+    assert threading.current_thread().name not in capture.threads
+
+    # The log view's level filter understands JSON lines
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(capture.lines) + "\n")
+    assert [json.loads(line)["message"] for line in tail_log(10, "ERROR", path=str(path))["lines"]] == ["failed", "failed", "failed"]
+
+
+def test_debug_records_are_sampled():
+    logger, handler, capture = _pipeline(logging.Formatter("%(levelname)s"), size=1000, sample_rate=0.1)
+    for _ in range(100):
+        logger.debug("chatty")
+        logger.info("kept")
+    kept = []
+    while not handler.queue.empty():
+        kept.append(handler.queue.get_nowait().levelname)
+    assert kept.count("DEBUG") == 10
+    assert kept.count("INFO") == 100
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    from app.utils import log_utils
+
+    logger, handler, capture = _pipeline(logging.Formatter("%(message)s"), size=2)
+    before = log_utils.dropped_records
+    for i in range(5):
+        logger.warning("record %d", i)
+    assert handler.queue.qsize() == 2
+    assert log_utils.dropped_records - before == 3
+
+
+def test_app_responses_carry_request_id(app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    response = client.get("/health", headers={"X-Request-ID": "abc-1"})
+    assert response.headers["x-request-id"] == "abc-1"
+    assert len(client.get("/health").headers["x-request-id"]) == 32
+
+
+def test_shared_log_is_reopened_after_external_rotation(tmp_path, monkeypatch):
+    from logging.handlers import WatchedFileHandler
+    from app.utils import log_utils
+
+    # A fresh pipeline, as in a worker process started alongside others
+    for name in ("_queue_handler", "_file_handler", "_listener"):
+        monkeypatch.setattr(log_utils, name, None)
+    path = tmp_path / "app.log"
+    root = logging.getLogger()
+    level = root.level
+    log_utils.setup_logging("INFO", path=str(path), rotate=False)
+    try:
+        assert isinstance(log_utils._file_handler, WatchedFileHandler)
+        logging.getLogger("test_logging.shared").warning("before rotation")
+        log_utils.stop_logging()
+        path.rename(tmp_path / "app.log.1")  # e.g. logrotate
+        log_utils.setup_logging("INFO", path=str(path), rotate=False)
+        logging.getLogger("test_logging.shared").warning("after rotation")
+        log_utils.stop_logging()
+    finally:
+        log_utils.stop_logging()
+        root.removeHandler(log_utils._queue_handler)
+        log_utils._file_handler.close()
+        root.setLevel(level)
+
+    assert "before rotation" in (tmp_path / "app.log.1").read_text()
+    assert "after rotation" in path.read_text() and "before" not in path.read_text()
@@ -0,0 +1,52 @@
+# /metrics: per-route latency, size, in-flight and query counts in the text exposition format
+import re
+
+
+def _sample(text, name, **labels):
+    """Value of the sample ``name{labels}`` in an exposition, 0 when absent"""
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(wanted)}\}} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    from app.utils.metrics import Histogram, registry
+
+    histogram = Histogram("test_latency_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    registry.metrics.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/x")
+    text = "\n".join(histogram.render())
+    assert _sample(text, "test_latency_seconds_bucket", route="/x", le="0.1") == 1
+    assert _sample(text, "test_latency_seconds_bucket", route="/x", le="1.0") == 3
+    assert _sample(text, "test_latency_seconds_bucket", route="/x", le="+Inf") == 4
+    assert _sample(text, "test_latency_seconds_count", route="/x") == 4
+    assert _sample(text, "test_latency_seconds_sum", route="/x") == 6.05
+    assert "# TYPE test_latency_seconds histogram" in text
+
+
+def test_requests_are_grouped_by_route_template(app):
+    from fastapi.testclient import TestClient
+    from app.utils import metrics
+
+    client = TestClient(app)
+    route = "/api/quizzes/{quiz_id}"
+    before = client.get("/metrics").text
+    for quiz_id in (999_991, 999_992):
+        assert client.get(f"/api/quizzes/{quiz_id}").status_code == 404
+    response = client.get("/metrics")
+    after = response.text
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "/999991" not in after
+    requests = _sample(after, "http_requests_total", method="GET", route=route, status="404")
+    assert requests - _sample(before, "http_requests_total", method="GET", route=route, status="404") == 2
+    latency = _sample(after, "http_request_duration_seconds_count", method="GET", route=route)
+    assert latency - _sample(before, "http_request_duration_seconds_count", method="GET", route=route) == 2
+    assert _sample(after, "http_response_size_bytes_sum", method="GET", route=route) > 0
+    queries = _sample(after, "db_queries_total", route=route) - _sample(before, "db_queries_total", route=route)
+    assert queries >= 2
+    assert _sample(after, "db_queries_per_request_count", route=route) >= 2
+    # The scrape itself is the only request in flight
+    assert "\nhttp_requests_in_flight 1\n" in after
+    assert metrics.http_in_flight.value() == 0
@@ -0,0 +1,91 @@
+# Admin sampling profiler: whole-worker profiles and opt-in per-request profiles
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    return "s3cret"
+
+
+def test_profiler_finds_the_hot_function():
+    from app.utils.profiler import SamplingProfiler
+
+    profiler = SamplingProfiler(0.002)
+    worker = threading.Thread(target=_busy_loop, args=(0.3,), name="busy")
+    profiler.start()
+    worker.start()
+    worker.join()
+    profiler.stop()
+
+    lines = profiler.collapsed().splitlines()
+    assert profiler.samples > 20
+    busy = [line for line in lines if line.startswith("busy;")]
+    assert busy and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy if "_busy_loop (test_profiler.py" in line) > 20
+
+
+def test_admin_endpoints_require_the_token(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.get("/api/admin/profile", params={"seconds": 0.01}).status_code == 404
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    assert client.get("/api/admin/profile", params={"seconds": 0.01}).status_code == 403
+    assert client.get("/api/admin/profile", params={"seconds": 0.01},
+                      headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_worker_profile_returns_collapsed_stacks(app, admin_token):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            worker = threading.Thread(target=_busy_loop, args=(0.3,), name="busy")
+            worker.start()
+            response = await client.get(
+                "/api/admin/profile", params={"seconds": 0.2, "interval_ms": 2}, headers={"X-Admin-Token": admin_token}
+            )
+            worker.join()
+            return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 10
+    assert "_busy_loop (test_profiler.py" in response.text
+
+
+def test_request_opts_in_to_profiling(app, admin_token, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.services import joke_service
+
+    def slow_take():
+        _busy_loop(0.2)
+        return "A profiled turtle joke.", "fallback"
+
+    monkeypatch.setattr(joke_service.joke_pool, "take_or_fallback", slow_take)
+    client = TestClient(app)
+    assert "x-profile-id" not in client.get("/api/jokes/random", headers={"X-Profile": "1"}).headers
+
+    response = client.get("/api/jokes/random", headers={"X-Profile": "1", "X-Admin-Token": admin_token})
+    profile_id = response.headers["x-profile-id"]
+    listed = client.get("/api/admin/profiles", headers={"X-Admin-Token": admin_token}).json()
+    assert listed[0]["id"] == profile_id and listed[0]["request"] == "GET /api/jokes/random"
+
+    stacks = client.get(f"/api/admin/profiles/{profile_id}", headers={"X-Admin-Token": admin_token}).text
+    assert "random_joke (jokes.py" in stacks and "slow_take (test_profiler.py" in stacks
+    assert client.get("/api/admin/profiles/missing", headers={"X-Admin-Token": admin_token}).status_code == 404
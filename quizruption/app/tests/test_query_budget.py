@@ -0,0 +1,102 @@
+# Query budgets fail requests that run too many statements; slow statements are logged
+import logging
+
+
+def _create_quizzes(count, questions=3):
+    from app import schemas
+    from app.database import SessionLocal
+    from app.services import quiz_service
+
+    db = SessionLocal()
+    ids = []
+    for i in range(count):
+        quiz = quiz_service.create_quiz(db, schemas.QuizCreate(
+            title=f"Budget quiz {i}", type="trivia",
+            questions=[
+                {"text": f"Q{j}", "answers": [{"text": "yes", "is_correct": True}, {"text": "no"}]}
+                for j in range(questions)
+            ],
+        ))
+        ids.append(quiz.id)
+    db.close()
+    return ids
+
+
+def _count_statements(engine, fn):
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, len(statements)
+
+
+def test_quiz_list_query_count_does_not_grow_with_quizzes(app):
+    from fastapi.testclient import TestClient
+    from app.database import engine
+
+    client = TestClient(app)
+    _create_quizzes(2)
+    few, few_queries = _count_statements(engine, lambda: client.get("/api/quizzes/", params={"limit": 1000}))
+    _create_quizzes(10)
+    many, many_queries = _count_statements(engine, lambda: client.get("/api/quizzes/", params={"limit": 1000}))
+
+    assert few.status_code == many.status_code == 200
+    assert len(many.json()) >= len(few.json()) + 10
+    assert all(len(q["questions"][0]["answers"]) == 2 for q in many.json() if q["title"].startswith("Budget"))
+    assert many_queries == few_queries <= 4
+
+
+def test_request_over_budget_fails(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.routes import quizzes
+
+    quiz_id = _create_quizzes(1)[0]
+    monkeypatch.setattr(quizzes.get_quiz, "query_budget", 1)
+    response = TestClient(app).get(f"/api/quizzes/{quiz_id}")
+    assert response.status_code == 500
+    assert response.json()["detail"] == "GET /api/quizzes/{quiz_id} exceeded its query budget of 1 statements"
+
+
+def test_user_stats_stay_within_budget(app):
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.models import Result, User
+
+    quiz_ids = _create_quizzes(6, questions=4)
+    db = SessionLocal()
+    user = User(username="stats-user", email="stats@example.com")
+    user.set_password("stats")
+    db.add(user)
+    db.flush()
+    db.add_all([Result(quiz_id=quiz_id, user_id=user.id, score=2) for quiz_id in quiz_ids])
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    response = TestClient(app).get(f"/api/auth/profile/{user_id}/stats")
+    assert response.status_code == 200
+    trivia = response.json()["trivia_results"]
+    assert len(trivia) == 6
+    assert {r["total_questions"] for r in trivia} == {4}
+    assert {r["quiz_title"] for r in trivia} == {f"Budget quiz {i}" for i in range(6)}
+
+
+def test_slow_queries_are_logged_with_params_and_route(app, monkeypatch, caplog):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "slow_query_ms", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.sql.slow"):
+        TestClient(app).get("/api/quizzes/424242")
+    records = [r for r in caplog.records if r.name == "app.sql.slow" and "424242" in r.getMessage()]
+    assert records
+    assert records[0].route == "GET /api/quizzes/{quiz_id}"
+    assert "SELECT" in records[0].getMessage()
@@ -0,0 +1,96 @@
+# Token-bucket limits on write endpoints and duplicate suggestion suppression
+import asyncio
+
+import httpx
+
+
+def _client(app, ip):
+    transport = httpx.ASGITransport(app=app, client=(ip, 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_bucket_allows_burst_then_refills():
+    from app.utils.rate_limit import MemoryBucketStore
+
+    store = MemoryBucketStore()
+    assert [store.take("k", 3, 1, now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert store.take("k", 3, 1, now=100.0) == 1.0
+    assert store.take("k", 3, 1, now=101.0) == 0
+    assert store.take("other", 3, 1, now=101.0) == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    from app.utils.rate_limit import SQLiteBucketStore
+
+    path = str(tmp_path / "limits.db")
+    worker_a, worker_b = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert worker_a.take("k", 2, 0.5, now=10.0) == 0
+    assert worker_b.take("k", 2, 0.5, now=10.0) == 0
+    assert worker_a.take("k", 2, 0.5, now=10.0) == 2.0
+
+
+def test_suggestion_flood_is_rejected_with_retry_after(app):
+    from app.utils.rate_limit import rejections
+
+    before = rejections["rate_limited:suggestions"]
+
+    async def run():
+        async with _client(app, "10.0.0.1") as client:
+            return [
+                await client.post("/api/jokes/suggestions", json={"suggestion_text": f"theme {i}"})
+                for i in range(8)
+            ]
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 5 + [429] * 3
+    assert int(responses[-1].headers["retry-after"]) > 0
+    assert rejections["rate_limited:suggestions"] - before == 3
+
+
+def test_repeated_suggestion_is_not_stored_twice(app):
+    from app import models
+    from app.database import SessionLocal
+    from app.utils.rate_limit import rejections
+
+    before = rejections["duplicate:suggestions"]
+
+    async def run():
+        async with _client(app, "10.0.0.2") as client:
+            first = await client.post("/api/jokes/suggestions", json={"suggestion_text": "Turtles in tech"})
+            again = await client.post("/api/jokes/suggestions", json={"suggestion_text": "turtles in TECH!"})
+            stats = await client.get("/api/rate-limit/stats")
+            return first.json(), again.json(), stats.json()
+
+    first, again, stats = asyncio.run(run())
+    assert "duplicate" not in first and again["duplicate"] is True
+    assert rejections["duplicate:suggestions"] - before == 1
+    assert stats["rejected"]["duplicate:suggestions"] >= 1
+
+    db = SessionLocal()
+    assert db.query(models.JokeSuggestion).filter(models.JokeSuggestion.theme_key == "turtles in tech").count() == 1
+    db.close()
+
+
+def test_chat_and_log_ingest_are_not_counted_as_writes():
+    from app.utils.rate_limit import DEFAULT_RULES, RateLimitMiddleware
+
+    passed = []
+
+    async def endpoint(scope, receive, send):
+        passed.append(scope["path"])
+
+    limiter = RateLimitMiddleware(endpoint, DEFAULT_RULES)
+
+    async def call(path):
+        scope = {"type": "http", "method": "POST", "path": path, "headers": [], "client": ("10.0.0.3", 1)}
+        await limiter(scope, None, None)
+
+    async def run():
+        for _ in range(100):
+            await call("/api/chat/stream")
+            await call("/api/logs/ingest")
+
+    asyncio.run(run())
+    assert len(passed) == 200
+    writes = next(rule for rule in DEFAULT_RULES if rule.name == "writes")
+    assert writes.matches("POST", "/api/quizzes/")
@@ -0,0 +1,160 @@
+# Share cards are rendered once per version, cached on disk, and shared by concurrent requests
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def renders(app, monkeypatch):
+    """Card renders, run in this process instead of the image worker pool"""
+    from app.services import share_service
+
+    calls = []
+
+    async def run(fn, *args):
+        calls.append(args)
+        return await asyncio.to_thread(fn, *args)
+
+    monkeypatch.setattr(share_service.image_pipeline, "run", run)
+    return calls
+
+
+def _create_result(score=3):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    quiz = models.Quiz(title="Share card quiz", type="trivia")
+    db.add(quiz)
+    db.flush()
+    result = models.Result(quiz_id=quiz.id, score=score)
+    db.add(result)
+    db.commit()
+    result_id = result.id
+    db.close()
+    return result_id
+
+
+def test_card_is_rendered_once_then_served_from_disk(app, renders):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    result_id = _create_result()
+    first = client.get(f"/api/results/{result_id}/share.png")
+    second = client.get(f"/api/results/{result_id}/share.png")
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    assert first.content[:8] == b"\x89PNG\r\n\x1a\n"
+    assert second.content == first.content
+    assert len(renders) == 1
+    # Another format is a separate card
+    assert client.get(f"/api/results/{result_id}/share.webp").content[8:12] == b"WEBP"
+    assert len(renders) == 2
+
+
+def test_matching_etag_gets_304_without_rendering(app, renders):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    result_id = _create_result(score=5)
+    etag = client.get(f"/api/results/{result_id}/share.png").headers["etag"]
+    assert len(renders) == 1
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = client.get(f"/api/results/{result_id}/share.png", headers={"If-None-Match": header})
+        assert revalidated.status_code == 304 and revalidated.content == b"", header
+        assert revalidated.headers["etag"] == etag
+    # The WebP card has its own tag; a PNG tag does not skip rendering it
+    webp = client.get(f"/api/results/{result_id}/share.webp", headers={"If-None-Match": etag})
+    assert webp.status_code == 200 and webp.headers["etag"] != etag
+    assert len(renders) == 2
+
+
+def test_concurrent_requests_share_one_render(app, monkeypatch, tmp_path):
+    from app.services import share_service
+
+    monkeypatch.setattr(share_service, "SHARE_CARD_DIR", tmp_path)
+    calls = []
+
+    async def run(fn, *args):
+        calls.append(args)
+        await asyncio.sleep(0.05)
+        return fn(*args)
+
+    monkeypatch.setattr(share_service.image_pipeline, "run", run)
+    spec = {"id": 1, "version": "v1", "quiz_title": "Quiz", "score": 1, "total": 2,
+            "personality": None, "emoji": None, "image_path": None}
+
+    async def burst():
+        return await asyncio.gather(*(share_service.get_share_card(spec) for _ in range(5)))
+
+    paths = asyncio.run(burst())
+    assert len(calls) == 1
+    assert paths == [tmp_path / "1-v1.png"] * 5
+    assert paths[0].exists()
+    assert not share_service._in_flight
+
+
+def test_waiters_fail_instead_of_hanging_when_the_render_is_cancelled(app, monkeypatch, tmp_path):
+    from app.services import share_service
+
+    monkeypatch.setattr(share_service, "SHARE_CARD_DIR", tmp_path)
+
+    async def never_finishes(fn, *args):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(share_service.image_pipeline, "run", never_finishes)
+    spec = {"id": 2, "version": "v1"}
+
+    async def scenario():
+        leader = asyncio.create_task(share_service.get_share_card(spec))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(share_service.get_share_card(spec))
+        await asyncio.sleep(0)
+        leader.cancel()  # e.g. the client disconnected
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(waiter, timeout=1)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+    assert not share_service._in_flight
+
+
+def test_card_image_must_be_an_uploaded_image(app):
+    import json
+    from app import models
+    from app.database import SessionLocal
+    from app.services import share_service
+
+    def spec_for(image_url):
+        db = SessionLocal()
+        quiz = models.Quiz(title="Card image quiz", type="personality")
+        db.add(quiz)
+        db.flush()
+        result = models.Result(quiz_id=quiz.id, personality_data=json.dumps({"name": "P", "image_url": image_url}))
+        db.add(result)
+        db.commit()
+        spec = share_service.get_card_spec(db, result.id)
+        db.close()
+        return spec["image_path"]
+
+    name = "0123456789abcdef0123456789abcdef.jpg"
+    assert spec_for(f"/uploads/personality_images/{name}?v=2") == str(
+        share_service.SHARE_CARD_DIR.parent / "personality_images" / name
+    )
+    for outside in ("/uploads/../../../etc/passwd", "/uploads/personality_images/../../app.log",
+                    "/uploads/share_cards/1-abc.png", "/uploads/profile_images/../../profile_images/x.jpg",
+                    "/etc/passwd", "https://example.com/x.jpg"):
+        assert spec_for(outside) is None, outside
+
+
+def test_undecodable_avatar_renders_the_card_without_it(tmp_path):
+    from app.utils.share_utils import generate_share_image
+
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"\xff\xd8 not really a jpeg")
+
+    content = generate_share_image({"personality": "P", "image_path": str(broken)})
+    assert content[:8] == b"\x89PNG\r\n\x1a\n"
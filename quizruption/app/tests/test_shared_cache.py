@@ -0,0 +1,119 @@
+# Per-worker caches stay coherent with writes made in this and other worker processes
+import os
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Another worker: changes a quiz title directly and, optionally, bumps the shared version
+OTHER_WORKER = """
+import sys
+from app.database import SessionLocal
+from app.models import Quiz
+from app.utils.shared_cache import bump_version
+
+db = SessionLocal()
+db.query(Quiz).filter(Quiz.id == int(sys.argv[1])).update({"title": sys.argv[2]})
+if sys.argv[3] == "bump":
+    bump_version(db, "quizzes")
+db.commit()
+"""
+
+
+def _create_quiz(client, title):
+    payload = {"title": title, "type": "trivia", "questions": [{"text": "Q", "answers": [{"text": "A", "is_correct": True}]}]}
+    response = client.post("/api/quizzes/", json=payload)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _other_worker(quiz_id, title, bump):
+    env = dict(os.environ, PYTHONPATH=BACKEND_ROOT)
+    subprocess.run([sys.executable, "-c", OTHER_WORKER, str(quiz_id), title, "bump" if bump else "-"],
+                   cwd=os.getcwd(), env=env, check=True)
+
+
+def test_cached_quiz_follows_writes_from_another_process(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "cache_version_check_interval", 0)
+    client = TestClient(app)
+    quiz_id = _create_quiz(client, "Original title")
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["title"] == "Original title"
+
+    # A write that does not bump the version is invisible: the response really is cached
+    _other_worker(quiz_id, "Silent edit", bump=False)
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["title"] == "Original title"
+
+    _other_worker(quiz_id, "Edited elsewhere", bump=True)
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["title"] == "Edited elsewhere"
+
+
+def test_own_writes_are_visible_before_the_next_version_check(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "cache_version_check_interval", 3600)
+    client = TestClient(app)
+    quiz_id = _create_quiz(client, "Before")
+    listed = client.get("/api/quizzes/", params={"limit": 1000}).json()
+    assert quiz_id in [q["id"] for q in listed]
+
+    payload = {"title": "After", "type": "trivia", "questions": [{"text": "Q2", "answers": [{"text": "B"}]}]}
+    assert client.put(f"/api/quizzes/{quiz_id}", json=payload).status_code == 200
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["title"] == "After"
+    assert client.delete(f"/api/quizzes/{quiz_id}").status_code == 204
+    assert client.get(f"/api/quizzes/{quiz_id}").status_code == 404
+    assert quiz_id not in [q["id"] for q in client.get("/api/quizzes/", params={"limit": 1000}).json()]
+
+
+def test_value_loaded_during_a_change_is_not_kept():
+    from app.utils.shared_cache import VersionedCache, caches
+
+    cache = VersionedCache("test_race")
+    del caches["test_race"]
+    cache.get("key", version=2)
+    # Loaded by a request that read version 1 before another worker committed version 2
+    cache.put("key", "stale", version=1)
+    assert cache.get("key", version=2) is None
+    cache.put("key", "fresh", version=2)
+    assert cache.get("key", version=2) == "fresh"
+    assert cache.get("key", version=3) is None
+
+
+def test_admin_can_invalidate_a_cache_in_every_worker(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    client = TestClient(app)
+    headers = {"X-Admin-Token": "secret"}
+    first = client.post("/api/admin/caches/daily_joke/invalidate", headers=headers)
+    second = client.post("/api/admin/caches/daily_joke/invalidate", headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json()["version"] == first.json()["version"] + 1
+    assert client.post("/api/admin/caches/nope/invalidate", headers=headers).status_code == 404
+    assert set(client.get("/api/admin/caches", headers=headers).json()) >= {"quizzes", "personality_content", "daily_joke"}
+
+
+def test_cached_quizzes_follow_their_creators_profile(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "cache_version_check_interval", 3600)
+    client = TestClient(app)
+    registered = client.post("/api/auth/register", json={
+        "username": "cachedcreator", "email": "cachedcreator@example.com", "password": "secret123",
+    }).json()
+    payload = {"title": "Creator quiz", "type": "trivia", "created_by": registered["user"]["id"],
+               "questions": [{"text": "Q", "answers": [{"text": "A", "is_correct": True}]}]}
+    quiz_id = client.post("/api/quizzes/", json=payload).json()["id"]
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["creator"]["display_name"] is None
+
+    token = registered["access_token"]
+    response = client.put(f"/api/auth/profile?token={token}", json={"display_name": "Renamed"})
+    assert response.status_code == 200
+    assert client.get(f"/api/quizzes/{quiz_id}").json()["creator"]["display_name"] == "Renamed"
+    listed = client.get("/api/quizzes/", params={"limit": 1000}).json()
+    assert [q["creator"]["display_name"] for q in listed if q["id"] == quiz_id] == ["Renamed"]
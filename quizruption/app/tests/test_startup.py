@@ -0,0 +1,91 @@
+# Import-time budget for a cold worker, measured with python -X importtime
+import os
+import subprocess
+import sys
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Whole import of app.main, and the part spent in this repo's own modules
+IMPORT_BUDGET_SECONDS = 1.5
+APP_MODULES_BUDGET_SECONDS = 0.3
+# Heavy dependencies only loaded by the requests that need them
+DEFERRED_MODULES = ("openai", "httpx", "PIL", "werkzeug", "tiktoken")
+
+
+def _import_times(workdir):
+    """{module: (self seconds, cumulative seconds)} for a fresh ``import app.main``"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def test_app_import_stays_within_budget(tmp_path):
+    times = _import_times(tmp_path)
+
+    assert "app.main" in times
+    assert not [name for name in times if name.split(".")[0] in DEFERRED_MODULES]
+    app_seconds = sum(own for name, (own, _) in times.items() if name.split(".")[0] == "app")
+    assert app_seconds < APP_MODULES_BUDGET_SECONDS
+    assert times["app.main"][1] < IMPORT_BUDGET_SECONDS
+    # Tables are created by the migration step, not as a side effect of importing
+    assert not (tmp_path / "quizruption.db").exists()
+
+
+def test_importing_the_app_loads_no_heavy_dependency(tmp_path):
+    env = dict(os.environ, PYTHONPATH=BACKEND_ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; print(' '.join(sorted(sys.modules)))"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+    )
+    loaded = {name.split(".")[0] for name in result.stdout.split()}
+    assert "app" in loaded
+    assert not loaded & set(DEFERRED_MODULES)
+
+
+def test_migration_creates_the_schema(tmp_path):
+    from sqlalchemy import create_engine, inspect
+    from app.migrations import migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    migrate(engine)
+    migrate(engine)  # safe to re-run
+    assert {"users", "quizzes", "questions", "answers", "results"} <= set(inspect(engine).get_table_names())
+    engine.dispose()
+
+
+def test_migration_upgrades_an_existing_database(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from sqlalchemy.orm import Session
+    from app.migrations import migrate
+    from app.services.joke_service import normalize_theme, pending_suggestion_themes
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    # joke_suggestions as created before theme_key existed
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE joke_suggestions (id INTEGER PRIMARY KEY, suggestion_text TEXT NOT NULL, "
+            "user_id INTEGER, used BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text("INSERT INTO joke_suggestions (suggestion_text, used) VALUES ('  Cats & Dogs!! ', 0)"))
+    migrate(engine)
+    migrate(engine)  # safe to re-run
+
+    inspector = inspect(engine)
+    assert "theme_key" in {col["name"] for col in inspector.get_columns("joke_suggestions")}
+    assert "ix_joke_suggestions_unused_theme" in {index["name"] for index in inspector.get_indexes("joke_suggestions")}
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO joke_suggestions (suggestion_text, theme_key, used) VALUES ('cats dogs', :key, 0)"),
+                     {"key": normalize_theme("cats dogs")})
+    # Old rows are keyed like new ones, so both count toward the same theme
+    with Session(engine) as db:
+        assert [(key, weight) for key, _, weight in pending_suggestion_themes(db)] == [("cats dogs", 2)]
+    engine.dispose()
@@ -0,0 +1,139 @@
+# /uploads serving: validators and 304s, byte ranges with If-Range, precompressed siblings, zero-copy sends
+import asyncio
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+IMAGE = "0123456789abcdef0123456789abcdef.jpg"
+MANIFEST = "0123456789abcdef0123456789abcdef.variants.json"
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    (tmp_path / IMAGE).write_bytes(CONTENT)
+    manifest = json.dumps({"original": f"/uploads/{IMAGE}", "variants": []}).encode()
+    (tmp_path / MANIFEST).write_bytes(manifest)
+    (tmp_path / f"{MANIFEST}.gz").write_bytes(gzip.compress(manifest, mtime=0))
+    (tmp_path / "legacy.txt").write_text("uploaded before content addressing")
+    return tmp_path
+
+
+@pytest.fixture
+def client(upload_dir):
+    from app.utils.static_files import UploadStaticFiles
+
+    static = Starlette(routes=[Mount("/uploads", app=UploadStaticFiles(directory=upload_dir))])
+    return TestClient(static, headers={"Accept-Encoding": "identity"})
+
+
+def test_content_addressed_files_are_immutable(client):
+    response = client.get(f"/uploads/{IMAGE}")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"] == f'"{IMAGE}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    legacy = client.get("/uploads/legacy.txt")
+    assert legacy.headers["cache-control"] == "public, max-age=3600"
+    assert legacy.headers["etag"] != f'"{IMAGE}"'
+
+
+def test_conditional_requests_get_304(client):
+    first = client.get(f"/uploads/{IMAGE}")
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    for headers in ({"If-None-Match": etag}, {"If-None-Match": f'"other", W/{etag}'}, {"If-None-Match": "*"},
+                    {"If-Modified-Since": last_modified}):
+        response = client.get(f"/uploads/{IMAGE}", headers=headers)
+        assert response.status_code == 304, headers
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    # If-None-Match wins over a matching If-Modified-Since
+    stale = client.get(f"/uploads/{IMAGE}", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert stale.status_code == 200
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-5", 1019, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_byte_ranges_get_206(client, range_header, start, end):
+    response = client.get(f"/uploads/{IMAGE}", headers={"Range": range_header})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_unsatisfiable_and_ignored_ranges(client):
+    unsatisfiable = client.get(f"/uploads/{IMAGE}", headers={"Range": "bytes=2000-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    # Multi-range and malformed headers are ignored: the whole file
+    for header in ("bytes=0-1,5-6", "items=0-1"):
+        response = client.get(f"/uploads/{IMAGE}", headers={"Range": header})
+        assert response.status_code == 200 and response.content == CONTENT
+
+
+def test_if_range_only_resumes_the_same_version(client):
+    etag = client.get(f"/uploads/{IMAGE}").headers["etag"]
+
+    resumed = client.get(f"/uploads/{IMAGE}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    changed = client.get(f"/uploads/{IMAGE}", headers={"Range": "bytes=0-9", "If-Range": '"something-else"'})
+
+    assert resumed.status_code == 206 and resumed.content == CONTENT[:10]
+    assert changed.status_code == 200 and changed.content == CONTENT
+
+
+def test_gzip_sibling_served_when_accepted(client, upload_dir):
+    plain = (upload_dir / MANIFEST).read_bytes()
+
+    compressed = client.get(f"/uploads/{MANIFEST}", headers={"Accept-Encoding": "gzip"})
+    identity = client.get(f"/uploads/{MANIFEST}")
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] == f'"{MANIFEST}-gzip"'
+    assert compressed.headers["content-length"] == str((upload_dir / f"{MANIFEST}.gz").stat().st_size)
+    assert compressed.content == plain  # decoded by the client
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == f'"{MANIFEST}"'
+    assert identity.content == plain
+    # The compressed variant revalidates against its own ETag
+    revalidated = client.get(f"/uploads/{MANIFEST}", headers={"Accept-Encoding": "gzip",
+                                                              "If-None-Match": f'"{MANIFEST}-gzip"'})
+    assert revalidated.status_code == 304
+
+
+def test_zero_copy_send_used_when_the_server_offers_it(upload_dir):
+    from app.utils.static_files import UploadStaticFiles
+
+    static = UploadStaticFiles(directory=upload_dir)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/{IMAGE}", "raw_path": f"/{IMAGE}".encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"range", b"bytes=100-199")], "client": ("127.0.0.1", 1), "server": ("test", 80),
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    asyncio.run(static(scope, receive, send))
+
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert (messages[1]["offset"], messages[1]["count"]) == (100, 100)
@@ -0,0 +1,82 @@
+# Upload size and dimension limits are enforced while streaming, not after buffering
+import asyncio
+import io
+
+import httpx
+from PIL import Image
+
+BOUNDARY = "quizruptionboundary"
+
+
+def _post(app, url, content, headers=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(url, content=content, headers=headers or {})
+    return asyncio.run(run())
+
+
+def test_huge_streamed_upload_is_cut_off_early(app, upload_token):
+    chunk = b"\0" * (256 * 1024)
+    total_chunks = 2048  # 512MB if fully consumed
+    consumed = {"chunks": 0}
+
+    async def body():
+        yield (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="image"; filename="huge.png"\r\n'
+            "Content-Type: image/png\r\n\r\n"
+        ).encode()
+        for _ in range(total_chunks):
+            consumed["chunks"] += 1
+            yield chunk
+
+    response = _post(
+        app,
+        f"/api/upload/profile-image?token={upload_token}",
+        body(),
+        {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+
+    assert response.status_code == 413
+    # Only a little more than the 5MB limit was pulled from the stream
+    assert consumed["chunks"] * len(chunk) < 6 * 1024 * 1024
+
+
+def test_declared_oversized_upload_is_rejected_without_reading(app, upload_token):
+    consumed = {"chunks": 0}
+
+    async def body():
+        consumed["chunks"] += 1
+        yield b"x"
+
+    response = _post(
+        app,
+        f"/api/upload/profile-image?token={upload_token}",
+        body(),
+        {
+            "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+            "Content-Length": str(500 * 1024 * 1024),
+        },
+    )
+
+    assert response.status_code == 413
+    assert consumed["chunks"] == 0
+
+
+def test_pixel_bomb_rejected_from_header(app, upload_token):
+    # 1-bit 10000x10000 image compresses to a few KB but decodes to 100 megapixels
+    output = io.BytesIO()
+    Image.new("1", (10000, 10000)).save(output, format="PNG")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                f"/api/upload/personality-image?token={upload_token}",
+                files={"image": ("bomb.png", output.getvalue(), "image/png")},
+            )
+    response = asyncio.run(run())
+
+    assert response.status_code == 400
+    assert "dimensions too large" in response.json()["detail"]
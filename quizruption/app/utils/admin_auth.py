@@ -0,0 +1,21 @@
+# Shared-secret check for operator-only endpoints (profiling, diagnostics)
+import hmac
+
+from fastapi import Header, HTTPException, status
+
+from app.config import settings
+
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+
+def is_admin_token(token: str) -> bool:
+    """True when admin endpoints are enabled (ADMIN_TOKEN set) and ``token`` matches."""
+    return bool(settings.admin_token) and hmac.compare_digest(token.encode(), settings.admin_token.encode())
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Dependency for admin routes; they look absent when ADMIN_TOKEN is unset."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
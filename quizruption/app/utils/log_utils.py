@@ -0,0 +1,311 @@
+# Application logging: a queue-backed JSON pipeline with request ids, and a cheap tail reader
+import contextvars
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from typing import List, Optional, Tuple
+
+# The backend writes app.log next to the app package (or to LOG_PATH), rotated at 1MB with 3 backups.
+# With several workers the file is shared and rotated externally (e.g. logrotate), see setup_logging.
+LOG_PATH = os.getenv("LOG_PATH") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app.log')
+)
+LOG_MAX_BYTES = 1_048_576
+LOG_BACKUP_COUNT = 3
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s]: %(message)s'
+# Records waiting for the writer thread; beyond this they are dropped rather than blocking
+LOG_QUEUE_SIZE = 10_000
+REQUEST_ID_HEADER = "x-request-id"
+
+BLOCK_SIZE = 8192
+MAX_LINES = 1000
+# Upper bound on bytes read by one tail (matters when a level filter skips most lines)
+MAX_SCAN_BYTES = 256 * 1024
+# Upper bound on bytes returned by one follow; a poller further behind skips ahead
+MAX_FOLLOW_BYTES = 64 * 1024
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+_LEVEL_RE = re.compile(r"\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b")
+
+# Correlation id of the request being handled, "-" outside requests
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+# Records dropped because the queue was full
+dropped_records = 0
+
+# Attributes every LogRecord has; anything else came in through ``extra=`` and is kept in JSON
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id, on the thread that logged them."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every ``1 / rate`` records at or below ``max_level``; others pass untouched."""
+
+    def __init__(self, rate: float, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.max_level = max_level
+        self._counter = itertools.count(1)
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; level comes early so the log view can filter on it."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; never blocks, drops records when the queue is full."""
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, the writer thread formats the rest
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_file_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", json_format: bool = True, debug_sample_rate: float = 1.0,
+                  path: Optional[str] = None, rotate: bool = True) -> QueueListener:
+    """Route root logging through a queue to a rotating file written by a background thread.
+
+    Pass ``rotate=False`` when several processes append to the same file: each would otherwise
+    rotate it on its own (losing lines, and failing on Windows where open files cannot be
+    renamed). The file is then never renamed here; it is reopened whenever an external tool
+    such as logrotate has moved it. Safe to call again (e.g. on every startup); it only
+    restarts a stopped writer.
+    """
+    global _queue_handler, _file_handler, _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+    if _queue_handler is None:
+        if rotate:
+            _file_handler = RotatingFileHandler(path or LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+        else:
+            _file_handler = WatchedFileHandler(path or LOG_PATH)
+        _file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+        _queue_handler.addFilter(RequestIdFilter())
+        root.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, _file_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records to disk and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request a correlation id for its log records.
+
+    Reuses a well-formed incoming X-Request-ID and echoes the id back in the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = next((v.decode("latin-1") for k, v in scope["headers"] if k == REQUEST_ID_HEADER.encode()), "")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def _line_level(line: str) -> int:
+    # The first level name on the line: the levelname field in both the text and JSON formats
+    match = _LEVEL_RE.search(line)
+    return LEVELS[match.group(1)] if match else 0
+
+
+def _log_files(path: str, backups: int) -> List[str]:
+    return [path] + [f"{path}.{i}" for i in range(1, backups + 1)]
+
+
+def _make_cursor(stat_result, offset: int) -> str:
+    return f"{stat_result.st_ino}:{offset}"
+
+
+def _parse_cursor(cursor: str) -> Optional[Tuple[int, int]]:
+    try:
+        inode, offset = cursor.split(":")
+        return int(inode), int(offset)
+    except ValueError:
+        return None
+
+
+def _tail_file(file, want: int, min_level: int, max_bytes: int) -> Tuple[List[str], int]:
+    """Up to ``want`` matching lines from the end of ``file``, newest first, and bytes read.
+
+    Reads backwards in blocks, so the cost is proportional to what is returned.
+    """
+    position = os.fstat(file.fileno()).st_size
+    remainder = b""
+    found: List[str] = []
+    scanned = 0
+    while position > 0 and scanned < max_bytes and len(found) < want:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        file.seek(position)
+        parts = (file.read(size) + remainder).split(b"\n")
+        scanned += size
+        # The first part may continue in the previous block
+        remainder = parts[0]
+        complete = parts[1:] if position > 0 else parts
+        for raw in reversed(complete):
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if line and _line_level(line) >= min_level:
+                found.append(line)
+                if len(found) == want:
+                    break
+    return found, scanned
+
+
+def tail_log(lines: int = 100, level: Optional[str] = None, path: Optional[str] = None, backups: int = LOG_BACKUP_COUNT) -> dict:
+    """The last ``lines`` log lines at ``level`` or above, continuing into rotated backups."""
+    path = path or LOG_PATH
+    want = max(1, min(lines, MAX_LINES))
+    min_level = LEVELS.get((level or "").upper(), 0)
+    collected: List[str] = []
+    budget = MAX_SCAN_BYTES
+    cursor = None
+    for file_path in _log_files(path, backups):
+        if len(collected) >= want or budget <= 0:
+            break
+        try:
+            with open(file_path, "rb") as file:
+                if cursor is None and file_path == path:
+                    stat_result = os.fstat(file.fileno())
+                    cursor = _make_cursor(stat_result, stat_result.st_size)
+                found, scanned = _tail_file(file, want - len(collected), min_level, budget)
+        except FileNotFoundError:
+            continue
+        collected.extend(found)
+        budget -= scanned
+    collected.reverse()
+    return {"lines": collected, "cursor": cursor}
+
+
+def _read_complete_lines(file_path: str, offset: int, min_level: int) -> Tuple[List[str], int]:
+    """Complete lines written after ``offset``, and the offset just past the last one."""
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size - offset > MAX_FOLLOW_BYTES:
+            offset = size - MAX_FOLLOW_BYTES
+            file.seek(offset)
+            # Skip the partial line we landed in
+            offset += len(file.readline())
+        file.seek(offset)
+        data = file.read(size - offset)
+    end = data.rfind(b"\n") + 1
+    lines = [
+        line for line in data[:end].decode("utf-8", errors="replace").splitlines()
+        if line and _line_level(line) >= min_level
+    ]
+    return lines, offset + end
+
+
+def follow_log(cursor: str, level: Optional[str] = None, path: Optional[str] = None, backups: int = LOG_BACKUP_COUNT) -> dict:
+    """Lines appended since ``cursor`` (from a previous tail or follow), handling rotation.
+
+    When the file the cursor points into has been rotated, the rest of that backup is
+    returned first, then any newer backups and the live file from the start. An unknown cursor falls back to a tail.
+    """
+    path = path or LOG_PATH
+    min_level = LEVELS.get((level or "").upper(), 0)
+    parsed = _parse_cursor(cursor)
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return {"lines": [], "cursor": None}
+    if parsed is None:
+        return tail_log(level=level, path=path, backups=backups)
+
+    inode, offset = parsed
+    if inode == current.st_ino and offset <= current.st_size:
+        lines, offset = _read_complete_lines(path, offset, min_level)
+        return {"lines": lines, "cursor": _make_cursor(current, offset)}
+
+    files = _log_files(path, backups)
+    for index in range(1, len(files)):
+        try:
+            rotated = os.stat(files[index])
+        except FileNotFoundError:
+            continue
+        if rotated.st_ino == inode:
+            lines, _ = _read_complete_lines(files[index], min(offset, rotated.st_size), min_level)
+            # Backups rotated after it, oldest first, then the live file
+            for newer in reversed(files[1:index]):
+                lines += _read_complete_lines(newer, 0, min_level)[0]
+            newest, new_offset = _read_complete_lines(path, 0, min_level)
+            return {"lines": lines + newest, "cursor": _make_cursor(current, new_offset)}
+
+    return tail_log(level=level, path=path, backups=backups)
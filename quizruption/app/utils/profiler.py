@@ -0,0 +1,172 @@
+# Sampling profiler for a live worker, with collapsed-stack (flamegraph) output
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from types import FrameType
+from typing import Callable, Dict, Optional
+
+from app.utils.admin_auth import ADMIN_TOKEN_HEADER, is_admin_token
+
+DEFAULT_INTERVAL = 0.01
+MIN_INTERVAL = 0.001
+MAX_SECONDS = 60
+# Finished per-request profiles kept for retrieval
+MAX_STORED_PROFILES = 20
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+
+# Threads whose samples would only show them waiting on their queues
+_IGNORED_THREADS = ("client-log-writer",)
+
+
+def _label(code, cache: Dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        module = os.path.basename(code.co_filename)
+        label = cache[code] = f"{code.co_name} ({module}:{code.co_firstlineno})"
+    return label
+
+
+class SamplingProfiler:
+    """Samples every thread's stack from a background thread and counts identical stacks.
+
+    Only this thread does work: the sampled code is not traced, so the cost is the stack
+    walk every ``interval`` seconds. ``include(thread, frame)`` can restrict which
+    samples are kept.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL,
+                 include: Optional[Callable[[threading.Thread, FrameType], bool]] = None):
+        self.interval = max(MIN_INTERVAL, interval)
+        self.include = include
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                thread = threads.get(thread_id)
+                if thread_id == own_id or thread is None or thread.name in _IGNORED_THREADS:
+                    continue
+                if self.include is not None and not self.include(thread, frame):
+                    continue
+                self.stacks[self._stack(thread, frame)] += 1
+            self.samples += 1
+
+    def _stack(self, thread: threading.Thread, frame: FrameType) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(_label(frame.f_code, self._labels))
+            frame = frame.f_back
+        labels.append(thread.name)
+        return ";".join(reversed(labels))
+
+    def collapsed(self) -> str:
+        """One ``root;...;leaf count`` line per distinct stack, as flamegraph.pl and speedscope read."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+
+async def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Profile the whole worker for ``seconds``; one whole-worker profile runs at a time."""
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running on this worker")
+    try:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(min(seconds, MAX_SECONDS))
+        finally:
+            profiler.stop()
+        return profiler
+    finally:
+        _profile_lock.release()
+
+
+# Finished per-request profiles by id, oldest dropped first
+request_profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def _request_filter(request_frame: FrameType, loop_thread_id: int):
+    """Keep event-loop samples running inside this request, plus threadpool samples."""
+    def include(thread: threading.Thread, frame: FrameType) -> bool:
+        if thread.ident != loop_thread_id:
+            # Sync endpoints and dependencies run here; concurrent requests can show up too
+            return thread.name.startswith("AnyIO worker thread")
+        while frame is not None:
+            if frame is request_frame:
+                return True
+            frame = frame.f_back
+        return False
+    return include
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling single requests that ask for it.
+
+    A request carrying ``X-Profile: 1`` and a valid admin token is sampled while it runs;
+    the response carries ``X-Profile-Id`` for fetching the collapsed stacks afterwards.
+    """
+
+    def __init__(self, app, interval: float = 0.002):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not any(k == PROFILE_HEADER.encode() and v == b"1" for k, v in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        token = next((v for k, v in scope["headers"] if k == ADMIN_TOKEN_HEADER.encode()), b"")
+        if not is_admin_token(token.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval, _request_filter(sys._getframe(), threading.get_ident()))
+        profiler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            request_profiles[profile_id] = {
+                "request": f"{scope['method']} {scope['path']}",
+                "duration_ms": round(elapsed_ms, 1),
+                "samples": profiler.samples,
+                "collapsed": profiler.collapsed(),
+            }
+            while len(request_profiles) > MAX_STORED_PROFILES:
+                request_profiles.popitem(last=False)
@@ -0,0 +1,181 @@
+# Token counting and token-budget prompt assembly for chat completions
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead of the chat format, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Characters of each dropped user message quoted in the summary note
+SUMMARY_SNIPPET_CHARS = 80
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        try:
+            # Optional, and imported on first count: fall back to a character-based estimate
+            import tiktoken
+        except ImportError:
+            return _encoding
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens instead: {str(e)}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Token count of ``text``: exact with tiktoken, otherwise about four characters per token."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def trim_history(conversation_history: Optional[list], token_budget: int) -> list:
+    """Keep the most recent messages whose combined size fits within ``token_budget``."""
+    kept = []
+    used = 0
+    for message in reversed(conversation_history or []):
+        cost = message_tokens(message)
+        if used + cost > token_budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+@dataclass
+class PromptUsage:
+    """Token breakdown of one assembled prompt."""
+    system_tokens: int
+    summary_tokens: int
+    history_tokens: int
+    user_tokens: int
+    history_kept: int
+    history_dropped: int
+
+    @property
+    def total(self) -> int:
+        return self.system_tokens + self.summary_tokens + self.history_tokens + self.user_tokens
+
+
+class PromptBuilder:
+    """Assembles chat prompts within a token budget.
+
+    The newest history messages that fit are sent verbatim; older ones are folded
+    into a short note listing what the user asked about, or dropped when even that
+    does not fit.
+    """
+
+    def __init__(self, system_prompt: str, max_prompt_tokens: int, history_budget: int, summary_budget: int):
+        self.system_prompt = system_prompt
+        self.max_prompt_tokens = max_prompt_tokens
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self._system_tokens: Optional[int] = None
+
+    @property
+    def system_tokens(self) -> int:
+        # Measured once, on the first prompt rather than at import, since loading the tokenizer is slow
+        if self._system_tokens is None:
+            self._system_tokens = count_tokens(self.system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        return self._system_tokens
+
+    def build(self, user_message: str, conversation_history: Optional[list] = None) -> Tuple[list, list, PromptUsage]:
+        """Return (messages, context, usage); ``context`` is the summary plus kept history."""
+        user = {"role": "user", "content": user_message}
+        user_tokens = message_tokens(user)
+        history = conversation_history or []
+
+        available = max(0, min(self.history_budget, self.max_prompt_tokens - self.system_tokens - user_tokens))
+        kept = trim_history(history, available)
+        if len(kept) < len(history):
+            # Not everything fits: reserve room for the summary note out of the history budget
+            kept = trim_history(history, max(0, available - self.summary_budget))
+        dropped = history[:len(history) - len(kept)]
+        history_tokens = sum(message_tokens(message) for message in kept)
+
+        context = list(kept)
+        summary_tokens = 0
+        summary = self._summarize(dropped, min(self.summary_budget, available - history_tokens))
+        if summary is not None:
+            context.insert(0, summary)
+            summary_tokens = message_tokens(summary)
+
+        messages = [{"role": "system", "content": self.system_prompt}, *context, user]
+        usage = PromptUsage(
+            system_tokens=self.system_tokens,
+            summary_tokens=summary_tokens,
+            history_tokens=history_tokens,
+            user_tokens=user_tokens,
+            history_kept=len(kept),
+            history_dropped=len(dropped),
+        )
+        return messages, context, usage
+
+    def _summarize(self, dropped: list, budget: int) -> Optional[dict]:
+        prefix = "Earlier in this conversation the user asked about: "
+        used = count_tokens(prefix) + MESSAGE_OVERHEAD_TOKENS
+        topics = []
+        # Newest dropped questions first, so the most recent context survives a tight budget
+        for message in reversed(dropped):
+            if message["role"] != "user":
+                continue
+            snippet = " ".join(message["content"].split())[:SUMMARY_SNIPPET_CHARS]
+            cost = count_tokens(snippet) + 1
+            if used + cost > budget:
+                break
+            topics.append(snippet)
+            used += cost
+        if not topics:
+            return None
+        return {"role": "system", "content": prefix + "; ".join(reversed(topics))}
+
+
+class TokenUsageMetrics:
+    """Running totals of prompt and completion tokens for upstream chat calls."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.upstream_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.history_dropped = 0
+        self.summarized = 0
+
+    def record(self, usage: PromptUsage, completion_tokens: int, upstream_prompt_tokens: Optional[int] = None):
+        self.requests += 1
+        self.prompt_tokens += usage.total
+        self.upstream_prompt_tokens += upstream_prompt_tokens if upstream_prompt_tokens is not None else usage.total
+        self.completion_tokens += completion_tokens
+        self.history_dropped += usage.history_dropped
+        if usage.summary_tokens:
+            self.summarized += 1
+
+    def _average(self, total: int) -> float:
+        return round(total / self.requests, 1) if self.requests else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.upstream_prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": self._average(self.upstream_prompt_tokens),
+            "avg_completion_tokens": self._average(self.completion_tokens),
+            "estimated_prompt_tokens": self.prompt_tokens,
+            "history_messages_dropped": self.history_dropped,
+            "prompts_summarized": self.summarized,
+            "tokenizer": "tiktoken" if _get_encoding() else "estimate",
+        }
@@ -0,0 +1,71 @@
+# Slow-query log and per-request query budgets (enforced in development and tests)
+import logging
+import time
+from typing import Callable
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.utils.metrics import request_stats
+
+logger = logging.getLogger("app.sql.slow")
+
+# Bound parameters are logged up to this many characters
+MAX_PARAMS_CHARS = 500
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised before a request runs more SQL statements than its route allows."""
+
+    def __init__(self, route: str, budget: int):
+        super().__init__(f"{route} exceeded its query budget of {budget} statements")
+        self.route = route
+        self.budget = budget
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Set the most SQL statements one request to this endpoint may run.
+
+    Put it below the router decorator; without it the QUERY_BUDGET_DEFAULT applies.
+    """
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def budget_for(scope) -> int:
+    route = scope.get("route")
+    return getattr(getattr(route, "endpoint", None), "query_budget", settings.query_budget_default)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["slow_query_start"] = time.perf_counter()
+    if not settings.query_budget_enforce:
+        return
+    stats = request_stats.get()
+    if stats is None:
+        return
+    budget = budget_for(stats.scope)
+    if stats.queries >= budget:
+        raise QueryBudgetExceeded(f"{stats.scope['method']} {stats.route}", budget)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info.pop("slow_query_start", time.perf_counter())) * 1000
+    if settings.slow_query_ms <= 0 or elapsed_ms < settings.slow_query_ms:
+        return
+    stats = request_stats.get()
+    route = f"{stats.scope['method']} {stats.route}" if stats else "-"
+    logger.warning(
+        f"Slow query ({elapsed_ms:.1f} ms) on {route}: {' '.join(statement.split())} "
+        f"params={repr(parameters)[:MAX_PARAMS_CHARS]}",
+        extra={"duration_ms": round(elapsed_ms, 1), "route": route},
+    )
+
+
+def monitor_engine(engine):
+    """Log slow statements and enforce query budgets on ``engine``."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,221 @@
+# Token-bucket rate limiting for write endpoints, plus near-duplicate suppression
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import anyio
+import jwt
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rejected requests by reason, e.g. "rate_limited:suggestions" or "duplicate:suggestions"
+rejections: Counter = Counter()
+# Requests let through by each rule
+allowed: Counter = Counter()
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    methods: frozenset
+    path_prefix: str
+    capacity: float  # burst size
+    refill_per_second: float
+    exempt: bool = False  # matching requests skip the limiter (and every later rule)
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and path.startswith(self.path_prefix)
+
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+# First matching rule wins, so specific endpoints come before the catch-all. Chat (bounded by
+# the OpenAI concurrency limit) and log ingestion (bounded by batch and pending-byte caps) have
+# their own limits and are busy for a normal session, so they are left out of "writes".
+DEFAULT_RULES = (
+    RateLimitRule("chat", WRITE_METHODS, "/api/chat", 0, 0, exempt=True),
+    RateLimitRule("log_ingest", frozenset({"POST"}), "/api/logs/ingest", 0, 0, exempt=True),
+    RateLimitRule("suggestions", frozenset({"POST"}), "/api/jokes/suggestions", 5, 1 / 60),
+    RateLimitRule("submissions", frozenset({"POST"}), "/api/answers/submit", 20, 1 / 3),
+    RateLimitRule("registration", frozenset({"POST"}), "/api/auth/register", 5, 1 / 60),
+    RateLimitRule("login", frozenset({"POST"}), "/api/auth/login", 10, 1 / 6),
+    RateLimitRule("writes", WRITE_METHODS, "/api/", 60, 1),
+)
+
+
+class MemoryBucketStore:
+    """Token buckets in this process's memory."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float) -> float:
+        """Take one token; returns 0 when allowed, otherwise seconds until a token is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [capacity, now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                # The least recently used client is the one closest to a full bucket anyway
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / refill_per_second
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, so all workers on a host share one limit."""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float) -> float:
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_per_second)
+            retry_after = 0.0 if tokens >= 1 else (1 - tokens) / refill_per_second
+            if tokens >= 1:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+def client_key(scope) -> str:
+    """The signed-in user id when the request carries a valid token, otherwise the client IP."""
+    headers = Headers(scope=scope)
+    authorization = headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        try:
+            payload = jwt.decode(authorization[7:], settings.secret_key, algorithms=[settings.jwt_algorithm])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except jwt.PyJWTError:
+            pass
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying token-bucket limits per client to matching requests.
+
+    Rejected requests get a 429 with Retry-After before the route (or the body) is read.
+    """
+
+    def __init__(self, app, rules: Iterable[RateLimitRule] = DEFAULT_RULES, store=None):
+        self.app = app
+        self.rules = tuple(rules)
+        self.store = store or MemoryBucketStore()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = next((r for r in self.rules if r.matches(scope["method"], scope["path"])), None)
+        if rule is None or rule.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{rule.name}:{client_key(scope)}"
+        args = (key, rule.capacity, rule.refill_per_second, time.time())
+        try:
+            if self.store.blocking:
+                retry_after = await anyio.to_thread.run_sync(self.store.take, *args)
+            else:
+                retry_after = self.store.take(*args)
+        except Exception as e:
+            # Never turn a limiter failure into an outage
+            logger.warning(f"Rate limit check failed, allowing request: {str(e)}")
+            retry_after = 0.0
+
+        if retry_after > 0:
+            rejections[f"rate_limited:{rule.name}"] += 1
+            logger.warning(f"Rate limited {key} on {scope['method']} {scope['path']}")
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests. Please slow down."},
+                headers={"Retry-After": str(int(retry_after) + 1)},
+            )
+            await response(scope, receive, send)
+            return
+        allowed[rule.name] += 1
+        await self.app(scope, receive, send)
+
+
+class RecentHashes:
+    """Bounded set of recently seen hashes that forget entries after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        # Sync routes call this from the threadpool
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(*parts: str) -> str:
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def check_and_add(self, digest: str, now: Optional[float] = None) -> bool:
+        """Record ``digest``; returns True when it was already seen within the window."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._seen:
+                seen_at = next(iter(self._seen.values()))
+                if now - seen_at < self.ttl and len(self._seen) < self.max_entries:
+                    break
+                self._seen.popitem(last=False)
+            if digest in self._seen:
+                return True
+            self._seen[digest] = now
+            return False
+
+
+def rate_limit_stats() -> dict:
+    return {"allowed": dict(allowed), "rejected": dict(rejections)}
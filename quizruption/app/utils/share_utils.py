@@ -1,7 +1,26 @@
 # Generate shareable result cards
-from typing import Dict
-import base64
+from typing import Dict, List, Optional
+import logging
+import os
 from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Share card layout (Open Graph image size)
+CARD_SIZE = (1200, 630)
+CARD_BACKGROUND = (40, 24, 64)
+CARD_GRADIENT = ((58, 28, 94), (24, 16, 48))
+CARD_TEXT = (255, 255, 255)
+CARD_ACCENT = (255, 179, 255)
+
+# Color emoji fonts to try (Windows, Linux, macOS) with a size each supports
+EMOJI_FONTS = (
+    ("seguiemj.ttf", 96),
+    ("NotoColorEmoji.ttf", 109),
+    ("/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf", 109),
+    ("/System/Library/Fonts/Apple Color Emoji.ttc", 96),
+)
 
 
 def generate_share_card(result_data: Dict) -> Dict:
@@ -16,17 +35,123 @@ def generate_share_card(result_data: Dict) -> Dict:
     share_data = {
         "text": share_text,
         "url": f"https://quizruption.app/results/{result_data['id']}",
+        "image_url": f"/api/results/{result_data['id']}/share.png",
         "hashtags": ["Quizruption", "Quiz"],
     }
     
     return share_data
 
 
-def generate_share_image(result_data: Dict) -> bytes:
-    """Generate a shareable image for the result (placeholder)"""
-    # TODO: Implement actual image generation with PIL or similar
-    # This is a placeholder function
-    return b""
+def _load_font(size: int):
+    return ImageFont.load_default(size=size)
+
+
+def _load_emoji_font():
+    """Find a color emoji font on this machine, if there is one"""
+    for name, size in EMOJI_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return None
+
+
+def _wrap(draw, text: str, font, max_width: int, max_lines: int) -> List[str]:
+    words = text.split()
+    lines, current = [], ""
+    for word in words:
+        candidate = f"{current} {word}".strip()
+        if draw.textlength(candidate, font=font) <= max_width or not current:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip(".") + "…"
+    return lines
+
+
+def _load_avatar(image_path: Optional[str], size: int) -> Optional[Image.Image]:
+    """The image cropped to a square, or None when it is missing or cannot be decoded"""
+    if not image_path or not os.path.exists(image_path):
+        return None
+    try:
+        with Image.open(image_path) as image:
+            return ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.LANCZOS)
+    except Exception as e:
+        # A broken avatar must not fail the whole card (failures are not cached, so every
+        # request would render it again); the card is drawn without it
+        logger.warning(f"Share card avatar {image_path} skipped: {str(e)}")
+        return None
+
+
+def generate_share_image(result_data: Dict, image_format: str = "PNG") -> bytes:
+    """Render a share card for a result as PNG or WebP bytes.
+
+    ``result_data`` may contain quiz_title, score, total, personality, emoji and
+    image_path (a local file shown as a round avatar for personality results).
+    """
+    width, height = CARD_SIZE
+    card = Image.new("RGB", CARD_SIZE, CARD_BACKGROUND)
+    draw = ImageDraw.Draw(card)
+
+    # Vertical gradient background
+    top, bottom = CARD_GRADIENT
+    for y in range(height):
+        ratio = y / (height - 1)
+        color = tuple(int(top[i] + (bottom[i] - top[i]) * ratio) for i in range(3))
+        draw.line([(0, y), (width, y)], fill=color)
+
+    text_left = 80
+    avatar_size = 360
+    avatar = _load_avatar(result_data.get("image_path"), avatar_size)
+    if avatar is not None:
+        mask = Image.new("L", (avatar_size, avatar_size), 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, avatar_size, avatar_size), fill=255)
+        card.paste(avatar, (width - avatar_size - 80, (height - avatar_size) // 2), mask)
+        text_width = width - avatar_size - 80 * 3
+    else:
+        text_width = width - 160
+
+    draw.text((text_left, 60), "QUIZRUPTION", font=_load_font(32), fill=CARD_ACCENT)
+
+    title_font = _load_font(44)
+    y = 120
+    for line in _wrap(draw, result_data.get("quiz_title") or "Quiz", title_font, text_width, 2):
+        draw.text((text_left, y), line, font=title_font, fill=CARD_TEXT)
+        y += 56
+
+    y += 30
+    if result_data.get("score") is not None:
+        total = result_data.get("total")
+        headline = f"{result_data['score']}/{total}" if total else str(result_data["score"])
+        draw.text((text_left, y), "I scored", font=_load_font(40), fill=CARD_TEXT)
+        draw.text((text_left, y + 50), headline, font=_load_font(140), fill=CARD_ACCENT)
+    elif result_data.get("personality"):
+        draw.text((text_left, y), "I'm", font=_load_font(40), fill=CARD_TEXT)
+        name_font = _load_font(84)
+        y += 50
+        for line in _wrap(draw, result_data["personality"], name_font, text_width, 2):
+            draw.text((text_left, y), line, font=name_font, fill=CARD_ACCENT)
+            y += 96
+        emoji = result_data.get("emoji")
+        emoji_font = _load_emoji_font() if emoji else None
+        if emoji_font:
+            draw.text((text_left, y + 10), emoji, font=emoji_font, embedded_color=True)
+    else:
+        draw.text((text_left, y), "I just completed the quiz!", font=_load_font(56), fill=CARD_TEXT)
+
+    draw.text((text_left, height - 80), "Take the quiz at quizruption.app", font=_load_font(28), fill=CARD_TEXT)
+
+    output = BytesIO()
+    if image_format.upper() == "WEBP":
+        card.save(output, format="WEBP", quality=85)
+    else:
+        card.save(output, format="PNG", optimize=True)
+    return output.getvalue()
 
 
 def get_social_share_links(result_data: Dict) -> Dict:
@@ -0,0 +1,163 @@
+# Per-worker caches kept coherent across worker processes through a shared version table
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import engine
+
+# Session.info key listing the data sets a transaction changed
+_BUMPED = "bumped_cache_versions"
+
+
+class VersionTracker:
+    """Latest known version of every cached data set.
+
+    All versions are read in one small query, at most every CACHE_VERSION_CHECK_INTERVAL
+    seconds per worker; a commit in this worker that bumped one forces a re-read, so a
+    worker always sees its own writes and other workers' within the interval.
+    """
+
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+        self._versions: Dict[str, int] = {}
+        self._checked_at = float("-inf")
+
+    def current(self, name: str) -> int:
+        if time.monotonic() - self._checked_at >= settings.cache_version_check_interval:
+            self.refresh()
+        return self._versions.get(name, 0)
+
+    def refresh(self):
+        with self.bind.connect() as conn:
+            rows = conn.execute(select(models.CacheVersion.name, models.CacheVersion.version)).all()
+        self._versions = {name: version for name, version in rows}
+        self._checked_at = time.monotonic()
+
+    def expire(self):
+        self._checked_at = float("-inf")
+
+
+versions = VersionTracker()
+
+# Every cache by data set name, for the admin endpoints
+caches: Dict[str, "VersionedCache"] = {}
+
+
+def bump_version(db: Session, name: str) -> int:
+    """Mark data set ``name`` as changed in ``db``'s transaction.
+
+    Call it next to the write, before committing: other workers drop their copies once
+    both are committed, and a rolled-back write invalidates nothing.
+    """
+    version = models.CacheVersion.version
+    updated = db.query(models.CacheVersion).filter(models.CacheVersion.name == name).update(
+        {"version": version + 1}, synchronize_session=False
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(models.CacheVersion(name=name, version=1))
+        except IntegrityError:
+            # Another worker created the row meanwhile
+            db.query(models.CacheVersion).filter(models.CacheVersion.name == name).update(
+                {"version": version + 1}, synchronize_session=False
+            )
+    db.info.setdefault(_BUMPED, set()).add(name)
+    return db.query(version).filter(models.CacheVersion.name == name).scalar()
+
+
+@event.listens_for(Session, "after_commit")
+def _expire_after_commit(session: Session):
+    if session.info.pop(_BUMPED, None):
+        versions.expire()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session):
+    session.info.pop(_BUMPED, None)
+
+
+class VersionedCache:
+    """Process-local LRU cache of one data set, emptied whenever the data set's version moves.
+
+    Values are stored with the version read *before* they were loaded, so a value loaded
+    while another worker was committing a change is discarded rather than kept.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        caches[name] = self
+
+    def version(self) -> int:
+        return versions.current(self.name)
+
+    def _sync(self, version: int):
+        # Caller holds the lock
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Optional[int] = None) -> Any:
+        """The cached value for ``key``, or None."""
+        version = self.version() if version is None else version
+        with self._lock:
+            if version >= self._version:
+                self._sync(version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, version: int):
+        """Store ``value``, loaded after ``version`` was read; dropped if the data set moved on since."""
+        with self._lock:
+            if version < self._version:
+                return
+            self._sync(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """The cached value for ``key``, calling ``load()`` on a miss; None results are not cached."""
+        version = self.version()
+        value = self.get(key, version)
+        if value is None:
+            value = load()
+            if value is not None:
+                self.put(key, value, version)
+        return value
+
+    def invalidate(self, db: Session) -> int:
+        """Drop this data set from every worker's cache once ``db`` commits."""
+        return bump_version(db, self.name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,189 @@
+# Static file serving for /uploads: immutable caching, conditional and range requests
+import os
+import re
+from email.utils import formatdate
+from hashlib import md5
+from mimetypes import guess_type
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+# Content-addressed uploads (see image_service): <32 hex>.jpg, <32 hex>.<size>.<ext>, <32 hex>.variants.json
+CONTENT_ADDRESSED_RE = re.compile(r'^([0-9a-f]{32})\.')
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# Precompressed siblings we look for, in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag``, so a 304 can be sent"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def parse_range(header: str, size: int):
+    """Parse a single ``bytes=`` range into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (multi-range, malformed) and
+    raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class UploadFileResponse(FileResponse):
+    """FileResponse that serves byte ranges and uses zero-copy sends when the server offers them.
+
+    Servers advertising the ``http.response.zerocopysend`` extension get the open file
+    descriptor (sendfile under the hood); ``http.response.pathsend`` is used for whole files.
+    Otherwise the file is streamed in chunks like the stock FileResponse.
+    """
+
+    def __init__(self, *args, byte_range=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.byte_range = byte_range
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        start, end = self.byte_range or (0, self.stat_result.st_size - 1)
+        count = end - start + 1
+        extensions = scope.get("extensions") or {}
+
+        if self.byte_range is None and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": os.fspath(self.path)})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": start,
+                    "count": count,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                if start:
+                    await file.seek(start)
+                remaining = count
+                finished = False
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    finished = remaining <= 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": not finished})
+                if not finished:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles for user uploads.
+
+    Content-addressed files never change, so they get a year-long immutable
+    Cache-Control and an ETag derived from their hash (identical on every worker).
+    Supports If-None-Match / If-Modified-Since, single byte ranges with If-Range,
+    and precompressed ``.br`` / ``.gz`` siblings when the client accepts them.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        content_hash = CONTENT_ADDRESSED_RE.match(name)
+
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL if content_hash else DEFAULT_CACHE_CONTROL,
+            "accept-ranges": "bytes",
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        }
+        if content_hash:
+            headers["etag"] = f'"{name}"'
+        else:
+            tag = md5(f"{stat_result.st_mtime}-{stat_result.st_size}".encode(), usedforsecurity=False)
+            headers["etag"] = f'"{tag.hexdigest()}"'
+
+        media_type = guess_type(full_path)[0] or "application/octet-stream"
+        # Images are already compressed; only look for siblings of text-like files
+        accept_encoding = "" if media_type.startswith("image/") else request_headers.get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding in accept_encoding:
+                try:
+                    compressed_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                headers["content-encoding"] = encoding
+                headers["vary"] = "Accept-Encoding"
+                headers["etag"] = headers["etag"][:-1] + f'-{encoding}"'
+                full_path, stat_result = full_path + suffix, compressed_stat
+                break
+
+        if self.is_not_modified(Headers(headers), request_headers):
+            return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "content-encoding"})
+
+        byte_range = None
+        range_header = request_headers.get("range")
+        if range_header and status_code == 200 and "content-encoding" not in headers:
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range in (headers["etag"], headers["last-modified"]):
+                try:
+                    byte_range = parse_range(range_header, stat_result.st_size)
+                except ValueError:
+                    return Response(
+                        status_code=416,
+                        headers={"content-range": f"bytes */{stat_result.st_size}", "accept-ranges": "bytes"},
+                    )
+
+        return UploadFileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+            method=scope["method"],
+            byte_range=byte_range,
+        )
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            return etag_matches(if_none_match, response_headers["etag"])
+        return super().is_not_modified(response_headers, request_headers)
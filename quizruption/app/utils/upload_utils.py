@@ -0,0 +1,161 @@
+# Size-capped upload reading and header-only image sniffing
+import io
+import logging
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Read uploads in 64KB chunks
+CHUNK_SIZE = 64 * 1024
+
+# Stop retrying the header sniff once this much has been read without a match
+MAX_SNIFF_BYTES = 256 * 1024
+
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class _BodyTooLarge(HTTPException):
+    # An HTTPException so FastAPI's body parsing re-raises it untouched and the
+    # exception middleware renders the 413 when it is raised mid-parse
+    def __init__(self, max_body_size: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload too large. Maximum size is {max_body_size // (1024 * 1024)}MB",
+        )
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware rejecting request bodies over ``max_body_size`` for the given path prefix.
+
+    Requests announcing a larger Content-Length are refused before any body is read;
+    chunked bodies are counted as they stream in and cut off at the limit, so the
+    multipart parser never spools more than the cap to memory or disk.
+    """
+
+    def __init__(self, app, max_body_size: int, path_prefix: str = "/api/upload"):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_size:
+                    logger.warning(f"Upload rejected before reading body - content-length {declared} bytes")
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge(self.max_body_size)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            logger.warning(f"Upload aborted after {received} bytes - body exceeds {self.max_body_size} bytes")
+            if not response_started:
+                await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Upload too large. Maximum size is {self.max_body_size // (1024 * 1024)}MB"},
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
+
+
+def sniff_image(header: bytes) -> Optional[Tuple[str, int, int]]:
+    """Return (format, width, height) parsed from the leading bytes of an image.
+
+    PIL's ``Image.open`` is lazy and only parses the header, so no pixel data is decoded.
+    Returns None when the bytes are not (yet) recognisable as an image. PIL's own
+    ``DecompressionBombError`` is left to propagate.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(header)) as image:
+            return image.format, image.width, image.height
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+async def read_image_upload(
+    upload: UploadFile,
+    max_bytes: int,
+    max_pixels: int,
+    too_large_detail: str = "File too large",
+) -> bytes:
+    """Read an uploaded image in chunks, aborting as soon as it breaks a limit.
+
+    The byte limit is checked per chunk and the image header is sniffed from the first
+    bytes, so oversized files and pixel bombs are rejected without being buffered or decoded.
+    """
+    buffer = bytearray()
+    info = None
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            logger.warning(f"Upload rejected - exceeded {max_bytes} bytes while reading")
+            raise HTTPException(status_code=400, detail=too_large_detail)
+        if info is None and len(buffer) <= MAX_SNIFF_BYTES:
+            info = _sniff_and_check(buffer, max_pixels)
+
+    if info is None:
+        info = _sniff_and_check(buffer, max_pixels)
+        if info is None:
+            raise HTTPException(status_code=400, detail="File is not a recognised image")
+    return bytes(buffer)
+
+
+def _sniff_and_check(buffer: bytearray, max_pixels: int) -> Optional[Tuple[str, int, int]]:
+    from PIL import Image
+
+    try:
+        info = sniff_image(bytes(buffer))
+    except Image.DecompressionBombError as e:
+        logger.warning(f"Upload rejected - {str(e)}")
+        raise HTTPException(status_code=400, detail="Image dimensions too large")
+    if info is None:
+        return None
+    image_format, width, height = info
+    if width * height > max_pixels:
+        logger.warning(f"Upload rejected - {image_format} image is {width}x{height} pixels")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Image dimensions too large ({width}x{height}). Maximum is {max_pixels // 1_000_000} megapixels"
+        )
+    return info
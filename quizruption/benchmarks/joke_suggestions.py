@@ -0,0 +1,85 @@
+"""
+Benchmark: picking and consuming joke suggestion themes as the table grows.
+
+Fills a throwaway database with mostly used suggestions plus a smaller set of unused
+ones spread over a few hundred themes, then times the daily rollover's two queries:
+the weighted theme pick and the bulk UPDATE marking the chosen themes used. Runs once
+with the partial index on unused rows and once with it dropped.
+
+Usage (from the quizruption directory):
+    python benchmarks/joke_suggestions.py --used 1000000 --unused 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+THEMES = 300
+
+
+def seed(used: int, unused: int):
+    from app.database import engine
+    from app.migrations import migrate
+
+    migrate(engine)
+    rows = []
+    for i in range(used + unused):
+        theme = f"theme {random.randrange(THEMES)}"
+        rows.append((theme.title() + "!", theme, 1 if i < used else 0))
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO joke_suggestions (suggestion_text, theme_key, used, created_at) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+            rows,
+        )
+
+
+def time_rollover(rounds: int):
+    from app.database import SessionLocal, engine
+    from app.services.joke_service import consume_suggestion_themes, pending_suggestion_themes
+
+    pick_times, update_times = [], []
+    for _ in range(rounds):
+        # Measure inside a transaction that is rolled back, so every round sees the same data
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+            start = time.perf_counter()
+            themes = pending_suggestion_themes(db)
+            pick_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            consume_suggestion_themes(db, [key for key, _, _ in themes])
+            update_times.append(time.perf_counter() - start)
+            db.close()
+            transaction.rollback()
+    return min(pick_times) * 1000, min(update_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--used", type=int, default=1_000_000)
+    parser.add_argument("--unused", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from app.database import engine
+
+        seed(args.used, args.unused)
+        print(f"{args.used} used + {args.unused} unused suggestions over {THEMES} themes")
+        pick, update = time_rollover(args.rounds)
+        print(f"   partial index: pick {pick:8.2f} ms   consume {update:8.2f} ms")
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_joke_suggestions_unused_theme")
+        pick, update = time_rollover(args.rounds)
+        print(f"        no index: pick {pick:8.2f} ms   consume {update:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: request latency with logging disabled, written inline, and queued.
+
+Adds a route to the app that logs a few INFO lines per call (like the upload route),
+then drives it with concurrent clients through the ASGI app in three modes:
+logging disabled, a RotatingFileHandler on the root logger (the old setup, writing on
+the event loop thread), and the queue pipeline from app.utils.log_utils. --disk-ms
+adds a delay to every file write to show what a slow or busy disk does to each mode.
+
+Usage (from the quizruption directory):
+    python benchmarks/logging_latency.py --requests 2000 --concurrency 50 --disk-ms 1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def slow_down(handler: logging.Handler, disk_ms: float):
+    if disk_ms <= 0:
+        return
+    emit = handler.emit
+
+    def slow_emit(record):
+        time.sleep(disk_ms / 1000)
+        emit(record)
+
+    handler.emit = slow_emit
+
+
+async def drive(app, requests: int, concurrency: int):
+    import httpx
+
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def worker(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                await client.get('/bench/log')
+                samples.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=5, help='INFO lines logged per request')
+    parser.add_argument('--disk-ms', type=float, default=0.0, help='simulated latency of each file write')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ['RATE_LIMIT_ENABLED'] = 'false'
+        from app.main import app
+        from app.utils import log_utils
+
+        logger = logging.getLogger('app.bench')
+
+        @app.get('/bench/log')
+        async def bench_log():
+            for i in range(args.lines):
+                logger.info(f"Benchmark step {i} for this request")
+            return {'ok': True}
+
+        root = logging.getLogger()
+        log_utils.stop_logging()
+        queue_handler = log_utils._queue_handler
+        root.removeHandler(queue_handler)
+        inline = RotatingFileHandler(os.path.join(workdir, 'inline.log'), maxBytes=log_utils.LOG_MAX_BYTES,
+                                     backupCount=log_utils.LOG_BACKUP_COUNT)
+        inline.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        slow_down(inline, args.disk_ms)
+        log_utils._file_handler = RotatingFileHandler(os.path.join(workdir, 'queued.log'),
+                                                      maxBytes=log_utils.LOG_MAX_BYTES,
+                                                      backupCount=log_utils.LOG_BACKUP_COUNT)
+        log_utils._file_handler.setFormatter(log_utils.JsonFormatter())
+        slow_down(log_utils._file_handler, args.disk_ms)
+
+        print(f"{args.requests} requests, {args.concurrency} concurrent, {args.lines} log lines each, "
+              f"{args.disk_ms} ms per file write")
+        for mode in ('disabled', 'inline', 'queued'):
+            if mode == 'disabled':
+                logging.disable(logging.CRITICAL)
+            elif mode == 'inline':
+                logging.disable(logging.NOTSET)
+                root.addHandler(inline)
+            else:
+                root.removeHandler(inline)
+                root.addHandler(queue_handler)
+                log_utils.setup_logging()
+            samples, elapsed = asyncio.run(drive(app, args.requests, args.concurrency))
+            flush_start = time.perf_counter()
+            log_utils.stop_logging()
+            flushed = (time.perf_counter() - flush_start) * 1000
+            print(f"{mode:>9}: p50={statistics.median(samples):8.2f} ms  p99={percentile(samples, 99):8.2f} ms  "
+                  f"throughput={len(samples) / elapsed:7.0f} req/s"
+                  + (f"  (writer drained in {flushed:.0f} ms, {log_utils.dropped_records} dropped)" if mode == 'queued' else ''))
+
+        from app.services.image_service import image_pipeline
+        image_pipeline.shutdown()
+
+
+if __name__ == '__main__':
+    main()
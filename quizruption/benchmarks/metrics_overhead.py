@@ -0,0 +1,90 @@
+"""
+Benchmark: cost of the request metrics middleware and SQL hooks per request.
+
+Drives /health (no database) and /api/quizzes/ (a few queries) through the ASGI app
+sequentially, with the MetricsMiddleware and engine hooks removed and then installed,
+and reports the mean latency of each and the difference. Also times one /metrics
+scrape after the run, which is where all aggregation happens.
+
+Usage (from the quizruption directory):
+    python benchmarks/metrics_overhead.py --requests 3000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+PATHS = ('/health', '/api/quizzes/')
+
+
+async def drive(app, path: str, requests: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for _ in range(50):
+            await client.get(path)
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get(path)
+            samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def set_metrics(app, engine, enabled: bool):
+    from starlette.middleware import Middleware
+    from app.utils import metrics
+
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not metrics.MetricsMiddleware]
+    if enabled:
+        # Same position as in app.main: just inside the request id middleware
+        app.user_middleware.insert(1, Middleware(metrics.MetricsMiddleware))
+        metrics.instrument_engine(engine)
+    else:
+        metrics.uninstrument_engine(engine)
+    app.middleware_stack = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=3, help='alternating off/on rounds; the best mean is kept')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ['RATE_LIMIT_ENABLED'] = 'false'
+        from app.main import app
+        from app.migrations import migrate
+        from app.database import engine
+        from app.utils import metrics
+
+        migrate()
+        print(f"{args.requests} sequential requests per path, best of {args.rounds} rounds")
+        for path in PATHS:
+            best = {}
+            for _ in range(args.rounds):
+                for enabled in (False, True):
+                    set_metrics(app, engine, enabled)
+                    mean = statistics.mean(asyncio.run(drive(app, path, args.requests)))
+                    best[enabled] = min(best.get(enabled, mean), mean)
+            print(f"{path:>14}: off {best[False]:7.1f} us   on {best[True]:7.1f} us   "
+                  f"overhead {best[True] - best[False]:+6.1f} us/request")
+
+        start = time.perf_counter()
+        text = metrics.render_metrics()
+        print(f"/metrics render: {(time.perf_counter() - start) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+        from app.services.image_service import image_pipeline
+        image_pipeline.shutdown()
+
+
+if __name__ == '__main__':
+    main()
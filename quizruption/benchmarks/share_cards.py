@@ -0,0 +1,91 @@
+"""
+Benchmark: share card rendering throughput, cold (render) vs warm (cached file).
+
+Creates personality and trivia results in a throwaway database, then requests
+/api/results/{id}/share.png for each one twice: the first pass renders every card in
+the process pool, the second must be served from the on-disk cache without rendering.
+
+Usage (from the quizruption directory):
+    python benchmarks/share_cards.py --results 40 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def seed(count: int):
+    from app.database import SessionLocal
+    from app.models import Quiz, Question, Result
+
+    db = SessionLocal()
+    quiz = Quiz(title="Which Marvel Hero Are You?", type="personality")
+    trivia = Quiz(title="Science Trivia", type="trivia")
+    db.add_all([quiz, trivia])
+    db.flush()
+    db.add_all([Question(quiz_id=trivia.id, text=f"Q{i}") for i in range(10)])
+    for i in range(count):
+        if i % 2:
+            db.add(Result(quiz_id=trivia.id, score=i % 11))
+        else:
+            outcome = {"id": "ironman", "name": f"Iron Man #{i}", "emoji": "🦾"}
+            db.add(Result(quiz_id=quiz.id, personality=outcome["name"], personality_data=json.dumps(outcome)))
+    db.commit()
+    ids = [r.id for r in db.query(Result).all()]
+    db.close()
+    return ids
+
+
+async def run(count: int, concurrency: int):
+    import httpx
+    from app.main import app
+    from app.migrations import migrate
+    from app.services import share_service
+    from app.services.image_service import image_pipeline
+
+    migrate()
+    ids = seed(count)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(result_id):
+            async with semaphore:
+                response = await client.get(f"/api/results/{result_id}/share.png")
+                assert response.status_code == 200, response.text
+                return len(response.content)
+
+        # Warm the worker processes so pool start-up is not counted as render time
+        await image_pipeline.run(len, b"")
+
+        for label in ("cold (render)", "warm (cache hit)"):
+            files_before = len(os.listdir(share_service.SHARE_CARD_DIR)) if share_service.SHARE_CARD_DIR.exists() else 0
+            start = time.perf_counter()
+            sizes = await asyncio.gather(*[fetch(result_id) for result_id in ids])
+            elapsed = time.perf_counter() - start
+            renders = len(os.listdir(share_service.SHARE_CARD_DIR)) - files_before
+            print(f"{label:>17}: {len(ids) / elapsed:8.1f} cards/s  "
+                  f"({len(ids)} cards, {sum(sizes) / len(sizes) / 1024:.0f} KB avg, {renders} rendered)")
+
+    image_pipeline.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(run(args.results, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
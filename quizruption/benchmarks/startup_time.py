@@ -0,0 +1,123 @@
+"""
+Benchmark: cold start of a worker, from process launch to its first answered request.
+
+Each run starts a fresh ``uvicorn app.main:app`` process in a throwaway working directory
+(its own SQLite database and upload folder), polls /health until it answers, then
+requests /api/quizzes/ once. The time to the first /health answer is what scaling
+out under load waits for. ``import app.main`` is also timed on its own in a fresh
+interpreter. The schema is migrated once per run before the clock starts when the
+backend has an explicit migration step.
+
+Compare two trees by pointing --backend at a checkout of the older revision, e.g.
+``git worktree add /tmp/before HEAD~1``.
+
+Usage (from the quizruption directory):
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --runs 5 --backend /tmp/before/quizruption
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def environment(backend: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=backend)
+    # No background work competing with startup
+    env.update(IMAGE_GC_INTERVAL='0', JOKE_PREGENERATE_INTERVAL='0', LOG_LEVEL='WARNING')
+    return env
+
+
+IMPORT_TIMER = 'import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)'
+
+
+def time_import(backend: str, workdir: str) -> float:
+    result = subprocess.run([sys.executable, '-c', IMPORT_TIMER], cwd=workdir, env=environment(backend),
+                            check=True, capture_output=True, text=True)
+    return float(result.stdout.split()[-1])
+
+
+def get(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            response.read()
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def time_first_request(backend: str, workdir: str, timeout: float = 60.0):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=workdir, env=environment(backend), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not get(f'{base}/health'):
+            if server.poll() is not None:
+                raise SystemExit(f'Server exited with status {server.returncode}')
+            if time.perf_counter() - start > timeout:
+                raise SystemExit('Server did not answer in time')
+            time.sleep(0.005)
+        ready = time.perf_counter() - start
+        if not get(f'{base}/api/quizzes/'):
+            raise SystemExit('/api/quizzes/ failed')
+        first_query = time.perf_counter() - start
+        return ready, first_query
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def migrate(backend: str, workdir: str):
+    if os.path.exists(os.path.join(backend, 'app', 'migrations.py')):
+        subprocess.run([sys.executable, '-m', 'app.migrations'], cwd=workdir, env=environment(backend),
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backend', default=BACKEND_ROOT, help='backend directory to start (default: this one)')
+    args = parser.parse_args()
+    backend = os.path.abspath(args.backend)
+
+    # Compile the tree once so every run starts from cached bytecode, as a deployed worker does
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', os.path.join(backend, 'app')], check=True)
+    imports, ready, first_query = [], [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            migrate(backend, workdir)
+            imports.append(time_import(backend, workdir))
+        with tempfile.TemporaryDirectory() as workdir:
+            migrate(backend, workdir)
+            r, q = time_first_request(backend, workdir)
+            ready.append(r)
+            first_query.append(q)
+
+    print(f'backend: {backend} ({args.runs} runs, median / min)')
+    for label, samples in (('import app.main', imports),
+                           ('launch -> first /health', ready),
+                           ('launch -> first /api/quizzes/', first_query)):
+        print(f'  {label:<30} {statistics.median(samples) * 1000:7.0f} ms / {min(samples) * 1000:7.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: serving /uploads for an image-heavy page (e.g. a quiz listing with avatars).
+
+Compares the stock StaticFiles mount with UploadStaticFiles:
+  * raw requests/sec for full 200 responses and for 304 revalidations
+  * requests a caching browser makes over repeated page views: without a
+    Cache-Control header every view revalidates every image, while immutable
+    content-addressed files are not requested again at all.
+
+Usage (from the quizruption directory):
+    python benchmarks/static_uploads.py --images 30 --views 20
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def build_uploads(directory: str, count: int):
+    from PIL import Image
+    from app.services.image_service import process_and_save
+
+    urls = []
+    for i in range(count):
+        output = io.BytesIO()
+        Image.effect_noise((400, 400), 20 + i).convert('RGB').save(output, format='PNG')
+        manifest = process_and_save(
+            output.getvalue(), (800, 800), os.path.join(directory, 'profile_images'), '/uploads/profile_images'
+        )
+        # What an avatar badge loads: the 48px WebP/JPEG variant
+        small = [v for v in manifest['variants'] if v['size'] == 48]
+        urls.append(small[0]['url'])
+    return urls
+
+
+class CachingBrowser:
+    """Just enough of a browser HTTP cache to count the requests a page view costs"""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}
+        self.requests = 0
+
+    async def fetch(self, url):
+        entry = self.cache.get(url)
+        if entry and 'immutable' in entry.get('cache-control', ''):
+            return
+        headers = {'if-none-match': entry['etag']} if entry and 'etag' in entry else {}
+        self.requests += 1
+        response = await self.client.get(url, headers=headers)
+        if response.status_code == 200:
+            self.cache[url] = dict(response.headers)
+
+
+async def measure(app, urls, views, rounds):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*[client.get(url) for url in urls])
+        full_rps = rounds * len(urls) / (time.perf_counter() - start)
+
+        etags = {url: (await client.get(url)).headers['etag'] for url in urls}
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*[client.get(url, headers={'if-none-match': etags[url]}) for url in urls])
+        revalidate_rps = rounds * len(urls) / (time.perf_counter() - start)
+
+        browser = CachingBrowser(client)
+        for _ in range(views):
+            await asyncio.gather(*[browser.fetch(url) for url in urls])
+    return full_rps, revalidate_rps, browser.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=30, help='images on the page')
+    parser.add_argument('--views', type=int, default=20, help='page views by one browser')
+    parser.add_argument('--rounds', type=int, default=50, help='page loads for the requests/sec measurement')
+    args = parser.parse_args()
+
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from starlette.staticfiles import StaticFiles
+    from app.utils.static_files import UploadStaticFiles
+
+    with tempfile.TemporaryDirectory() as directory:
+        urls = build_uploads(directory, args.images)
+        print(f"{args.images} avatar images per page, {args.views} page views")
+        for label, static in (('StaticFiles', StaticFiles), ('UploadStaticFiles', UploadStaticFiles)):
+            app = Starlette(routes=[Mount('/uploads', static(directory=directory))])
+            full_rps, revalidate_rps, requests = asyncio.run(measure(app, urls, args.views, args.rounds))
+            print(f"{label:>18}: 200s {full_rps:8.0f} req/s | 304s {revalidate_rps:8.0f} req/s | "
+                  f"browser requests for {args.views} views: {requests}")
+
+
+if __name__ == '__main__':
+    main()
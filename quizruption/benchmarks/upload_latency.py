@@ -0,0 +1,121 @@
+"""
+Benchmark: latency of unrelated routes while image uploads are being processed.
+
+Fires N concurrent profile-image uploads through the ASGI app and pings /health
+in parallel, reporting health-check latency percentiles while idle and under load.
+
+Usage (from the quizruption directory):
+    python benchmarks/upload_latency.py --uploads 16 --size 2400
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def make_png(size: int) -> bytes:
+    from PIL import Image
+    gradient = Image.linear_gradient('L').resize((size, size))
+    image = Image.merge('RGBA', (gradient, gradient.rotate(90), gradient.rotate(180), gradient))
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def ping(client, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get('/health')
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def run(uploads: int, size: int):
+    import httpx
+    import jwt
+    from app.main import app
+    from app.migrations import migrate
+    from app.database import SessionLocal
+    from app.models import User
+    from app.routes import uploads as upload_routes
+
+    migrate()
+    db = SessionLocal()
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    db.add(user)
+    db.commit()
+    token = jwt.encode({'sub': 'bench'}, upload_routes.SECRET_KEY, algorithm=upload_routes.ALGORITHM)
+    db.close()
+
+    payload = make_png(size)
+    print(f"Upload payload: {size}x{size} PNG, {len(payload) / 1024:.0f} KB, {uploads} concurrent uploads")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        idle = []
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(client, stop, idle))
+        await asyncio.sleep(1)
+        stop.set()
+        await pinger
+
+        loaded = []
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(client, stop, loaded))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post(
+                f'/api/upload/profile-image?token={token}',
+                files={'image': ('bench.png', payload, 'image/png')},
+            )
+            for _ in range(uploads)
+        ])
+        accepted = time.perf_counter() - start
+        job_ids = [r.json()['job_id'] for r in responses if r.status_code == 202]
+        while True:
+            statuses = [(await client.get(f'/api/upload/jobs/{j}')).json()['status'] for j in job_ids]
+            if all(s in ('done', 'failed') for s in statuses):
+                break
+            await asyncio.sleep(0.05)
+        processed = time.perf_counter() - start
+        stop.set()
+        await pinger
+
+    print(f"All uploads accepted in {accepted * 1000:.0f} ms, processed in {processed * 1000:.0f} ms "
+          f"({statuses.count('done')} done, {statuses.count('failed')} failed, "
+          f"{uploads - len(job_ids)} rejected)")
+    for label, samples in (('idle', idle), ('under upload load', loaded)):
+        print(f"/health {label:>18}: n={len(samples):4d} p50={statistics.median(samples):7.2f} ms "
+              f"p99={percentile(samples, 99):7.2f} ms max={max(samples):7.2f} ms")
+
+    from app.services.image_service import image_pipeline
+    image_pipeline.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=16)
+    parser.add_argument('--size', type=int, default=2400, help='edge length of the generated test image')
+    args = parser.parse_args()
+
+    # Run against a throwaway database and upload directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        asyncio.run(run(args.uploads, args.size))
+
+
+if __name__ == '__main__':
+    main()
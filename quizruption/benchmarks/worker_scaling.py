@@ -0,0 +1,147 @@
+"""
+Load test: throughput of `python -m app.server` as the worker count grows.
+
+For each worker count, starts the multi-process server in a throwaway working directory,
+creates a few quizzes through the API, then has --clients client processes issue
+keep-alive GETs for --seconds and counts completed requests. Reports requests per second
+and scaling efficiency (throughput / (workers x single-worker throughput)).
+
+The default path is a cached quiz (GET /api/quizzes/{id}); each request still checks the
+shared cache version at most once a second and runs the full middleware stack. Clients
+share the machine with the server, so give them spare cores (e.g. --clients equal to the
+largest worker count on a machine with twice as many cores), or the clients cap the
+numbers rather than the workers.
+
+Usage (from the quizruption directory):
+    python benchmarks/worker_scaling.py --workers 1 2 4 --clients 8 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_ROOT)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def wait_until_up(port: int, server: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'Server exited with status {server.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            if request(conn, 'GET', '/health')[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise SystemExit('Server did not start in time')
+
+
+def seed(port: int, count: int = 5) -> list:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    ids = []
+    for i in range(count):
+        status, body = request(conn, 'POST', '/api/quizzes/', {
+            'title': f'Scaling quiz {i}', 'type': 'trivia',
+            'questions': [
+                {'text': f'Question {j}', 'answers': [{'text': 'Yes', 'is_correct': True}, {'text': 'No'}]}
+                for j in range(5)
+            ],
+        })
+        if status != 201:
+            raise SystemExit(f'Seeding failed: {status} {body[:200]!r}')
+        ids.append(json.loads(body)['id'])
+    return ids
+
+
+def client(port: int, paths: list, seconds: float, start_at: float, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    done = errors = 0
+    while time.time() < deadline:
+        try:
+            status, _ = request(conn, 'GET', paths[done % len(paths)])
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            errors += 1
+            continue
+        if status == 200:
+            done += 1
+        else:
+            errors += 1
+    results.put((done, errors))
+
+
+def run(workers: int, clients: int, seconds: float, path: str) -> float:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=BACKEND_ROOT, WORKERS=str(workers), BACKEND_HOST='127.0.0.1',
+                   BACKEND_PORT=str(port), RATE_LIMIT_ENABLED='false', LOG_LEVEL='WARNING',
+                   IMAGE_GC_INTERVAL='0', JOKE_PREGENERATE_INTERVAL='0')
+        server = subprocess.Popen([sys.executable, '-m', 'app.server'], cwd=workdir, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(port, server)
+            ids = seed(port)
+            paths = [path.format(id=quiz_id) for quiz_id in ids]
+            results = multiprocessing.Queue()
+            start_at = time.time() + 1.0
+            procs = [multiprocessing.Process(target=client, args=(port, paths, seconds, start_at, results))
+                     for _ in range(clients)]
+            for proc in procs:
+                proc.start()
+            totals = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            server.terminate()
+            server.wait()
+    done = sum(d for d, _ in totals)
+    errors = sum(e for _, e in totals)
+    if errors:
+        print(f'  ({errors} failed requests with {workers} workers)')
+    return done / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8, help='client processes issuing requests')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--path', default='/api/quizzes/{id}', help='request path; {id} is a seeded quiz id')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} CPU cores, {args.clients} client processes, {args.seconds:g}s per run, GET {args.path}')
+    baseline = None
+    for workers in args.workers:
+        throughput = run(workers, args.clients, args.seconds, args.path)
+        baseline = baseline or throughput / workers
+        print(f'  {workers:3d} worker(s): {throughput:8.0f} req/s  efficiency {throughput / (workers * baseline):5.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,20 @@
-import sqlite3
+from sqlalchemy import func, inspect, select
 
-conn = sqlite3.connect('quizruption.db')
-cursor = conn.cursor()
+from app.database import engine
+from app.models import User
+
+inspector = inspect(engine)
 
 # Check tables
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-tables = [row[0] for row in cursor.fetchall()]
+tables = inspector.get_table_names()
 print('Tables:', tables)
 
 # Check users table structure
-cursor.execute("PRAGMA table_info(users)")
-columns = cursor.fetchall()
 print('\nUsers table columns:')
-for col in columns:
-    print(f"  {col[1]} ({col[2]})")
+for col in inspector.get_columns('users'):
+    print(f"  {col['name']} ({col['type']})")
 
 # Try to count users
-cursor.execute("SELECT COUNT(*) FROM users")
-count = cursor.fetchone()[0]
+with engine.connect() as conn:
+    count = conn.execute(select(func.count()).select_from(User)).scalar()
 print(f'\nTotal users: {count}')
-
-conn.close()
@@ -1,10 +1,13 @@
-import sqlite3
 import os
-from datetime import datetime
 
-# Connect to database
-db_path = 'quizruption.db'
-if not os.path.exists(db_path):
+from sqlalchemy import inspect, select
+
+from app.database import engine
+from app.models import DailyJoke, JokeSuggestion
+
+# Connect to database (DATABASE_URL, SQLite file by default)
+db_path = engine.url.database
+if engine.dialect.name == 'sqlite' and not os.path.exists(db_path):
     print("❌ Database file not found!")
     print("   The backend server hasn't been started yet.")
     print("\n💡 To fix this:")
@@ -13,12 +16,11 @@ if not os.path.exists(db_path):
     print("   3. Wait for server to start, then try submitting a suggestion again")
     exit(1)
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
+conn = engine.connect()
+inspector = inspect(engine)
 
 # Check if table exists
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='joke_suggestions'")
-table_exists = cursor.fetchone()
+table_exists = inspector.has_table('joke_suggestions')
 
 print("=" * 80)
 print("JOKE SUGGESTIONS DATABASE CHECK")
@@ -33,31 +35,28 @@ if not table_exists:
     print("   4. Then submit your suggestion through the jokes page")
     
     # Show existing tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    print(f"\n📋 Current tables in database: {', '.join([t[0] for t in tables])}")
+    tables = inspector.get_table_names()
+    print(f"\n📋 Current tables in database: {', '.join(tables)}")
     conn.close()
     exit(0)
 
 # Get column names
-cursor.execute('PRAGMA table_info(joke_suggestions)')
-columns = [col[1] for col in cursor.fetchall()]
+columns = [col['name'] for col in inspector.get_columns('joke_suggestions')]
 print("\n✓ Table exists!")
 print(f"Columns: {' | '.join(columns)}")
 print("-" * 80)
 
 # Get all suggestions
-cursor.execute('SELECT * FROM joke_suggestions ORDER BY created_at DESC')
-rows = cursor.fetchall()
+rows = conn.execute(select(JokeSuggestion.__table__).order_by(JokeSuggestion.created_at.desc())).all()
 
 if rows:
     print(f"\n✓ Found {len(rows)} suggestion(s):\n")
     for row in rows:
-        print(f"  ID: {row[0]}")
-        print(f"  Suggestion: '{row[1]}'")
-        print(f"  User ID: {row[2] if row[2] else 'Anonymous'}")
-        print(f"  Used: {'✓ Yes' if row[3] else '○ No'}")
-        print(f"  Created: {row[4]}")
+        print(f"  ID: {row.id}")
+        print(f"  Suggestion: '{row.suggestion_text}'")
+        print(f"  User ID: {row.user_id if row.user_id else 'Anonymous'}")
+        print(f"  Used: {'✓ Yes' if row.used else '○ No'}")
+        print(f"  Created: {row.created_at}")
         print("-" * 80)
 else:
     print("\n⚠ No suggestions found in the database yet.")
@@ -72,14 +71,15 @@ else:
 print("\n" + "=" * 80)
 print("DAILY JOKES CACHE")
 print("=" * 80)
-cursor.execute('SELECT date, source, joke FROM daily_jokes ORDER BY date DESC LIMIT 3')
-jokes = cursor.fetchall()
+jokes = conn.execute(
+    select(DailyJoke.date, DailyJoke.source, DailyJoke.joke).order_by(DailyJoke.date.desc()).limit(3)
+).all()
 if jokes:
     print(f"\n✓ Found {len(jokes)} cached joke(s):\n")
     for joke in jokes:
-        print(f"  Date: {joke[0]}")
-        print(f"  Source: {joke[1]}")
-        print(f"  Joke: {joke[2][:80]}...")
+        print(f"  Date: {joke.date}")
+        print(f"  Source: {joke.source}")
+        print(f"  Joke: {joke.joke[:80]}...")
         print("-" * 80)
 else:
     print("\n○ No daily jokes cached yet (will be created on first visit)")
@@ -1,13 +1,17 @@
-"""Apply missing columns to an existing SQLite database (quizruption.db) to align
+"""Apply missing columns to an existing database (DATABASE_URL, SQLite by default) to align
 with current SQLAlchemy models defined in app/models.py.
 
 Adds columns only if they do not already exist. Safe to re-run.
 """
 from __future__ import annotations
-import sqlite3
-from pathlib import Path
+import os
+import sys
 
-DB_PATH = Path(__file__).parent.parent / "quizruption.db"
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.database import engine
+from app.migrations import migrate
 
 TABLE_COLUMNS = {
     "users": [
@@ -28,33 +32,25 @@ TABLE_COLUMNS = {
     ],
 }
 
-def get_existing_columns(cur: sqlite3.Cursor, table: str) -> set[str]:
-    cur.execute(f"PRAGMA table_info({table})")
-    return {row[1] for row in cur.fetchall()}
-
-def apply():
-    if not DB_PATH.exists():
-        raise SystemExit(f"Database file not found: {DB_PATH}")
-    con = sqlite3.connect(str(DB_PATH))
-    try:
-        cur = con.cursor()
+def apply(bind=engine):
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
         for table, cols in TABLE_COLUMNS.items():
             # Ensure table exists first
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
-            if not cur.fetchone():
+            if table not in tables:
                 print(f"[SKIP] Table '{table}' does not exist in DB.")
                 continue
-            existing = get_existing_columns(cur, table)
+            existing = {col["name"] for col in inspector.get_columns(table)}
             for col_name, col_type in cols:
                 if col_name in existing:
                     print(f"[OK] {table}.{col_name} already exists")
                     continue
                 sql = f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}"
                 print(f"[ADD] {sql}")
-                cur.execute(sql)
-        con.commit()
-    finally:
-        con.close()
+                conn.execute(text(sql))
+    # Later columns (joke_suggestions.theme_key) with their indexes and backfills, plus missing tables
+    migrate(bind)
     print("Schema alignment complete.")
 
 if __name__ == "__main__":
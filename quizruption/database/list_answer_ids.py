@@ -3,16 +3,10 @@ Run: python database/list_answer_ids.py <quiz_id>
 """
 import sys
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app.database import SQLALCHEMY_DATABASE_URL
+from app.database import SessionLocal
 from app import models
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
-
 
 def main():
     if len(sys.argv) < 2:
@@ -9,16 +9,12 @@ from datetime import datetime
 # Ensure app package importable
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect, text
 from sqlalchemy.exc import IntegrityError
 
-from app.database import Base, SQLALCHEMY_DATABASE_URL
+from app.database import SessionLocal, engine
+from app.migrations import migrate
 from app.models import User, Quiz, Question, Answer, Result, JokeSuggestion, PersonalityContent
-from sqlalchemy import text
-
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
 
 # ---------------------------------------------------------------------
 # Helpers
@@ -124,20 +120,19 @@ def create_joke_suggestions(session, users):
 # ---------------------------------------------------------------------
 
 def main():
-    # Ensure any missing columns (simple, manual migration for SQLite)
-    with engine.connect() as conn:
-        # List of (table, column, type) to ensure exists
-        required_columns = [
-            ("quizzes", "personalities", "TEXT"),
-            ("answers", "personality_weights", "TEXT"),
-            ("results", "personality_data", "TEXT"),
-        ]
+    migrate(engine)
+    # Ensure any missing columns on tables created by older versions (simple, manual migration)
+    required_columns = [
+        ("quizzes", "personalities", "TEXT"),
+        ("answers", "personality_weights", "TEXT"),
+        ("results", "personality_data", "TEXT"),
+    ]
+    inspector = inspect(engine)
+    with engine.begin() as conn:
         for table, column, coltype in required_columns:
-            result = conn.execute(text(f"PRAGMA table_info({table})"))
-            cols = [row[1] for row in result]
+            cols = [col["name"] for col in inspector.get_columns(table)]
             if column not in cols:
                 conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {coltype}"))
-    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
     try:
         created_summary = {}
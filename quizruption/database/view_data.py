@@ -7,15 +7,10 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect
+from app.database import SessionLocal
 from app.models import User, Quiz, Question, Answer, Result, JokeSuggestion
 
-# Database connection
-SQLALCHEMY_DATABASE_URL = "sqlite:///./quizruption.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-
 def print_separator(title=""):
     """Print a visual separator"""
     print("\n" + "="*80)
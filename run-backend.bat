@@ -29,6 +29,14 @@ venv\Scripts\pip.exe install --upgrade pip
 venv\Scripts\pip.exe install --only-binary :all: -r requirements.txt || venv\Scripts\pip.exe install -r requirements.txt
 echo. 
 
+REM Create missing tables before any worker starts (the app does not do this on import)
+echo Applying database schema...
+%PYTHON_PATH% -m app.migrations
+if errorlevel 1 (
+    echo ERROR: database migration failed.
+    exit /b 1
+)
+
 echo.
 echo ===============================================
 echo Backend server starting...
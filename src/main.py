@@ -1,12 +1,29 @@
-
 """
 Ctrl_Alt_Delinquents - Main Application Entry Point
+
+Starts the Quizruption backend for development, like run-backend.bat: the database schema
+is applied, then a single uvicorn process serves the API and reloads on code changes.
+Production deployments run `python -m app.server` (see quizruption/app/server.py) instead.
 """
+import os
+import sys
+
+BACKEND_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quizruption")
+
 
 def main():
     """Main function to run the application."""
-    print("Hello, World!")
-    print("Welcome to Ctrl_Alt_Delinquents!")
+    sys.path.insert(0, BACKEND_ROOT)
+    # Relative paths (SQLite database, uploads, app.log) resolve inside the backend directory
+    os.chdir(BACKEND_ROOT)
+    import uvicorn
+    from app.config import settings
+    from app.migrations import migrate
+
+    migrate()
+    uvicorn.run("app.main:app", host=settings.backend_host, port=settings.backend_port,
+                reload=True, reload_dirs=[BACKEND_ROOT])
+
 
 if __name__ == "__main__":
     main()